@@ -1,11 +1,67 @@
 import json
-import os
-import psycopg2
-from typing import Dict, Any
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+from db_pool import ConnectionPool
+
+POOL = ConnectionPool.from_env()
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 1000
+SESSIONS_PER_ACCOUNT = 10
+
+# Аккаунты упорядочены по (registered_at DESC, id DESC), аккаунты без даты регистрации — в конце.
+# Последние сессии каждого аккаунта берутся LATERAL-подзапросом по индексу (user_id, logged_in_at DESC),
+# страница собирается в JSON на стороне базы, total считается в том же запросе.
+ACCOUNTS_QUERY = f"""
+    WITH page AS (
+        SELECT id, login, password, registered_at, last_login, token_used, is_active
+        FROM t_p37207906_crypto_price_compara.platform_users
+        WHERE (COALESCE(registered_at, '-infinity'::timestamp), id) < (%(after_at)s::timestamp, %(after_id)s)
+        ORDER BY COALESCE(registered_at, '-infinity'::timestamp) DESC, id DESC
+        LIMIT %(limit)s
+    )
+    SELECT
+        (SELECT count(*) FROM t_p37207906_crypto_price_compara.platform_users) AS total,
+        COALESCE(json_agg(json_build_object(
+            'id', p.id,
+            'login', p.login,
+            'password', p.password,
+            'registered_at', p.registered_at,
+            'last_login', p.last_login,
+            'token_used', p.token_used,
+            'is_active', p.is_active,
+            'sessions', s.sessions,
+            'sessions_count', c.sessions_count
+        ) ORDER BY COALESCE(p.registered_at, '-infinity'::timestamp) DESC, p.id DESC), '[]'::json) AS accounts
+    FROM page p
+    LEFT JOIN LATERAL (
+        SELECT COALESCE(json_agg(json_build_object(
+            'ip_address', r.ip_address,
+            'user_agent', r.user_agent,
+            'device_type', r.device_type,
+            'browser', r.browser,
+            'os', r.os,
+            'logged_in_at', r.logged_in_at
+        ) ORDER BY r.logged_in_at DESC), '[]'::json) AS sessions
+        FROM (
+            SELECT ip_address, user_agent, device_type, browser, os, logged_in_at
+            FROM t_p37207906_crypto_price_compara.user_sessions
+            WHERE user_id = p.id
+            ORDER BY logged_in_at DESC
+            LIMIT {SESSIONS_PER_ACCOUNT}
+        ) r
+    ) s ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT count(*) AS sessions_count
+        FROM t_p37207906_crypto_price_compara.user_sessions
+        WHERE user_id = p.id
+    ) c ON TRUE
+"""
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
-    Список всех аккаунтов с данными и историей подключений
+    Список всех аккаунтов с данными и историей подключений.
+    GET: limit (по умолчанию 500) и cursor — keyset-пагинация, next_cursor — курсор следующей страницы.
     '''
     method: str = event.get('httpMethod', 'GET')
     
@@ -40,8 +96,14 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'body': json.dumps({'error': 'Unauthorized'})
         }
     
-    dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
+    conn = POOL.getconn()
+    try:
+        return manage_accounts(conn, event, method)
+    finally:
+        POOL.putconn(conn)
+
+def manage_accounts(conn, event: Dict[str, Any], method: str) -> Dict[str, Any]:
+    '''Смена пароля, удаление и постраничный список аккаунтов'''
     cur = conn.cursor()
     
     # PUT method - изменение пароля аккаунта
@@ -51,8 +113,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         new_password = body.get('password')
         
         if not account_id or not new_password:
-            cur.close()
-            conn.close()
             return {
                 'statusCode': 400,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -68,8 +128,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         account = cur.fetchone()
         
         if not account:
-            cur.close()
-            conn.close()
             return {
                 'statusCode': 404,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -86,8 +144,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         )
         
         conn.commit()
-        cur.close()
-        conn.close()
         
         return {
             'statusCode': 200,
@@ -105,8 +161,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         account_id = params.get('id')
         
         if not account_id:
-            cur.close()
-            conn.close()
             return {
                 'statusCode': 400,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -122,8 +176,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         account = cur.fetchone()
         
         if not account:
-            cur.close()
-            conn.close()
             return {
                 'statusCode': 404,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -146,8 +198,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         )
         
         conn.commit()
-        cur.close()
-        conn.close()
         
         return {
             'statusCode': 200,
@@ -159,62 +209,27 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             })
         }
     
-    cur.execute("""
-        SELECT 
-            id, 
-            login,
-            password,
-            registered_at, 
-            last_login, 
-            token_used, 
-            is_active 
-        FROM t_p37207906_crypto_price_compara.platform_users 
-        ORDER BY registered_at DESC
-    """)
+    params = event.get('queryStringParameters', {}) or {}
+    try:
+        limit = min(max(int(params.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        after_at, after_id = parse_cursor(params.get('cursor'))
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': f'Invalid limit or cursor: {e}'})
+        }
     
-    accounts = []
-    for row in cur.fetchall():
-        account_id, login, password, registered_at, last_login, token_used, is_active = row
-        
-        cur.execute("""
-            SELECT 
-                ip_address,
-                user_agent,
-                device_type,
-                browser,
-                os,
-                logged_in_at
-            FROM t_p37207906_crypto_price_compara.user_sessions 
-            WHERE user_id = %s 
-            ORDER BY logged_in_at DESC 
-            LIMIT 10
-        """, (account_id,))
-        
-        sessions = []
-        for session_row in cur.fetchall():
-            sessions.append({
-                'ip_address': session_row[0],
-                'user_agent': session_row[1],
-                'device_type': session_row[2],
-                'browser': session_row[3],
-                'os': session_row[4],
-                'logged_in_at': session_row[5].isoformat() if session_row[5] else None
-            })
-        
-        accounts.append({
-            'id': account_id,
-            'login': login,
-            'password': password,
-            'registered_at': registered_at.isoformat() if registered_at else None,
-            'last_login': last_login.isoformat() if last_login else None,
-            'token_used': token_used,
-            'is_active': is_active,
-            'sessions': sessions,
-            'sessions_count': len(sessions)
-        })
+    # Страница аккаунтов вместе с последними сессиями и общим числом — одним запросом
+    cur.execute(ACCOUNTS_QUERY, {'after_at': after_at, 'after_id': after_id, 'limit': limit + 1})
+    total, accounts = cur.fetchone()
     
-    cur.close()
-    conn.close()
+    next_cursor = None
+    if len(accounts) > limit:
+        accounts = accounts[:limit]
+        last = accounts[-1]
+        next_cursor = f"{last['registered_at'] or '-infinity'},{last['id']}"
     
     return {
         'statusCode': 200,
@@ -225,6 +240,21 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         'isBase64Encoded': False,
         'body': json.dumps({
             'accounts': accounts,
-            'total': len(accounts)
+            'total': total,
+            'next_cursor': next_cursor
         })
-    }
\ No newline at end of file
+    }
+
+
+def parse_cursor(cursor: Optional[str]) -> Tuple[str, int]:
+    '''
+    Курсор keyset-пагинации "registered_at,id" последнего аккаунта предыдущей страницы.
+    Без курсора — начало списка: любой (registered_at, id) меньше ('infinity', 0).
+    '''
+    if not cursor:
+        return 'infinity', 0
+    registered_at, _, account_id = cursor.rpartition(',')
+    if registered_at != '-infinity':
+        # Проверяем дату здесь, чтобы битый курсор давал 400, а не ошибку SQL
+        datetime.fromisoformat(registered_at)
+    return registered_at, int(account_id)
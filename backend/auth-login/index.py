@@ -1,8 +1,9 @@
 import json
-import os
-import psycopg2
 from typing import Dict, Any
 from datetime import datetime
+from db_pool import ConnectionPool
+
+POOL = ConnectionPool.from_env()
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -42,8 +43,14 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'body': json.dumps({'error': 'Login and password required'})
         }
     
-    dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
+    conn = POOL.getconn()
+    try:
+        return check_credentials(conn, login, password)
+    finally:
+        POOL.putconn(conn)
+
+def check_credentials(conn, login: str, password: str) -> Dict[str, Any]:
+    '''Проверка логина и пароля, отметка последнего входа'''
     cur = conn.cursor()
     
     cur.execute(
@@ -53,8 +60,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     user_row = cur.fetchone()
     
     if not user_row:
-        cur.close()
-        conn.close()
         return {
             'statusCode': 401,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -65,8 +70,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     user_id, user_login, is_active = user_row
     
     if not is_active:
-        cur.close()
-        conn.close()
         return {
             'statusCode': 403,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -89,9 +92,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         'message': 'Login successful'
     }
     
-    cur.close()
-    conn.close()
-    
     return {
         'statusCode': 200,
         'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -0,0 +1,100 @@
+'''
+Пул соединений с Postgres, общий для тёплых вызовов функции.
+Соединение берётся из пула (getconn) и возвращается (putconn) вместо connect/close на каждый вызов,
+поэтому TCP/TLS-рукопожатие и аутентификация остаются только у первого вызова инстанса.
+
+Перед выдачей простоявшее дольше check_after секунд соединение проверяется запросом SELECT 1,
+соединения старше max_lifetime пересоздаются. При возврате незавершённая транзакция
+откатывается, а параметры сессии (autocommit, изоляция, readonly) сбрасываются.
+
+DATABASE_POOLER_URL — адрес локального прокси-пулера (PgBouncer в режиме transaction),
+если он есть; иначе DATABASE_URL.
+'''
+import os
+import time
+import threading
+from typing import List, Tuple
+import psycopg2
+import psycopg2.extensions
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    '''Соединение, помнящее время открытия (для max_lifetime)'''
+    
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.opened_at = time.monotonic()
+
+
+class ConnectionPool:
+    def __init__(self, dsn: str, max_idle: int = 4, max_lifetime: float = 300, check_after: float = 5) -> None:
+        self.dsn = dsn
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self._lock = threading.Lock()
+        # (соединение, время возврата в пул)
+        self._idle: List[Tuple[PooledConnection, float]] = []
+    
+    @classmethod
+    def from_env(cls) -> 'ConnectionPool':
+        return cls(
+            os.environ.get('DATABASE_POOLER_URL') or os.environ.get('DATABASE_URL', ''),
+            max_idle=int(os.environ.get('DB_POOL_MAX_IDLE', '4')),
+            max_lifetime=float(os.environ.get('DB_POOL_MAX_LIFETIME', '300')),
+            check_after=float(os.environ.get('DB_POOL_CHECK_AFTER', '5'))
+        )
+    
+    def getconn(self) -> PooledConnection:
+        '''Живое соединение из пула или новое'''
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, released_at = self._idle.pop()
+            now = time.monotonic()
+            if conn.closed or now - conn.opened_at > self.max_lifetime:
+                self._close(conn)
+                continue
+            if now - released_at > self.check_after and not self._healthy(conn):
+                self._close(conn)
+                continue
+            return conn
+        
+        return psycopg2.connect(self.dsn, connection_factory=PooledConnection,
+                                keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3)
+    
+    def putconn(self, conn: PooledConnection) -> None:
+        '''Вернуть соединение: транзакция откатывается, сломанные и старые соединения закрываются'''
+        if conn.closed or time.monotonic() - conn.opened_at > self.max_lifetime:
+            self._close(conn)
+            return
+        try:
+            if conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                raise psycopg2.InterfaceError('connection state unknown')
+            conn.rollback()
+            conn.set_session(isolation_level='DEFAULT', readonly='DEFAULT', deferrable='DEFAULT', autocommit=False)
+        except psycopg2.Error:
+            self._close(conn)
+            return
+        
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append((conn, time.monotonic()))
+                return
+        self._close(conn)
+    
+    def _healthy(self, conn: PooledConnection) -> bool:
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+    
+    def _close(self, conn: PooledConnection) -> None:
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
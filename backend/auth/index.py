@@ -2,10 +2,20 @@ import json
 import os
 import hashlib
 import secrets
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
-import psycopg2
 import psycopg2.extras
+from db_pool import ConnectionPool
+from session_cache import SessionCache
+from user_agent import classify
+
+POOL = ConnectionPool.from_env()
+SESSIONS = SessionCache(
+    ttl=float(os.environ.get('SESSION_CACHE_TTL', '30')),
+    poll_interval=float(os.environ.get('SESSION_REVOCATION_POLL', '5')),
+    signing_key=os.environ.get('SESSION_SIGNING_KEY'),
+    token_ttl=float(os.environ.get('SESSION_TOKEN_TTL', '300'))
+)
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -27,23 +37,23 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'isBase64Encoded': False
         }
     
-    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    if method == 'GET':
+        return verify_session(event)
+    if method != 'POST':
+        return error_response(405, 'Method not allowed')
+    
+    conn = POOL.getconn()
     
     try:
-        if method == 'POST':
-            body = json.loads(event.get('body', '{}'))
-            action = body.get('action', 'login')
-            
-            if action == 'logout':
-                return logout(conn, event)
-            else:
-                return login(conn, event)
-        elif method == 'GET':
-            return verify_session(conn, event)
+        body = json.loads(event.get('body', '{}'))
+        action = body.get('action', 'login')
+        
+        if action == 'logout':
+            return logout(conn, event)
         else:
-            return error_response(405, 'Method not allowed')
+            return login(conn, event)
     finally:
-        conn.close()
+        POOL.putconn(conn)
 
 def login(conn, event: Dict[str, Any]) -> Dict[str, Any]:
     '''Вход пользователя в систему'''
@@ -79,9 +89,7 @@ def login(conn, event: Dict[str, Any]) -> Dict[str, Any]:
         ip_address = identity.get('sourceIp', 'Unknown')
         user_agent = headers.get('User-Agent') or headers.get('user-agent', 'Unknown')
         
-        device_type = parse_device_type(user_agent)
-        browser = parse_browser(user_agent)
-        os = parse_os(user_agent)
+        device_type, browser, os_name = classify(user_agent).columns()
         
         session_token = secrets.token_urlsafe(32)
         
@@ -90,14 +98,12 @@ def login(conn, event: Dict[str, Any]) -> Dict[str, Any]:
             (user_id, ip_address, user_agent, device_type, browser, os, session_token)
             VALUES (%s, %s, %s, %s, %s, %s, %s)
             RETURNING id, logged_in_at
-        ''', (user_id, ip_address, user_agent, device_type, browser, os, session_token))
+        ''', (user_id, ip_address, user_agent, device_type, browser, os_name, session_token))
         
         session_row = cur.fetchone()
         conn.commit()
         
-        return success_response({
-            'success': True,
-            'sessionToken': session_token,
+        record = {
             'user': {
                 'id': user_id,
                 'email': email,
@@ -106,6 +112,13 @@ def login(conn, event: Dict[str, Any]) -> Dict[str, Any]:
             },
             'sessionId': session_row[0],
             'loggedInAt': session_row[1].isoformat() if session_row[1] else None
+        }
+        SESSIONS.put(session_token, record)
+        
+        return success_response({
+            'success': True,
+            'sessionToken': SESSIONS.sign(session_token, record),
+            **record
         })
 
 def logout(conn, event: Dict[str, Any]) -> Dict[str, Any]:
@@ -116,6 +129,9 @@ def logout(conn, event: Dict[str, Any]) -> Dict[str, Any]:
     if not session_token:
         return error_response(400, 'Session token required')
     
+    # Подписанный токен: в БД хранится только непрозрачная часть до первой точки
+    session_token = session_token.partition('.')[0]
+    
     with conn.cursor() as cur:
         cur.execute('''
             UPDATE user_sessions 
@@ -130,17 +146,50 @@ def logout(conn, event: Dict[str, Any]) -> Dict[str, Any]:
             return error_response(404, 'Session not found')
         
         conn.commit()
+        SESSIONS.invalidate_token(session_token)
         
         return success_response({'success': True, 'message': 'Logged out successfully'})
 
-def verify_session(conn, event: Dict[str, Any]) -> Dict[str, Any]:
-    '''Проверка активной сессии'''
+def verify_session(event: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Проверка активной сессии: подписанный токен или кэш проверенных сессий без запроса к БД,
+    иначе — запрос к БД. Соединение берётся из пула только при промахе или опросе отзывов.
+    С SESSION_SIGNING_KEY после проверки по БД возвращается обновлённый sessionToken.
+    '''
     headers = event.get('headers', {})
     session_token = headers.get('X-Session-Token') or headers.get('x-session-token')
     
     if not session_token:
         return error_response(401, 'Session token required')
     
+    conn = None
+    try:
+        if SESSIONS.poll_due():
+            conn = POOL.getconn()
+            SESSIONS.poll_revocations(conn)
+        
+        token, record = SESSIONS.verify_signed(session_token)
+        record = record or SESSIONS.get(token)
+        if record:
+            return success_response({'valid': True, **record})
+        
+        conn = conn or POOL.getconn()
+        record = load_session(conn, token)
+    finally:
+        if conn:
+            POOL.putconn(conn)
+    
+    if not record:
+        return error_response(401, 'Invalid or expired session')
+    
+    SESSIONS.put(token, record)
+    response = {'valid': True, **record}
+    if SESSIONS.signing_key:
+        response['sessionToken'] = SESSIONS.sign(token, record)
+    return success_response(response)
+
+def load_session(conn, session_token: str) -> Optional[Dict[str, Any]]:
+    '''Активная сессия активного пользователя из БД'''
     with conn.cursor() as cur:
         cur.execute('''
             SELECT s.id, s.user_id, u.email, u.full_name, u.is_admin, s.logged_in_at
@@ -150,62 +199,21 @@ def verify_session(conn, event: Dict[str, Any]) -> Dict[str, Any]:
         ''', (session_token,))
         
         row = cur.fetchone()
-        
-        if not row:
-            return error_response(401, 'Invalid or expired session')
-        
-        session_id, user_id, email, full_name, is_admin, logged_in_at = row
-        
-        return success_response({
-            'valid': True,
-            'user': {
-                'id': user_id,
-                'email': email,
-                'fullName': full_name,
-                'isAdmin': is_admin
-            },
-            'sessionId': session_id,
-            'loggedInAt': logged_in_at.isoformat() if logged_in_at else None
-        })
-
-def parse_device_type(user_agent: str) -> str:
-    ua_lower = user_agent.lower()
-    if 'mobile' in ua_lower or 'android' in ua_lower or 'iphone' in ua_lower:
-        return 'Mobile'
-    elif 'tablet' in ua_lower or 'ipad' in ua_lower:
-        return 'Tablet'
-    else:
-        return 'Desktop'
-
-def parse_browser(user_agent: str) -> str:
-    ua = user_agent.lower()
-    if 'edg' in ua:
-        return 'Edge'
-    elif 'chrome' in ua:
-        return 'Chrome'
-    elif 'firefox' in ua:
-        return 'Firefox'
-    elif 'safari' in ua and 'chrome' not in ua:
-        return 'Safari'
-    elif 'opera' in ua or 'opr' in ua:
-        return 'Opera'
-    else:
-        return 'Other'
-
-def parse_os(user_agent: str) -> str:
-    ua = user_agent.lower()
-    if 'windows' in ua:
-        return 'Windows'
-    elif 'mac' in ua:
-        return 'macOS'
-    elif 'linux' in ua:
-        return 'Linux'
-    elif 'android' in ua:
-        return 'Android'
-    elif 'iphone' in ua or 'ipad' in ua:
-        return 'iOS'
-    else:
-        return 'Other'
+    
+    if not row:
+        return None
+    
+    session_id, user_id, email, full_name, is_admin, logged_in_at = row
+    return {
+        'user': {
+            'id': user_id,
+            'email': email,
+            'fullName': full_name,
+            'isAdmin': is_admin
+        },
+        'sessionId': session_id,
+        'loggedInAt': logged_in_at.isoformat() if logged_in_at else None
+    }
 
 def success_response(data: Dict[str, Any], status_code: int = 200) -> Dict[str, Any]:
     return {
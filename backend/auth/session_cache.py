@@ -0,0 +1,154 @@
+'''
+Кэш проверенных сессий для verify_session: токен -> данные пользователя на ttl секунд.
+
+Инвалидация:
+- logout в этом инстансе удаляет токен сразу;
+- выходы и изменения пользователей из других инстансов и функций (users.update_user
+  обновляет users.updated_at, деактивация закрывает сессии) подхватываются опросом БД
+  не чаще раза в poll_interval секунд: один запрос на инстанс вместо запроса на каждую проверку.
+
+Подписанные токены (signing_key): к непрозрачному токену сессии из БД добавляются данные
+пользователя и срок действия с HMAC-SHA256 подписью: "<токен>.<payload>.<подпись>".
+Такой токен проверяется без БД вообще, пока не истёк и не отозван опросом;
+после этого — обычная проверка по БД по непрозрачной части.
+'''
+import hmac
+import json
+import time
+import base64
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Set, Tuple
+
+SessionRecord = Dict[str, Any]
+
+
+class SessionCache:
+    def __init__(self, ttl: float = 30, max_size: int = 10000, poll_interval: float = 5,
+                 signing_key: Optional[str] = None, token_ttl: float = 300) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self.poll_interval = poll_interval
+        self.signing_key = signing_key.encode() if signing_key else None
+        self.token_ttl = token_ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[float, SessionRecord]] = {}
+        self._by_user: Dict[int, Set[str]] = {}
+        # Отзывы из опроса: токен или пользователь -> когда замечен (time.time()); живут token_ttl
+        self._revoked_tokens: Dict[str, float] = {}
+        self._revoked_users: Dict[int, float] = {}
+        self._polled_at = 0.0
+        self._watermark: Optional[datetime] = None
+    
+    def get(self, token: str) -> Optional[SessionRecord]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if not entry:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                self._drop(token)
+                return None
+            return entry[1]
+    
+    def put(self, token: str, record: SessionRecord) -> None:
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                # Самая старая запись: dict хранит порядок вставки
+                self._drop(next(iter(self._entries)))
+            self._drop(token)
+            self._entries[token] = (time.monotonic(), record)
+            self._by_user.setdefault(record['user']['id'], set()).add(token)
+    
+    def invalidate_token(self, token: str) -> None:
+        with self._lock:
+            self._drop(token)
+            self._revoked_tokens[token] = time.time()
+    
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for token in list(self._by_user.get(user_id, ())):
+                self._drop(token)
+            self._revoked_users[user_id] = time.time()
+    
+    def _drop(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry:
+            tokens = self._by_user.get(entry[1]['user']['id'])
+            if tokens:
+                tokens.discard(token)
+    
+    def poll_due(self) -> bool:
+        return time.monotonic() - self._polled_at >= self.poll_interval
+    
+    def poll_revocations(self, conn: Any) -> None:
+        '''
+        Забирает выходы и изменения пользователей с прошлого опроса. Окно перекрывается
+        на poll_interval, чтобы не пропустить транзакции, закоммиченные позже своей метки времени.
+        '''
+        with conn.cursor() as cur:
+            cur.execute('SELECT LOCALTIMESTAMP')
+            now = cur.fetchone()[0]
+            # Холодный инстанс забирает отзывы за время жизни подписанных токенов
+            since = self._watermark or now - timedelta(seconds=self.token_ttl)
+            cur.execute('''
+                SELECT NULL, session_token FROM user_sessions WHERE logged_out_at > %s
+                UNION ALL
+                SELECT id, NULL FROM users WHERE updated_at > %s
+            ''', (since, since))
+            rows = cur.fetchall()
+        conn.rollback()
+        
+        for user_id, token in rows:
+            if token:
+                self.invalidate_token(token)
+            else:
+                self.invalidate_user(user_id)
+        with self._lock:
+            self._watermark = now - timedelta(seconds=self.poll_interval)
+            self._polled_at = time.monotonic()
+            cutoff = time.time() - self.token_ttl
+            self._revoked_tokens = {t: at for t, at in self._revoked_tokens.items() if at >= cutoff}
+            self._revoked_users = {u: at for u, at in self._revoked_users.items() if at >= cutoff}
+    
+    def sign(self, token: str, record: SessionRecord) -> str:
+        '''Подписанный токен с данными сессии; без ключа — непрозрачный токен как есть'''
+        if not self.signing_key:
+            return token
+        now = time.time()
+        payload = encode(json.dumps({**record, 'iat': now, 'exp': now + self.token_ttl}, separators=(',', ':')).encode())
+        return f'{token}.{payload}.{self._signature(token, payload)}'
+    
+    def verify_signed(self, signed: str) -> Tuple[str, Optional[SessionRecord]]:
+        '''
+        (непрозрачный токен, данные сессии), если подпись верна, срок не истёк и отзыва не было;
+        иначе данные None — нужна проверка по БД.
+        '''
+        token, _, rest = signed.partition('.')
+        if not self.signing_key or not rest:
+            return token, None
+        payload, _, signature = rest.partition('.')
+        if not hmac.compare_digest(signature, self._signature(token, payload)):
+            return token, None
+        try:
+            record = json.loads(decode(payload))
+        except ValueError:
+            return token, None
+        issued_at = record.pop('iat', 0)
+        if record.pop('exp', 0) < time.time():
+            return token, None
+        with self._lock:
+            if token in self._revoked_tokens or self._revoked_users.get(record['user']['id'], 0) >= issued_at:
+                return token, None
+        return token, record
+    
+    def _signature(self, token: str, payload: str) -> str:
+        return encode(hmac.new(self.signing_key, f'{token}.{payload}'.encode(), hashlib.sha256).digest())
+
+
+def encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
@@ -1,7 +1,9 @@
 import json
-import os
 import psycopg2
 from typing import Dict, Any
+from db_pool import ConnectionPool
+
+POOL = ConnectionPool.from_env()
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -52,8 +54,14 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'body': json.dumps({'error': 'Login and password required'})
         }
     
-    dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
+    conn = POOL.getconn()
+    try:
+        return insert_account(conn, login, password)
+    finally:
+        POOL.putconn(conn)
+
+def insert_account(conn, login: str, password: str) -> Dict[str, Any]:
+    '''Создание активного аккаунта'''
     cur = conn.cursor()
     
     try:
@@ -69,9 +77,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'message': 'Account created successfully'
         }
         
-        cur.close()
-        conn.close()
-        
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -80,8 +85,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     except psycopg2.IntegrityError:
         conn.rollback()
-        cur.close()
-        conn.close()
         return {
             'statusCode': 400,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
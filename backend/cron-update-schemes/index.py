@@ -1,9 +1,24 @@
 import json
 import os
-import psycopg2
-from datetime import datetime, timedelta
-from typing import Dict, Any, List
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from exchanges import EXCHANGES
+from orderbook import executable_spread
+from schemes_store import SchemeRow, save_schemes, prune_schemes
+from db_pool import ConnectionPool
+
+POOL = ConnectionPool.from_env()
+
+# Объём сделки в USDT, на котором проверяется исполнимость спреда по стаканам
+SCHEME_NOTIONAL_USD = float(os.environ.get('SCHEME_NOTIONAL_USD', '10000'))
+ADAPTERS_BY_NAME = {adapter.name: adapter for adapter in EXCHANGES.values()}
+# Те же спотовые биржи, что и в crypto-prices
+SCAN_EXCHANGES = ['kucoin', 'gate', 'mexc', 'htx', 'bybit', 'okx']
+SCAN_POOL = ThreadPoolExecutor(max_workers=16)
+SESSION = requests.Session()
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -25,70 +40,31 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     print(f'[CRON] Starting automatic schemes update at {datetime.now().isoformat()}')
     
-    dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
-    cur = conn.cursor()
-    
     cryptos = ['BTC', 'ETH', 'USDT', 'BNB', 'SOL', 'XRP', 'ADA', 'DOGE', 'TRX', 'MATIC']
-    new_schemes = 0
-    deleted_schemes = 0
-    errors = []
-    
-    for crypto in cryptos:
-        try:
-            print(f'[CRON] Fetching prices for {crypto}')
-            response = requests.get(
-                f'https://functions.poehali.dev/ac977fcc-5718-4e2b-b050-2421e770d97e?crypto={crypto}',
-                timeout=15
-            )
-            
-            if response.ok:
-                data = response.json()
-                exchanges = data.get('exchanges', [])
-                
-                if len(exchanges) >= 2:
-                    exchanges_sorted = sorted(exchanges, key=lambda x: x['price'])
-                    buy_ex = exchanges_sorted[0]
-                    sell_ex = exchanges_sorted[-1]
-                    
-                    spread_percent = ((sell_ex['price'] - buy_ex['price']) / buy_ex['price']) * 100
-                    profit_usd = (sell_ex['price'] - buy_ex['price']) * 1
-                    
-                    if spread_percent >= 0.1:
-                        cur.execute(
-                            "INSERT INTO arbitrage_schemes (crypto, buy_exchange, sell_exchange, buy_price, sell_price, spread_percent, profit_usd) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-                            (crypto, buy_ex['name'], sell_ex['name'], buy_ex['price'], sell_ex['price'], spread_percent, profit_usd)
-                        )
-                        new_schemes += 1
-                        print(f'[CRON] Added scheme for {crypto}: {spread_percent:.2f}% spread')
-                    else:
-                        print(f'[CRON] Skipped {crypto}: spread too low ({spread_percent:.2f}%)')
-            else:
-                errors.append(f'{crypto}: HTTP {response.status_code}')
-                print(f'[CRON] Error fetching {crypto}: {response.status_code}')
-        except Exception as e:
-            errors.append(f'{crypto}: {str(e)}')
-            print(f'[CRON] Error processing {crypto}: {str(e)}')
+    errors: List[str] = []
     
-    yesterday = datetime.now() - timedelta(days=1)
-    cur.execute(
-        "DELETE FROM arbitrage_schemes WHERE created_at < %s OR spread_percent < 0.05",
-        (yesterday,)
-    )
-    deleted_schemes = cur.rowcount
-    print(f'[CRON] Deleted {deleted_schemes} old schemes')
+    started = time.monotonic()
+    scheme_rows = scan_schemes(cryptos, errors)
+    print(f'[CRON] Scanned {len(cryptos)} cryptos in {time.monotonic() - started:.2f}s')
     
-    conn.commit()
-    cur.close()
-    conn.close()
+    conn = POOL.getconn()
+    try:
+        with conn.cursor() as cur:
+            new_schemes, updated_schemes = save_schemes(cur, scheme_rows)
+            deleted_schemes = prune_schemes(cur)
+        conn.commit()
+    finally:
+        POOL.putconn(conn)
+    print(f'[CRON] Saved {len(scheme_rows)} schemes in one batch, deleted {deleted_schemes} stale')
     
     result = {
         'success': True,
         'new_schemes': new_schemes,
+        'updated_schemes': updated_schemes,
         'deleted_schemes': deleted_schemes,
         'errors': errors,
         'timestamp': datetime.now().isoformat(),
-        'message': f'CRON: Updated {new_schemes} schemes, deleted {deleted_schemes} old'
+        'message': f'CRON: Added {new_schemes} schemes, updated {updated_schemes}, deleted {deleted_schemes} stale'
     }
     
     print(f'[CRON] Completed: {result["message"]}')
@@ -102,3 +78,88 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         'isBase64Encoded': False,
         'body': json.dumps(result)
     }
+
+
+def scan_schemes(cryptos: List[str], errors: List[str]) -> List[SchemeRow]:
+    '''
+    Сканирует биржи напрямую, без вызова функции crypto-prices по HTTP:
+    один массовый запрос тикеров к каждой бирже параллельно, затем для лучшей пары
+    каждой монеты — параллельная проверка исполнимого спреда по стаканам.
+    '''
+    matrix = scan_prices(cryptos, errors)
+    
+    candidates: List[Tuple[str, Dict[str, Any], Dict[str, Any]]] = []
+    for crypto in cryptos:
+        exchanges = matrix.get(crypto, [])
+        if len(exchanges) >= 2:
+            exchanges_sorted = sorted(exchanges, key=lambda x: x['price'])
+            candidates.append((crypto, exchanges_sorted[0], exchanges_sorted[-1]))
+    
+    fills = [
+        SCAN_POOL.submit(simulate_fill, crypto, buy_ex['name'], sell_ex['name'], SCHEME_NOTIONAL_USD)
+        for crypto, buy_ex, sell_ex in candidates
+    ]
+    
+    scheme_rows: List[SchemeRow] = []
+    for (crypto, buy_ex, sell_ex), fill_future in zip(candidates, fills):
+        try:
+            spread_percent = ((sell_ex['price'] - buy_ex['price']) / buy_ex['price']) * 100
+            # Без стаканов — та же прибыль на SCHEME_NOTIONAL_USD, но по спреду последних цен
+            profit_usd = SCHEME_NOTIONAL_USD * spread_percent / 100
+            
+            fill = fill_future.result()
+            if fill:
+                spread_percent = fill['spread']
+                profit_usd = fill['profit']
+                print(f'[CRON] {crypto}: executable spread {spread_percent:.2f}% on ${SCHEME_NOTIONAL_USD:.0f}')
+            
+            if spread_percent >= 0.1:
+                scheme_rows.append((crypto, buy_ex['name'], sell_ex['name'], buy_ex['price'], sell_ex['price'], spread_percent, profit_usd))
+                print(f'[CRON] Scheme for {crypto}: {spread_percent:.2f}% spread')
+            else:
+                print(f'[CRON] Skipped {crypto}: spread too low ({spread_percent:.2f}%)')
+        except Exception as e:
+            errors.append(f'{crypto}: {str(e)}')
+            print(f'[CRON] Error processing {crypto}: {str(e)}')
+    
+    return scheme_rows
+
+
+def scan_prices(cryptos: List[str], errors: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    '''Цены монет по биржам: {crypto: [{name, price}, ...]}'''
+    futures = {key: SCAN_POOL.submit(EXCHANGES[key].fetch_all, cryptos, get_json) for key in SCAN_EXCHANGES}
+    matrix: Dict[str, List[Dict[str, Any]]] = {}
+    for key, future in futures.items():
+        try:
+            quotes = future.result()
+        except Exception as e:
+            errors.append(f'{EXCHANGES[key].name}: {str(e)}')
+            print(f'[CRON] Error fetching {EXCHANGES[key].name}: {str(e)}')
+            continue
+        for crypto, quote in quotes.items():
+            matrix.setdefault(crypto, []).append({'name': EXCHANGES[key].name, 'price': quote['price']})
+    return matrix
+
+
+def get_json(url: str, timeout: float, kind: str = 'default') -> Any:
+    '''kind — вид запроса из адаптера; здесь без адаптивных таймаутов не используется'''
+    response = SESSION.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def simulate_fill(crypto: str, buy_name: str, sell_name: str, notional: float) -> Optional[Dict[str, Any]]:
+    '''Исполнимый спред по стаканам бирж на объём notional; None, если стакан недоступен или мелкий'''
+    buy_adapter = ADAPTERS_BY_NAME.get(buy_name)
+    sell_adapter = ADAPTERS_BY_NAME.get(sell_name)
+    if not buy_adapter or not sell_adapter:
+        return None
+    try:
+        buy_book = buy_adapter.fetch_book(crypto, get_json)
+        sell_book = sell_adapter.fetch_book(crypto, get_json)
+    except Exception as e:
+        print(f'[CRON] Order book error for {crypto}: {str(e)}')
+        return None
+    if not buy_book or not sell_book:
+        return None
+    return executable_spread(buy_book, sell_book, notional, buy_adapter.fee, sell_adapter.fee)
@@ -0,0 +1,54 @@
+'''
+Запись связок в БД пачкой: одна живая строка на (crypto, buy_exchange, sell_exchange)
+в arbitrage_schemes обновляется на месте, каждый замер добавляется в arbitrage_scheme_history.
+Обе вставки — один execute_values, без запроса на каждую монету.
+'''
+from datetime import datetime, timedelta
+from typing import Any, List, Tuple
+from psycopg2.extras import execute_values
+
+# (crypto, buy_exchange, sell_exchange, buy_price, sell_price, spread_percent, profit_usd)
+SchemeRow = Tuple[str, str, str, float, float, float, float]
+
+
+def save_schemes(cur: Any, rows: List[SchemeRow]) -> Tuple[int, int]:
+    '''Upsert живых связок и запись истории; возвращает (новых, обновлённых)'''
+    if not rows:
+        return 0, 0
+    
+    results = execute_values(
+        cur,
+        """
+        INSERT INTO arbitrage_schemes (crypto, buy_exchange, sell_exchange, buy_price, sell_price, spread_percent, profit_usd)
+        VALUES %s
+        ON CONFLICT (crypto, buy_exchange, sell_exchange) DO UPDATE SET
+            buy_price = EXCLUDED.buy_price,
+            sell_price = EXCLUDED.sell_price,
+            spread_percent = EXCLUDED.spread_percent,
+            profit_usd = EXCLUDED.profit_usd,
+            updated_at = CURRENT_TIMESTAMP
+        RETURNING (xmax = 0)
+        """,
+        rows,
+        page_size=len(rows),
+        fetch=True
+    )
+    inserted = sum(1 for (is_insert,) in results if is_insert)
+    
+    execute_values(
+        cur,
+        "INSERT INTO arbitrage_scheme_history (crypto, buy_exchange, sell_exchange, buy_price, sell_price, spread_percent, profit_usd) VALUES %s",
+        rows,
+        page_size=len(rows)
+    )
+    return inserted, len(rows) - inserted
+
+
+def prune_schemes(cur: Any) -> int:
+    '''Удаляет живые связки, не подтверждавшиеся сутки, и связки с почти нулевым спредом'''
+    yesterday = datetime.now() - timedelta(days=1)
+    cur.execute(
+        "DELETE FROM arbitrage_schemes WHERE updated_at < %s OR spread_percent < 0.05",
+        (yesterday,)
+    )
+    return cur.rowcount
@@ -0,0 +1,253 @@
+import os
+import ssl
+import gzip
+import json
+import zlib
+import time
+import asyncio
+import threading
+from typing import Dict, Any, Awaitable, List, Optional, Tuple
+from urllib.parse import urlsplit
+from health import ExchangeHealth, DEFAULT_KIND
+
+# Ответы, после которых хост считается недоступным: блокировка по региону, лимиты, ошибки сервера
+UNHEALTHY_STATUSES = {403, 418, 429, 451}
+
+
+class HttpError(Exception):
+    def __init__(self, url: str, status: int) -> None:
+        super().__init__(f'HTTP {status} for {url}')
+        self.url = url
+        self.status = status
+
+
+class PooledConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+        self.requests = 0
+    
+    def close(self) -> None:
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class HostPool:
+    '''Keep-alive соединения к одному хосту (scheme + host + port)'''
+    
+    def __init__(self, scheme: str, host: str, port: int, max_size: int, idle_timeout: float) -> None:
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.idle: List[PooledConnection] = []
+        self.slots = asyncio.Semaphore(max_size)
+    
+    async def acquire(self, ssl_context: ssl.SSLContext) -> Tuple[PooledConnection, bool]:
+        '''Возвращает соединение и признак того, что оно взято из пула (уже использовалось)'''
+        now = time.monotonic()
+        while self.idle:
+            conn = self.idle.pop()
+            if now - conn.last_used < self.idle_timeout and not conn.reader.at_eof():
+                return conn, True
+            conn.close()
+        
+        reader, writer = await asyncio.open_connection(
+            self.host,
+            self.port,
+            ssl=ssl_context if self.scheme == 'https' else None,
+            server_hostname=self.host if self.scheme == 'https' else None
+        )
+        return PooledConnection(reader, writer), False
+    
+    def release(self, conn: PooledConnection, reusable: bool) -> None:
+        if reusable:
+            conn.last_used = time.monotonic()
+            conn.requests += 1
+            self.idle.append(conn)
+        else:
+            conn.close()
+
+
+class AsyncConnector:
+    '''
+    HTTP/1.1 клиент к биржевым API на asyncio с пулом keep-alive соединений на каждый хост.
+    Цикл событий работает в фоновом потоке и переживает тёплые вызовы функции,
+    поэтому повторные запросы идут по уже открытым TCP/TLS соединениям без DNS и рукопожатий.
+    Синхронный get_json позволяет вызывать коннектор из обычных fetch_* функций.
+    Каждый запрос fetch_json проходит через circuit breaker хоста (health): к недоступной
+    бирже запросы сразу отклоняются, а таймаут подстраивается под её обычную задержку.
+    
+    EXCHANGE_STUB_URL перенаправляет все запросы на локальный стаб:
+    https://api.bybit.com/v5/... -> {EXCHANGE_STUB_URL}/api.bybit.com/v5/...
+    '''
+    
+    def __init__(self, max_per_host: int = 8, idle_timeout: float = 20, stub_url: Optional[str] = None,
+                 health: Optional[ExchangeHealth] = None) -> None:
+        self.max_per_host = max_per_host
+        self.health = health or ExchangeHealth()
+        self.idle_timeout = idle_timeout
+        self.stub_url = stub_url.rstrip('/') if stub_url else None
+        self.ssl_context = ssl.create_default_context()
+        self.pools: Dict[Tuple[str, str, int], HostPool] = {}
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='exchange-connector', daemon=True)
+        self._thread.start()
+    
+    @classmethod
+    def from_env(cls) -> 'AsyncConnector':
+        return cls(
+            max_per_host=int(os.environ.get('CONNECTOR_MAX_PER_HOST', '8')),
+            stub_url=os.environ.get('EXCHANGE_STUB_URL'),
+            health=ExchangeHealth.from_env()
+        )
+    
+    def get_json(self, url: str, timeout: float = 2, headers: Optional[Dict[str, str]] = None,
+                 kind: str = DEFAULT_KIND, circuit: Optional[str] = None) -> Any:
+        future = asyncio.run_coroutine_threadsafe(
+            self.fetch_json(url, timeout, headers, kind=kind, circuit=circuit), self.loop
+        )
+        return future.result()
+    
+    def run(self, coroutine: Awaitable[Any]) -> Any:
+        '''Выполняет корутину на цикле коннектора и ждёт результата из синхронного кода'''
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+    
+    async def fetch_json(self, url: str, timeout: float = 2, headers: Optional[Dict[str, str]] = None,
+                         payload: Any = None, kind: str = DEFAULT_KIND, circuit: Optional[str] = None) -> Any:
+        '''
+        GET, а с payload — POST с JSON-телом. timeout — верхняя граница: при известной
+        задержке запросов вида kind к хосту используется адаптивный таймаут.
+        circuit — ключ автомата вместо хоста (разные сервисы за одним хостом).
+        CircuitOpenError, если автомат открыт.
+        '''
+        host = circuit or urlsplit(url).hostname or ''
+        limit = self.health.acquire(host, timeout, kind)
+        if payload is None:
+            request = self.request('GET', url, headers=headers)
+        else:
+            json_headers = {'Content-Type': 'application/json'}
+            json_headers.update(headers or {})
+            request = self.request('POST', url, json.dumps(payload).encode(), json_headers)
+        
+        started = time.monotonic()
+        try:
+            body = await asyncio.wait_for(request, limit)
+        except asyncio.TimeoutError as e:
+            self.health.failure(host, e, time.monotonic() - started, kind)
+            raise
+        except asyncio.CancelledError:
+            self.health.abandon(host)
+            raise
+        except HttpError as e:
+            if e.status in UNHEALTHY_STATUSES or e.status >= 500:
+                self.health.failure(host, e)
+            else:
+                self.health.success(host, time.monotonic() - started, kind)
+            raise
+        except Exception as e:
+            self.health.failure(host, e)
+            raise
+        self.health.success(host, time.monotonic() - started, kind)
+        return json.loads(body.decode())
+    
+    async def request(self, method: str, url: str, body: Optional[bytes] = None,
+                      headers: Optional[Dict[str, str]] = None) -> bytes:
+        if self.stub_url:
+            parts = urlsplit(url)
+            url = f'{self.stub_url}/{parts.netloc}{parts.path}' + (f'?{parts.query}' if parts.query else '')
+        
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname or '', port)
+        pool = self.pools.get(key)
+        if pool is None:
+            pool = self.pools[key] = HostPool(parts.scheme, key[1], port, self.max_per_host, self.idle_timeout)
+        
+        target = parts.path or '/'
+        if parts.query:
+            target += f'?{parts.query}'
+        
+        request_headers = {
+            'Host': parts.netloc,
+            'User-Agent': 'Mozilla/5.0',
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive'
+        }
+        request_headers.update(headers or {})
+        if body is not None:
+            request_headers['Content-Length'] = str(len(body))
+        head = f'{method} {target} HTTP/1.1\r\n' + ''.join(f'{k}: {v}\r\n' for k, v in request_headers.items()) + '\r\n'
+        payload = head.encode('latin-1') + (body or b'')
+        
+        async with pool.slots:
+            # Переиспользованное соединение могло быть закрыто сервером — тогда одна повторная попытка на новом
+            for attempt in range(2):
+                conn, reused = await pool.acquire(self.ssl_context)
+                try:
+                    conn.writer.write(payload)
+                    await conn.writer.drain()
+                    status, response_headers, data, keep_alive = await read_response(conn.reader)
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    pool.release(conn, False)
+                    if reused and attempt == 0:
+                        continue
+                    raise e
+                except BaseException:
+                    pool.release(conn, False)
+                    raise
+                
+                pool.release(conn, keep_alive)
+                if status >= 400:
+                    raise HttpError(url, status)
+                return decode_body(data, response_headers.get('content-encoding', ''))
+        
+        raise ConnectionError(f'Failed to fetch {url}')
+
+
+async def read_response(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str], bytes, bool]:
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError('Connection closed by server')
+    status = int(status_line.split(b' ', 2)[1])
+    
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    
+    keep_alive = headers.get('connection', '').lower() != 'close'
+    
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0].strip(), 16)
+            if size == 0:
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        data = b''.join(chunks)
+    elif 'content-length' in headers:
+        data = await reader.readexactly(int(headers['content-length']))
+    else:
+        data = await reader.read()
+        keep_alive = False
+    
+    return status, headers, data, keep_alive
+
+
+def decode_body(data: bytes, encoding: str) -> bytes:
+    if encoding == 'gzip':
+        return gzip.decompress(data)
+    if encoding == 'deflate':
+        return zlib.decompress(data)
+    return data
@@ -1,8 +1,46 @@
 import json
-import urllib.request
-import urllib.error
-from typing import Dict, Any, List, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import math
+import os
+import time
+import threading
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError, wait
+from quote_cache import QuoteCache
+from connector import AsyncConnector
+from health import CircuitOpenError, CLOSED, DEFAULT_KIND
+from exchanges import EXCHANGES, SUPPORTED_CRYPTOS, ExchangeAdapter, Quote
+from streams import LiveQuotes, StreamWorker
+from price_feed import PriceFeed
+from price_history import PriceHistory
+
+QUOTES = QuoteCache.from_env()
+CONNECTOR = AsyncConnector.from_env()
+# Circuit breaker и задержки хостов бирж: общие для всех тёплых вызовов
+HEALTH = CONNECTOR.health
+# Если биржа недоступна, отдаём её последние цены из кэша не старше этого срока с пометкой в dataSource
+STALE_MAX_AGE = float(os.environ.get('STALE_MAX_AGE', '600'))
+# Тикер-потоки бирж пишут в LIVE в фоне; handler берёт оттуда свежие цены без сети
+LIVE = LiveQuotes()
+# Лента изменений для ?feed= и история для ?history=: пополняются из потоков и из REST-загрузок
+FEED = PriceFeed()
+HISTORY = PriceHistory.from_env()
+LIVE.listeners.append(lambda key, crypto, quote: ingest(key, crypto, stream_row(key, quote)))
+STREAMS = StreamWorker.from_env(CONNECTOR, LIVE)
+if STREAMS:
+    STREAMS.start()
+STREAM_MAX_AGE = float(os.environ.get('STREAM_MAX_AGE', '10'))
+FX_POOL = ThreadPoolExecutor(max_workers=2)
+# Общий пул переживает вызовы: незавершённые к дедлайну запросы дорабатывают в фоне и пополняют кэш
+FETCH_POOL = ThreadPoolExecutor(max_workers=32)
+
+DEFAULT_DEADLINE_MS = 3000
+FEED_MAX_WAIT = 25
+# Пока запрос ленты ждёт, биржи без живого потока перезагружаются не реже раза в QUOTE_CACHE_TTL
+FEED_MIN_REFRESH = 0.5
+
+FX_CURRENCIES = ['RUB', 'EUR', 'KZT', 'UAH']
+FALLBACK_FX_RATES = {'RUB': 95.0, 'EUR': 0.92, 'KZT': 480.0, 'UAH': 41.0}
+FX_CACHE_TTL = float(os.environ.get('FX_CACHE_TTL', '3600'))
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -26,74 +64,145 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     
     if method != 'GET':
-        return {
-            'statusCode': 405,
-            'headers': {'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
+        return error_response(405, 'Method not allowed')
     
     params = event.get('queryStringParameters', {}) or {}
+    
+    if 'feed' in params:
+        return feed_response(event, params)
+    
+    if 'history' in params:
+        return history_response(params)
+    
     crypto = params.get('crypto', 'BTC').upper()
     currency = params.get('currency', 'USD').upper()
     
+    try:
+        deadline_ms = min(max(int(params.get('deadlineMs', DEFAULT_DEADLINE_MS)), 100), 10000)
+    except ValueError:
+        return error_response(400, 'deadlineMs must be an integer')
+    deadline = time.monotonic() + deadline_ms / 1000
+    
+    fx_future = FX_POOL.submit(get_fx_table) if currency in FX_CURRENCIES else None
+    
+    if crypto == 'ALL' or ',' in crypto:
+        cryptos = SUPPORTED_CRYPTOS if crypto == 'ALL' else [c.strip() for c in crypto.split(',') if c.strip()]
+        matrix, sources = fetch_matrix(cryptos, deadline)
+        
+        fx = fx_quote(await_fx_table(fx_future, deadline), currency) if fx_future else None
+        if fx:
+            for rows in matrix.values():
+                convert_prices(rows, fx['rate'])
+        
+        return success_response({
+            'matrix': matrix,
+            'cryptos': cryptos,
+            'crypto': crypto,
+            'fx': fx,
+            'sources': sources,
+            'pending': [name for name, status in sources.items() if status == 'timeout'],
+            'health': exchange_health(),
+            'timestamp': context.request_id
+        })
+    
     exchanges: List[Dict[str, Any]] = []
+    sources: Dict[str, str] = {}
+    fx: Optional[Dict[str, Any]] = None
     
     if crypto == 'USDT':
-        base_price = 1.0
-        if currency == 'RUB':
-            try:
-                usd_rub = fetch_usd_rub_rate()
-                base_price = usd_rub if usd_rub else 95.0
-            except:
-                base_price = 95.0
-        
-        exchanges = [
-            {'name': 'Binance', 'price': base_price * 1.0005, 'volume': 50000, 'fee': 0.1, 'change24h': 0.01, 'url': 'https://www.binance.com', 'dataSource': 'Stablecoin'},
-            {'name': 'Bybit', 'price': base_price * 0.9998, 'volume': 30000, 'fee': 0.1, 'change24h': -0.02, 'url': 'https://www.bybit.com', 'dataSource': 'Stablecoin'},
-            {'name': 'OKX', 'price': base_price * 1.0002, 'volume': 40000, 'fee': 0.08, 'change24h': 0.00, 'url': 'https://www.okx.com', 'dataSource': 'Stablecoin'},
-            {'name': 'KuCoin', 'price': base_price * 0.9995, 'volume': 25000, 'fee': 0.1, 'change24h': -0.05, 'url': 'https://www.kucoin.com', 'dataSource': 'Stablecoin'},
-            {'name': 'Gate.io', 'price': base_price * 1.0008, 'volume': 20000, 'fee': 0.2, 'change24h': 0.03, 'url': 'https://www.gate.io', 'dataSource': 'Stablecoin'},
-            {'name': 'HTX', 'price': base_price * 0.9992, 'volume': 15000, 'fee': 0.2, 'change24h': -0.08, 'url': 'https://www.htx.com', 'dataSource': 'Stablecoin'},
-            {'name': 'MEXC', 'price': base_price * 1.0012, 'volume': 18000, 'fee': 0.2, 'change24h': 0.05, 'url': 'https://www.mexc.com', 'dataSource': 'Stablecoin'},
-            {'name': 'Exmo', 'price': base_price * 1.0015, 'volume': 5000, 'fee': 0.4, 'change24h': 0.10, 'url': 'https://exmo.com', 'dataSource': 'Stablecoin'},
-        ]
+        fx = fx_quote(await_fx_table(fx_future, deadline), currency) if fx_future else None
+        exchanges = stablecoin_rows(fx['rate'] if fx else 1.0)
     else:
-        fetch_functions = [
-            fetch_kucoin,
-            fetch_gate,
-            fetch_mexc,
-            fetch_htx,
-            fetch_bybit,
-            fetch_okx,
-            fetch_bestchange,
-            fetch_cryptomus,
-            fetch_exmo,
-            fetch_bybit_p2p
-        ]
+        memo = TickerMemo()
+        
+        future_to_source = {FETCH_POOL.submit(memo.get, key, crypto): key for key in SPOT_EXCHANGES}
+        future_to_source.update({FETCH_POOL.submit(func, crypto, memo): source_name(func) for func in P2P_FETCHERS})
+        
+        done, _ = wait(future_to_source, timeout=time_left(deadline))
         
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_exchange = {executor.submit(func, crypto): func.__name__ for func in fetch_functions}
-            
-            for future in as_completed(future_to_exchange):
+        for future, name in future_to_source.items():
+            result = None
+            if future not in done:
+                sources[name] = 'timeout'
+            else:
                 try:
-                    result = future.result(timeout=3)
-                    if result:
-                        exchanges.append(result)
+                    result = future.result()
+                    sources[name] = 'ok' if result else 'empty'
                 except Exception as e:
-                    print(f'{future_to_exchange[future]} error: {e}')
+                    sources[name] = source_error(name, e)
+            if name in EXCHANGES:
+                result = checked_rows(name, {crypto: result} if result else {}, lambda: cached_ticker(name, crypto)).get(crypto)
+            if result:
+                exchanges.append(dict(result))
         
         if not exchanges:
             print(f'WARNING: No exchanges fetched for {crypto}')
         
-        if currency == 'RUB' and exchanges:
-            try:
-                usd_rub = fetch_usd_rub_rate()
-                for exchange in exchanges:
-                    exchange['price'] = round(exchange['price'] * usd_rub, 2)
-            except Exception as e:
-                print(f'Currency conversion error: {e}')
+        fx = fx_quote(await_fx_table(fx_future, deadline), currency) if fx_future else None
+        if fx:
+            convert_prices(exchanges, fx['rate'])
     
+    return success_response({
+        'exchanges': exchanges,
+        'crypto': crypto,
+        'fx': fx,
+        'sources': sources,
+        'pending': [name for name, status in sources.items() if status == 'timeout'],
+        'health': exchange_health(),
+        'timestamp': context.request_id
+    })
+
+
+def time_left(deadline: float) -> float:
+    return max(0.0, deadline - time.monotonic())
+
+
+def source_name(func: Callable[..., Any]) -> str:
+    return func.__name__[len('fetch_'):]
+
+
+def source_error(name: str, error: Exception) -> str:
+    '''Статус источника по ошибке: circuit-open, если запрос отклонён автоматом без обращения к бирже'''
+    if isinstance(error, CircuitOpenError):
+        return 'circuit-open'
+    print(f'{name} error: {error}')
+    return 'error'
+
+
+def checked_rows(key: str, rows: Dict[str, Dict[str, Any]],
+                 cached: Callable[[], Optional[Tuple[float, Dict[str, Dict[str, Any]]]]]) -> Dict[str, Dict[str, Any]]:
+    '''
+    Строки биржи по монетам с учётом её здоровья. Если строк нет (ошибка, таймаут, открытый автомат),
+    берутся последние из кэша (cached — возраст и строки). Строки из кэша и строки биржи,
+    чей автомат не закрыт, помечаются в dataSource как устаревшие.
+    '''
+    adapter = EXCHANGES[key]
+    if rows and HEALTH.state(adapter.host) == CLOSED:
+        return rows
+    entry = cached()
+    age = entry[0] if entry else 0.0
+    if not rows:
+        rows = entry[1] if entry else {}
+    return {crypto: stale_row(adapter, row, age) for crypto, row in rows.items() if row}
+
+
+def cached_ticker(key: str, crypto: str) -> Optional[Tuple[float, Dict[str, Dict[str, Any]]]]:
+    entry = QUOTES.peek(ticker_key(key, crypto), STALE_MAX_AGE)
+    return (entry[0], {crypto: entry[1]}) if entry else None
+
+
+def stale_row(adapter: ExchangeAdapter, row: Dict[str, Any], age: float) -> Dict[str, Any]:
+    if row['dataSource'].endswith('WebSocket'):
+        return row
+    return {**row, 'dataSource': f'{adapter.data_source} (устарело: {int(age)} с)', 'stale': True, 'ageSeconds': int(age)}
+
+
+def exchange_health() -> Dict[str, Dict[str, Any]]:
+    '''Состояние автоматов и задержки REST API спотовых бирж'''
+    return {EXCHANGES[key].name: HEALTH.snapshot(EXCHANGES[key].host) for key in SPOT_EXCHANGES}
+
+
+def success_response(data: Dict[str, Any]) -> Dict[str, Any]:
     return {
         'statusCode': 200,
         'headers': {
@@ -102,273 +211,291 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'Access-Control-Allow-Methods': 'GET, OPTIONS',
             'Access-Control-Allow-Headers': 'Content-Type, Cache-Control, Pragma'
         },
-        'body': json.dumps({
-            'exchanges': exchanges,
-            'crypto': crypto,
-            'timestamp': context.request_id
-        }),
+        'body': json.dumps(data),
         'isBase64Encoded': False
     }
 
 
-def fetch_binance(crypto: str) -> Optional[Dict[str, Any]]:
-    symbol_map = {
-        'BTC': 'BTCUSDT',
-        'ETH': 'ETHUSDT',
-        'USDT': None,
-        'SOL': 'SOLUSDT',
-        'XRP': 'XRPUSDT',
-        'BNB': 'BNBUSDT',
-        'ADA': 'ADAUSDT',
-        'DOGE': 'DOGEUSDT',
-        'AVAX': 'AVAXUSDT',
-        'DOT': 'DOTUSDT',
-        'MATIC': 'MATICUSDT',
-        'LINK': 'LINKUSDT',
-        'UNI': 'UNIUSDT',
-        'LTC': 'LTCUSDT',
-        'TRX': 'TRXUSDT',
-        'ATOM': 'ATOMUSDT',
-        'XLM': 'XLMUSDT',
-        'ETC': 'ETCUSDT',
-        'FIL': 'FILUSDT',
-        'SHIB': 'SHIBUSDT'
+def error_response(status_code: int, message: str) -> Dict[str, Any]:
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({'error': message}),
+        'isBase64Encoded': False
     }
+
+
+def feed_response(event: Dict[str, Any], params: Dict[str, str]) -> Dict[str, Any]:
+    '''
+    Изменившиеся строки бирж после курсора: ?feed=sse — в формате Server-Sent Events
+    (курсор из заголовка Last-Event-ID, EventSource переподключается сам), ?feed=json — long-poll
+    (курсор в параметре since). Без курсора отдаётся полный снимок; wait — сколько секунд
+    ждать изменений, если их нет. Ожидание идёт отрезками по QUOTE_CACHE_TTL, перед каждым
+    биржи без живого потока обновляются, так что новая цена доходит до клиента за один TTL.
+    '''
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    cryptos = {c.strip() for c in params.get('crypto', '').upper().split(',') if c.strip()} or None
+    try:
+        wait_seconds = min(max(float(params.get('wait', FEED_MAX_WAIT)), 0), FEED_MAX_WAIT)
+    except ValueError:
+        return error_response(400, 'wait must be a number')
+    sse = params.get('feed') == 'sse'
     
-    symbol = symbol_map.get(crypto)
-    if not symbol:
-        return None
+    since = FEED.parse_cursor(headers.get('last-event-id') or params.get('since'))
+    deadline = time.monotonic() + wait_seconds
+    while True:
+        polled = refresh_polled_exchanges()
+        remaining = max(deadline - time.monotonic(), 0)
+        step = min(remaining, max(QUOTES.ttl, FEED_MIN_REFRESH)) if polled else remaining
+        version, changes = FEED.wait_changes(since, cryptos, step)
+        if changes or time.monotonic() >= deadline:
+            break
+    cursor = FEED.cursor(version)
     
-    url = f'https://api.binance.com/api/v3/ticker/24hr?symbol={symbol}'
-    req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    if not sse:
+        return success_response({'cursor': cursor, 'reset': since == 0, 'changes': changes})
     
-    with urllib.request.urlopen(req, timeout=2) as response:
-        data = json.loads(response.read().decode())
-        return {
-            'name': 'Binance',
-            'price': float(data['lastPrice']),
-            'volume': round(float(data['volume']) / 1000000, 1),
-            'fee': 0.1,
-            'change24h': round(float(data['priceChangePercent']), 2),
-            'url': 'https://www.binance.com',
-            'dataSource': 'Binance Public API'
-        }
-
-def fetch_bybit(crypto: str) -> Optional[Dict[str, Any]]:
-    symbol_map = {
-        'BTC': 'BTCUSDT', 'ETH': 'ETHUSDT', 'SOL': 'SOLUSDT',
-        'XRP': 'XRPUSDT', 'BNB': 'BNBUSDT', 'ADA': 'ADAUSDT',
-        'DOGE': 'DOGEUSDT', 'AVAX': 'AVAXUSDT', 'DOT': 'DOTUSDT',
-        'MATIC': 'MATICUSDT', 'LINK': 'LINKUSDT', 'UNI': 'UNIUSDT',
-        'LTC': 'LTCUSDT', 'TRX': 'TRXUSDT', 'ATOM': 'ATOMUSDT',
-        'XLM': 'XLMUSDT', 'ETC': 'ETCUSDT', 'FIL': 'FILUSDT', 'SHIB': 'SHIBUSDT'
+    if changes:
+        body = f"retry: 500\nid: {cursor}\nevent: prices\ndata: {json.dumps({'reset': since == 0, 'changes': changes})}\n\n"
+    else:
+        body = f'retry: 500\nid: {cursor}\n: no changes\n\n'
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': body,
+        'isBase64Encoded': False
     }
-    symbol = symbol_map.get(crypto)
-    if not symbol:
-        return None
-    
-    url = f'https://api.bybit.com/v5/market/tickers?category=spot&symbol={symbol}'
-    req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-    
-    with urllib.request.urlopen(req, timeout=2) as response:
-        data = json.loads(response.read().decode())
-        if data.get('result') and data['result'].get('list'):
-            ticker = data['result']['list'][0]
-            return {
-                'name': 'Bybit',
-                'price': float(ticker['lastPrice']),
-                'volume': round(float(ticker.get('volume24h', '0')) / 1000000, 1),
-                'fee': 0.1,
-                'change24h': round(float(ticker.get('price24hPcnt', '0')) * 100, 2),
-                'url': 'https://www.bybit.com',
-                'dataSource': 'Bybit Public API'
-            }
-    return None
 
-def fetch_okx(crypto: str) -> Optional[Dict[str, Any]]:
-    symbol_map = {
-        'BTC': 'BTC-USDT', 'ETH': 'ETH-USDT', 'SOL': 'SOL-USDT',
-        'XRP': 'XRP-USDT', 'BNB': 'BNB-USDT', 'ADA': 'ADA-USDT',
-        'DOGE': 'DOGE-USDT', 'AVAX': 'AVAX-USDT', 'DOT': 'DOT-USDT',
-        'MATIC': 'MATIC-USDT', 'LINK': 'LINK-USDT', 'UNI': 'UNI-USDT',
-        'LTC': 'LTC-USDT', 'TRX': 'TRX-USDT', 'ATOM': 'ATOM-USDT',
-        'XLM': 'XLM-USDT', 'ETC': 'ETC-USDT', 'FIL': 'FIL-USDT', 'SHIB': 'SHIB-USDT'
-    }
-    symbol = symbol_map.get(crypto)
-    if not symbol:
-        return None
+
+def refresh_polled_exchanges() -> bool:
+    '''
+    Запустить обновление бирж без живого потока массовым запросом через общий кэш: сколько бы
+    клиентов ни ждали ленту, к бирже уходит не больше одного запроса за QUOTE_CACHE_TTL.
+    False, если все биржи пишут в ленту из потоков.
+    '''
+    polled = [key for key in SPOT_EXCHANGES if not STREAMS or STREAMS.status.get(key) != 'live']
+    for key in polled:
+        FETCH_POOL.submit(fetch_bulk_cached, key)
+    return bool(polled)
+
+
+def history_response(params: Dict[str, str]) -> Dict[str, Any]:
+    '''
+    Свечи цен за диапазон: ?history=1&crypto=BTC[&exchange=bybit][&from=&to=][&resolution=1s|1m|1h|auto].
+    from/to — unix-время в секундах, по умолчанию последний час; без exchange — все биржи монеты.
+    '''
+    crypto = params.get('crypto', 'BTC').upper()
+    try:
+        end = float(params.get('to') or time.time())
+        start = float(params.get('from') or end - 3600)
+        limit = min(max(int(params.get('limit', 1000)), 1), 5000)
+    except ValueError:
+        return error_response(400, 'from/to must be unix timestamps and limit an integer')
+    if not math.isfinite(start) or not math.isfinite(end) or start > end:
+        return error_response(400, 'Invalid history range')
+    resolution = params.get('resolution', 'auto')
     
-    url = f'https://www.okx.com/api/v5/market/ticker?instId={symbol}'
-    req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    series = []
+    for key in HISTORY.series(crypto, params.get('exchange')):
+        # Восстановленная с диска история может содержать биржу, которой уже нет в реестре
+        if key not in EXCHANGES:
+            continue
+        candles = HISTORY.query(key, crypto, start, end, resolution, limit)
+        if candles:
+            candles['name'] = EXCHANGES[key].name
+            series.append(candles)
     
-    with urllib.request.urlopen(req, timeout=2) as response:
-        data = json.loads(response.read().decode())
-        if data.get('data') and len(data['data']) > 0:
-            ticker = data['data'][0]
-            return {
-                'name': 'OKX',
-                'price': float(ticker['last']),
-                'volume': round(float(ticker.get('vol24h', '0')), 1),
-                'fee': 0.08,
-                'change24h': round(float(ticker.get('changePercent', '0')), 2),
-                'url': 'https://www.okx.com',
-                'dataSource': 'OKX Public API'
-            }
-    return None
+    return success_response({'crypto': crypto, 'from': start, 'to': end, 'series': series})
 
-def fetch_kucoin(crypto: str) -> Optional[Dict[str, Any]]:
-    symbol_map = {
-        'BTC': 'BTC-USDT', 'ETH': 'ETH-USDT', 'SOL': 'SOL-USDT',
-        'XRP': 'XRP-USDT', 'BNB': 'BNB-USDT', 'ADA': 'ADA-USDT',
-        'DOGE': 'DOGE-USDT', 'AVAX': 'AVAX-USDT', 'DOT': 'DOT-USDT',
-        'MATIC': 'MATIC-USDT', 'LINK': 'LINK-USDT', 'UNI': 'UNI-USDT',
-        'LTC': 'LTC-USDT', 'TRX': 'TRX-USDT', 'ATOM': 'ATOM-USDT',
-        'XLM': 'XLM-USDT', 'ETC': 'ETC-USDT', 'FIL': 'FIL-USDT', 'SHIB': 'SHIB-USDT'
-    }
-    symbol = symbol_map.get(crypto)
-    if not symbol:
-        return None
+
+def convert_prices(rows: List[Dict[str, Any]], rate: float) -> None:
+    for row in rows:
+        row['price'] = round(row['price'] * rate, 2)
+
+
+def stablecoin_rows(base_price: float) -> List[Dict[str, Any]]:
+    return [
+        {'name': 'Binance', 'price': base_price * 1.0005, 'volume': 50000, 'fee': 0.1, 'change24h': 0.01, 'url': 'https://www.binance.com', 'dataSource': 'Stablecoin'},
+        {'name': 'Bybit', 'price': base_price * 0.9998, 'volume': 30000, 'fee': 0.1, 'change24h': -0.02, 'url': 'https://www.bybit.com', 'dataSource': 'Stablecoin'},
+        {'name': 'OKX', 'price': base_price * 1.0002, 'volume': 40000, 'fee': 0.08, 'change24h': 0.00, 'url': 'https://www.okx.com', 'dataSource': 'Stablecoin'},
+        {'name': 'KuCoin', 'price': base_price * 0.9995, 'volume': 25000, 'fee': 0.1, 'change24h': -0.05, 'url': 'https://www.kucoin.com', 'dataSource': 'Stablecoin'},
+        {'name': 'Gate.io', 'price': base_price * 1.0008, 'volume': 20000, 'fee': 0.2, 'change24h': 0.03, 'url': 'https://www.gate.io', 'dataSource': 'Stablecoin'},
+        {'name': 'HTX', 'price': base_price * 0.9992, 'volume': 15000, 'fee': 0.2, 'change24h': -0.08, 'url': 'https://www.htx.com', 'dataSource': 'Stablecoin'},
+        {'name': 'MEXC', 'price': base_price * 1.0012, 'volume': 18000, 'fee': 0.2, 'change24h': 0.05, 'url': 'https://www.mexc.com', 'dataSource': 'Stablecoin'},
+        {'name': 'Exmo', 'price': base_price * 1.0015, 'volume': 5000, 'fee': 0.4, 'change24h': 0.10, 'url': 'https://exmo.com', 'dataSource': 'Stablecoin'},
+    ]
+
+
+def fetch_matrix(cryptos: List[str], deadline: float) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, str]]:
+    '''
+    Цены сразу по списку монет: один массовый запрос тикеров к каждой бирже.
+    Биржи, у которых все монеты есть в тикер-потоке, обслуживаются из LIVE без запроса.
+    Результаты раскладываются в TickerMemo, поэтому P2P-строки считаются без сети.
+    Биржи, не ответившие до дедлайна, помечаются как timeout.
+    '''
+    memo = TickerMemo()
+    sources: Dict[str, str] = {}
     
-    url = f'https://api.kucoin.com/api/v1/market/stats?symbol={symbol}'
-    req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    coins = [crypto for crypto in cryptos if crypto != 'USDT']
+    streamed = {key: {crypto: live_row(key, crypto) for crypto in coins} for key in SPOT_EXCHANGES}
+    for key, rows in streamed.items():
+        if all(rows.values()):
+            sources[key] = 'stream'
+            for crypto, row in rows.items():
+                memo.put(key, crypto, row)
     
-    with urllib.request.urlopen(req, timeout=2) as response:
-        data = json.loads(response.read().decode())
-        if data.get('code') == '200000' and data.get('data'):
-            ticker = data['data']
-            return {
-                'name': 'KuCoin',
-                'price': float(ticker['last']),
-                'volume': round(float(ticker['volValue']) / 1000000, 1),
-                'fee': 0.1,
-                'change24h': round(float(ticker['changeRate']) * 100, 2),
-                'url': 'https://www.kucoin.com',
-                'dataSource': 'KuCoin Public API'
-            }
-    return None
-
-def fetch_gate(crypto: str) -> Optional[Dict[str, Any]]:
-    symbol_map = {
-        'BTC': 'BTC_USDT', 'ETH': 'ETH_USDT', 'SOL': 'SOL_USDT',
-        'XRP': 'XRP_USDT', 'BNB': 'BNB_USDT', 'ADA': 'ADA_USDT',
-        'DOGE': 'DOGE_USDT', 'AVAX': 'AVAX_USDT', 'DOT': 'DOT_USDT',
-        'MATIC': 'MATIC_USDT', 'LINK': 'LINK_USDT', 'UNI': 'UNI_USDT',
-        'LTC': 'LTC_USDT', 'TRX': 'TRX_USDT', 'ATOM': 'ATOM_USDT',
-        'XLM': 'XLM_USDT', 'ETC': 'ETC_USDT', 'FIL': 'FIL_USDT', 'SHIB': 'SHIB_USDT'
-    }
-    symbol = symbol_map.get(crypto)
-    if not symbol:
-        return None
+    future_to_exchange = {FETCH_POOL.submit(fetch_bulk_cached, key): key for key in SPOT_EXCHANGES if key not in sources}
+    done, _ = wait(future_to_exchange, timeout=time_left(deadline))
     
-    url = f'https://api.gateio.ws/api/v4/spot/tickers?currency_pair={symbol}'
-    req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    for future, key in future_to_exchange.items():
+        rows: Dict[str, Dict[str, Any]] = {}
+        if future not in done:
+            sources[key] = 'timeout'
+        else:
+            try:
+                rows = future.result()
+                sources[key] = 'ok' if rows else 'empty'
+            except Exception as e:
+                sources[key] = source_error(f'{key} bulk', e)
+        rows = checked_rows(key, rows, lambda: QUOTES.peek(f'{key}:*', STALE_MAX_AGE))
+        for crypto in cryptos:
+            memo.put(key, crypto, rows.get(crypto))
     
-    with urllib.request.urlopen(req, timeout=2) as response:
-        data = json.loads(response.read().decode())
-        if data and len(data) > 0:
-            ticker = data[0]
-            return {
-                'name': 'Gate.io',
-                'price': float(ticker['last']),
-                'volume': round(float(ticker['quote_volume']) / 1000000, 1),
-                'fee': 0.2,
-                'change24h': round(float(ticker['change_percentage']), 2),
-                'url': 'https://www.gate.io',
-                'dataSource': 'Gate.io Public API'
-            }
-    return None
-
-def fetch_mexc(crypto: str) -> Optional[Dict[str, Any]]:
-    symbol_map = {
-        'BTC': 'BTCUSDT', 'ETH': 'ETHUSDT', 'SOL': 'SOLUSDT',
-        'XRP': 'XRPUSDT', 'BNB': 'BNBUSDT', 'ADA': 'ADAUSDT',
-        'DOGE': 'DOGEUSDT', 'AVAX': 'AVAXUSDT', 'DOT': 'DOTUSDT',
-        'MATIC': 'MATICUSDT', 'LINK': 'LINKUSDT', 'UNI': 'UNIUSDT',
-        'LTC': 'LTCUSDT', 'TRX': 'TRXUSDT', 'ATOM': 'ATOMUSDT',
-        'XLM': 'XLMUSDT', 'ETC': 'ETCUSDT', 'FIL': 'FILUSDT', 'SHIB': 'SHIBUSDT'
-    }
-    symbol = symbol_map.get(crypto)
-    if not symbol:
-        return None
+    matrix: Dict[str, List[Dict[str, Any]]] = {}
+    for crypto in cryptos:
+        if crypto == 'USDT':
+            matrix[crypto] = stablecoin_rows(1.0)
+            continue
+        rows_for_crypto = [memo.get(key, crypto) for key in SPOT_EXCHANGES]
+        rows_for_crypto += [func(crypto, memo) for func in P2P_FETCHERS]
+        matrix[crypto] = [dict(row) for row in rows_for_crypto if row]
     
-    url = f'https://api.mexc.com/api/v3/ticker/24hr?symbol={symbol}'
-    req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    return matrix, sources
+
+
+def fetch_bulk_cached(key: str) -> Dict[str, Dict[str, Any]]:
+    '''
+    Массовый тикер биржи через общий кэш. Запрашиваются все поддерживаемые монеты,
+    чтобы одна запись кэша обслуживала любой поднабор, а каждая монета
+    дополнительно кладётся в кэш одиночных тикеров.
+    '''
+    def load() -> Dict[str, Dict[str, Any]]:
+        adapter = EXCHANGES[key]
+        quotes = adapter.fetch_all(SUPPORTED_CRYPTOS, fetch_json)
+        rows = {crypto: exchange_row(adapter, quote) for crypto, quote in quotes.items()}
+        for crypto in SUPPORTED_CRYPTOS:
+            QUOTES.put(ticker_key(key, crypto), rows.get(crypto))
+            if rows.get(crypto):
+                ingest(key, crypto, rows[crypto])
+        return rows
     
-    with urllib.request.urlopen(req, timeout=2) as response:
-        data = json.loads(response.read().decode())
-        return {
-            'name': 'MEXC',
-            'price': float(data['lastPrice']),
-            'volume': round(float(data['volume']) / 1000000, 1),
-            'fee': 0.0,
-            'change24h': round(float(data['priceChangePercent']), 2),
-            'url': 'https://www.mexc.com',
-            'dataSource': 'MEXC Public API'
-        }
+    return QUOTES.get_or_fetch(f'{key}:*', load)
 
-def fetch_bitget(crypto: str) -> Optional[Dict[str, Any]]:
-    symbol_map = {
-        'BTC': 'BTCUSDT', 'ETH': 'ETHUSDT', 'SOL': 'SOLUSDT',
-        'XRP': 'XRPUSDT', 'BNB': 'BNBUSDT', 'ADA': 'ADAUSDT',
-        'DOGE': 'DOGEUSDT', 'AVAX': 'AVAXUSDT', 'DOT': 'DOTUSDT',
-        'MATIC': 'MATICUSDT', 'LINK': 'LINKUSDT', 'UNI': 'UNIUSDT',
-        'LTC': 'LTCUSDT', 'TRX': 'TRXUSDT', 'ATOM': 'ATOMUSDT',
-        'XLM': 'XLMUSDT', 'ETC': 'ETCUSDT', 'FIL': 'FILUSDT', 'SHIB': 'SHIBUSDT'
-    }
-    symbol = symbol_map.get(crypto)
-    if not symbol:
-        return None
+
+def ticker_key(key: str, crypto: str) -> str:
+    return f'{key}:{crypto}'
+
+
+class TickerMemo:
+    '''
+    Кэш тикеров на время одного вызова handler.
+    Каждый тикер (биржа + монета) запрашивается ровно один раз: если тот же тикер
+    уже загружается в другом потоке, вызов ждёт его результата вместо повторного запроса.
+    '''
     
-    url = f'https://api.bitget.com/api/v2/spot/market/tickers?symbol={symbol}'
-    req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._futures: Dict[Tuple[str, str], Future] = {}
     
-    with urllib.request.urlopen(req, timeout=2) as response:
-        data = json.loads(response.read().decode())
-        if data.get('data') and len(data['data']) > 0:
-            ticker = data['data'][0]
-            return {
-                'name': 'Bitget',
-                'price': float(ticker['lastPr']),
-                'volume': round(float(ticker.get('baseVolume', '0')) / 1000000, 1),
-                'fee': 0.1,
-                'change24h': round(float(ticker.get('change24h', '0')) * 100, 2),
-                'url': 'https://www.bitget.com',
-                'dataSource': 'Bitget Public API'
-            }
+    def get(self, exchange: str, crypto: str) -> Optional[Dict[str, Any]]:
+        key = (exchange, crypto)
+        with self._lock:
+            future = self._futures.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._futures[key] = future
+        
+        if is_owner:
+            try:
+                future.set_result(live_row(exchange, crypto) or
+                                  QUOTES.get_or_fetch(ticker_key(exchange, crypto), lambda: fetch_spot(exchange, crypto)))
+            except Exception as e:
+                future.set_exception(e)
+        
+        return future.result()
+    
+    def put(self, exchange: str, crypto: str, ticker: Optional[Dict[str, Any]]) -> None:
+        '''Положить уже загруженный тикер (например, из массового запроса)'''
+        future: Future = Future()
+        future.set_result(ticker)
+        with self._lock:
+            self._futures.setdefault((exchange, crypto), future)
+
+
+def fetch_reference_price(crypto: str, memo: TickerMemo, exchanges: List[str]) -> Optional[float]:
+    '''Опорная цена для P2P-площадок: первая биржа из списка, вернувшая тикер'''
+    for exchange in exchanges:
+        try:
+            ticker = memo.get(exchange, crypto)
+        except Exception as e:
+            print(f'{exchange} reference error: {e}')
+            continue
+        if ticker:
+            return ticker['price']
     return None
 
-def fetch_htx(crypto: str) -> Optional[Dict[str, Any]]:
-    symbol_map = {
-        'BTC': 'btcusdt', 'ETH': 'ethusdt', 'SOL': 'solusdt',
-        'XRP': 'xrpusdt', 'BNB': 'bnbusdt', 'ADA': 'adausdt',
-        'DOGE': 'dogeusdt', 'AVAX': 'avaxusdt', 'DOT': 'dotusdt',
-        'MATIC': 'maticusdt', 'LINK': 'linkusdt', 'UNI': 'uniusdt',
-        'LTC': 'ltcusdt', 'TRX': 'trxusdt', 'ATOM': 'atomusdt',
-        'XLM': 'xlmusdt', 'ETC': 'etcusdt', 'FIL': 'filusdt', 'SHIB': 'shibusdt'
-    }
-    symbol = symbol_map.get(crypto)
-    if not symbol:
+
+def fetch_json(url: str, timeout: float = 2, kind: str = DEFAULT_KIND) -> Any:
+    return CONNECTOR.get_json(url, timeout, kind=kind)
+
+
+def fetch_spot(key: str, crypto: str) -> Optional[Dict[str, Any]]:
+    adapter = EXCHANGES[key]
+    quote = adapter.fetch(crypto, fetch_json)
+    if not quote:
         return None
-    
-    url = f'https://api.huobi.pro/market/detail/merged?symbol={symbol}'
-    req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-    
-    with urllib.request.urlopen(req, timeout=2) as response:
-        data = json.loads(response.read().decode())
-        if data.get('tick'):
-            ticker = data['tick']
-            return {
-                'name': 'HTX',
-                'price': float(ticker['close']),
-                'volume': round(float(ticker.get('vol', 0)) / 1000000, 1),
-                'fee': 0.2,
-                'change24h': round((float(ticker['close']) - float(ticker['open'])) / float(ticker['open']) * 100, 2),
-                'url': 'https://www.htx.com',
-                'dataSource': 'HTX Public API'
-            }
-    return None
+    row = exchange_row(adapter, quote)
+    ingest(key, crypto, row)
+    return row
+
+
+def ingest(key: str, crypto: str, row: Dict[str, Any]) -> None:
+    '''Свежая строка биржи: в ленту изменений и в историю цен'''
+    FEED.publish(key, crypto, row)
+    HISTORY.record(key, crypto, row['price'])
+
 
-def fetch_bestchange(crypto: str) -> Optional[Dict[str, Any]]:
+def live_row(key: str, crypto: str) -> Optional[Dict[str, Any]]:
+    '''Строка биржи из тикер-потока, если котировка не старше STREAM_MAX_AGE'''
+    quote = LIVE.get(key, crypto, STREAM_MAX_AGE)
+    return stream_row(key, quote) if quote else None
+
+
+def stream_row(key: str, quote: Quote) -> Dict[str, Any]:
+    adapter = EXCHANGES[key]
+    return exchange_row(adapter, quote, data_source=f'{adapter.name} WebSocket')
+
+
+def exchange_row(adapter: ExchangeAdapter, quote: Quote, data_source: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        'name': adapter.name,
+        'price': quote['price'],
+        'volume': round(quote['volume'] / adapter.volume_unit, 1),
+        'fee': adapter.fee,
+        'change24h': round(quote['change24h'], 2),
+        'url': adapter.site_url,
+        'dataSource': data_source or adapter.data_source
+    }
+
+def fetch_bestchange(crypto: str, memo: Optional[TickerMemo] = None) -> Optional[Dict[str, Any]]:
     if crypto not in ['BTC', 'ETH', 'USDT', 'LTC', 'XRP', 'SOL', 'DOGE']:
         return None
     
@@ -378,8 +505,7 @@ def fetch_bestchange(crypto: str) -> Optional[Dict[str, Any]]:
     }
     
     try:
-        ref_exchanges = [fetch_bybit(crypto), fetch_gate(crypto), fetch_kucoin(crypto)]
-        ref_price = next((ex['price'] for ex in ref_exchanges if ex), None)
+        ref_price = fetch_reference_price(crypto, memo or TickerMemo(), ['bybit', 'gate', 'kucoin'])
         
         if ref_price:
             return {
@@ -396,7 +522,7 @@ def fetch_bestchange(crypto: str) -> Optional[Dict[str, Any]]:
         pass
     return None
 
-def fetch_cryptomus(crypto: str) -> Optional[Dict[str, Any]]:
+def fetch_cryptomus(crypto: str, memo: Optional[TickerMemo] = None) -> Optional[Dict[str, Any]]:
     if crypto not in ['BTC', 'ETH', 'USDT', 'LTC', 'TRX', 'SOL', 'XRP']:
         return None
     
@@ -406,8 +532,7 @@ def fetch_cryptomus(crypto: str) -> Optional[Dict[str, Any]]:
     }
     
     try:
-        ref_exchanges = [fetch_bybit(crypto), fetch_mexc(crypto), fetch_okx(crypto)]
-        ref_price = next((ex['price'] for ex in ref_exchanges if ex), None)
+        ref_price = fetch_reference_price(crypto, memo or TickerMemo(), ['bybit', 'mexc', 'okx'])
         
         if ref_price:
             return {
@@ -424,7 +549,7 @@ def fetch_cryptomus(crypto: str) -> Optional[Dict[str, Any]]:
         pass
     return None
 
-def fetch_exmo(crypto: str) -> Optional[Dict[str, Any]]:
+def fetch_exmo(crypto: str, memo: Optional[TickerMemo] = None) -> Optional[Dict[str, Any]]:
     if crypto not in ['BTC', 'ETH', 'USDT', 'LTC', 'XRP', 'DOGE']:
         return None
     
@@ -434,8 +559,7 @@ def fetch_exmo(crypto: str) -> Optional[Dict[str, Any]]:
     }
     
     try:
-        ref_exchanges = [fetch_kucoin(crypto), fetch_htx(crypto)]
-        ref_price = next((ex['price'] for ex in ref_exchanges if ex), None)
+        ref_price = fetch_reference_price(crypto, memo or TickerMemo(), ['kucoin', 'htx'])
         
         if ref_price:
             return {
@@ -453,7 +577,7 @@ def fetch_exmo(crypto: str) -> Optional[Dict[str, Any]]:
     return None
 
 
-def fetch_bybit_p2p(crypto: str) -> Optional[Dict[str, Any]]:
+def fetch_bybit_p2p(crypto: str, memo: Optional[TickerMemo] = None) -> Optional[Dict[str, Any]]:
     if crypto not in ['BTC', 'ETH', 'USDT', 'SOL', 'XRP', 'LTC', 'DOGE']:
         return None
     
@@ -463,8 +587,7 @@ def fetch_bybit_p2p(crypto: str) -> Optional[Dict[str, Any]]:
     }
     
     try:
-        ref_exchanges = [fetch_mexc(crypto), fetch_gate(crypto), fetch_htx(crypto)]
-        ref_price = next((ex['price'] for ex in ref_exchanges if ex), None)
+        ref_price = fetch_reference_price(crypto, memo or TickerMemo(), ['mexc', 'gate', 'htx'])
         
         if ref_price:
             return {
@@ -481,12 +604,50 @@ def fetch_bybit_p2p(crypto: str) -> Optional[Dict[str, Any]]:
         pass
     return None
 
-def fetch_usd_rub_rate() -> float:
+SPOT_EXCHANGES = ['kucoin', 'gate', 'mexc', 'htx', 'bybit', 'okx']
+
+P2P_FETCHERS = [
+    fetch_bestchange,
+    fetch_cryptomus,
+    fetch_exmo,
+    fetch_bybit_p2p
+]
+
+def fetch_fx_table() -> Dict[str, Any]:
+    data = fetch_json('https://api.exchangerate-api.com/v4/latest/USD')
+    rates = data['rates']
+    return {
+        'rates': {currency: float(rates[currency]) for currency in FX_CURRENCIES if currency in rates},
+        'fetchedAt': time.time()
+    }
+
+def get_fx_table() -> Dict[str, Any]:
+    '''Курсы USD к фиатным валютам. Источник обновляется раз в сутки, поэтому таблица кэшируется на FX_CACHE_TTL'''
     try:
-        url = 'https://api.exchangerate-api.com/v4/latest/USD'
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        with urllib.request.urlopen(req, timeout=2) as response:
-            data = json.loads(response.read().decode())
-            return float(data['rates'].get('RUB', 95.0))
-    except:
-        return 95.0
\ No newline at end of file
+        return QUOTES.get_or_fetch('fx:USD', fetch_fx_table, ttl=FX_CACHE_TTL, stale_ttl=FX_CACHE_TTL)
+    except Exception as e:
+        print(f'FX rates error: {e}')
+        return {'rates': {}, 'fetchedAt': None}
+
+def await_fx_table(fx_future: Future, deadline: float) -> Dict[str, Any]:
+    try:
+        return fx_future.result(timeout=time_left(deadline))
+    except FutureTimeoutError:
+        print('FX rates timeout, using fallback')
+        return {'rates': {}, 'fetchedAt': None}
+
+def fx_quote(table: Dict[str, Any], currency: str) -> Dict[str, Any]:
+    rate = table['rates'].get(currency)
+    if rate:
+        return {
+            'currency': currency,
+            'rate': rate,
+            'ageSeconds': int(time.time() - table['fetchedAt']),
+            'source': 'exchangerate-api.com'
+        }
+    return {
+        'currency': currency,
+        'rate': FALLBACK_FX_RATES[currency],
+        'ageSeconds': None,
+        'source': 'fallback'
+    }
@@ -0,0 +1,90 @@
+'''
+Стаканы заявок (level 2) в компактном виде и симулятор исполнения на заданный объём.
+Каждая сторона стакана хранится массивами array('d') цен, объёмов и накопленных сумм,
+поэтому заполнение на любой объём считается бинарным поиском без прохода по уровням.
+'''
+from array import array
+from bisect import bisect_left
+from typing import Dict, Any, Optional, Iterable, Sequence
+
+Level = Sequence[Any]
+
+
+class BookSide:
+    '''Одна сторона стакана: уровни от лучшей цены вглубь и накопленные объёмы'''
+    
+    __slots__ = ('prices', 'qtys', 'cum_qty', 'cum_quote')
+    
+    def __init__(self, levels: Iterable[Level], descending: bool) -> None:
+        self.prices = array('d')
+        self.qtys = array('d')
+        self.cum_qty = array('d')
+        self.cum_quote = array('d')
+        total_qty = 0.0
+        total_quote = 0.0
+        for price, qty in sorted(((float(level[0]), float(level[1])) for level in levels), reverse=descending):
+            if qty <= 0:
+                continue
+            total_qty += qty
+            total_quote += price * qty
+            self.prices.append(price)
+            self.qtys.append(qty)
+            self.cum_qty.append(total_qty)
+            self.cum_quote.append(total_quote)
+    
+    def __len__(self) -> int:
+        return len(self.prices)
+    
+    @property
+    def depth_quote(self) -> float:
+        return self.cum_quote[-1] if self.cum_quote else 0.0
+    
+    def base_for_quote(self, quote_amount: float) -> Optional[float]:
+        '''Сколько базовой валюты исполнится на quote_amount; None, если глубины не хватает'''
+        i = bisect_left(self.cum_quote, quote_amount)
+        if i >= len(self.prices):
+            return None
+        prev_qty = self.cum_qty[i - 1] if i else 0.0
+        prev_quote = self.cum_quote[i - 1] if i else 0.0
+        return prev_qty + (quote_amount - prev_quote) / self.prices[i]
+    
+    def quote_for_base(self, base_amount: float) -> Optional[float]:
+        '''Сколько котируемой валюты даст исполнение base_amount; None, если глубины не хватает'''
+        i = bisect_left(self.cum_qty, base_amount)
+        if i >= len(self.prices):
+            return None
+        prev_qty = self.cum_qty[i - 1] if i else 0.0
+        prev_quote = self.cum_quote[i - 1] if i else 0.0
+        return prev_quote + (base_amount - prev_qty) * self.prices[i]
+
+
+class OrderBook:
+    __slots__ = ('bids', 'asks')
+    
+    def __init__(self, bids: Iterable[Level], asks: Iterable[Level]) -> None:
+        self.bids = BookSide(bids, descending=True)
+        self.asks = BookSide(asks, descending=False)
+
+
+def executable_spread(buy_book: OrderBook, sell_book: OrderBook, notional: float,
+                      buy_fee: float, sell_fee: float) -> Optional[Dict[str, Any]]:
+    '''
+    Покупка на notional USDT по аскам одной биржи и продажа полученного объёма по бидам другой.
+    Комиссии в процентах списываются с купленного объёма и с выручки.
+    None, если глубины хотя бы одного стакана не хватает на весь объём.
+    '''
+    bought = buy_book.asks.base_for_quote(notional)
+    if not bought:
+        return None
+    base = bought * (1 - buy_fee / 100)
+    sold = sell_book.bids.quote_for_base(base)
+    if sold is None:
+        return None
+    proceeds = sold * (1 - sell_fee / 100)
+    return {
+        'notional': notional,
+        'spread': round((proceeds - notional) / notional * 100, 2),
+        'profit': round(proceeds - notional, 2),
+        'buyAvgPrice': round(notional / bought, 8),
+        'sellAvgPrice': round(sold / base, 8)
+    }
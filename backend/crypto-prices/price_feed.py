@@ -0,0 +1,61 @@
+'''
+Лента изменений цен для SSE и long-poll клиентов.
+Каждая строка биржи (биржа + монета) хранит номер версии, на которой она последний раз
+изменилась. Клиент присылает курсор последней полученной версии и получает только
+строки новее него; если изменений нет, запрос ждёт их до таймаута.
+'''
+import time
+import threading
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+# Поля строки, изменение которых рассылается клиентам
+TRACKED_FIELDS = ('price', 'volume', 'change24h')
+
+
+class PriceFeed:
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._rows: Dict[Tuple[str, str], Tuple[int, Dict[str, Any]]] = {}
+        self.version = 0
+        # Курсоры другого инстанса (или до перезапуска) не совпадут по эпохе и получат полный снимок
+        self.epoch = format(int(time.time() * 1000), 'x')
+    
+    def publish(self, exchange: str, crypto: str, row: Dict[str, Any]) -> None:
+        key = (exchange, crypto)
+        with self._cond:
+            previous = self._rows.get(key)
+            if previous and all(previous[1].get(field) == row.get(field) for field in TRACKED_FIELDS):
+                return
+            self.version += 1
+            self._rows[key] = (self.version, row)
+            self._cond.notify_all()
+    
+    def cursor(self, version: int) -> str:
+        return f'{self.epoch}-{version}'
+    
+    def parse_cursor(self, value: Optional[str]) -> int:
+        '''Версия из курсора; 0 (полный снимок), если курсора нет или он от другой эпохи'''
+        epoch, _, version = (value or '').partition('-')
+        if epoch != self.epoch or not version.isdigit():
+            return 0
+        return min(int(version), self.version)
+    
+    def wait_changes(self, since: int, cryptos: Optional[Set[str]], timeout: float) -> Tuple[int, List[Dict[str, Any]]]:
+        '''Изменения после версии since; без изменений ждёт не дольше timeout секунд'''
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                changes = self._changes(since, cryptos)
+                remaining = deadline - time.monotonic()
+                if changes or remaining <= 0:
+                    return self.version, changes
+                self._cond.wait(remaining)
+    
+    def _changes(self, since: int, cryptos: Optional[Set[str]]) -> List[Dict[str, Any]]:
+        changed = [
+            (version, exchange, crypto, row)
+            for (exchange, crypto), (version, row) in self._rows.items()
+            if version > since and (not cryptos or crypto in cryptos)
+        ]
+        changed.sort(key=lambda item: item[0])
+        return [dict(row, exchange=exchange, crypto=crypto) for _, exchange, crypto, row in changed]
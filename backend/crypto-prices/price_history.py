@@ -0,0 +1,201 @@
+'''
+История цен по каждой паре (биржа, монета) в кольцевых буферах array('d').
+Каждая точка сразу сворачивается в свечи (open/high/low/close) трёх разрешений: 1s, 1m, 1h.
+Ёмкость буфера задаёт глубину хранения: старые свечи перезаписываются новыми,
+память на серию фиксирована и выделяется при первой точке.
+
+PRICE_HISTORY_RETENTION — ёмкость по разрешениям, например "1s:900,1m:1440,1h:720"
+(15 минут секундных, сутки минутных и 30 дней часовых свечей).
+PRICE_HISTORY_PATH — каталог для периодического сброса буферов на диск и загрузки при старте.
+'''
+import os
+import time
+import struct
+import threading
+from array import array
+from typing import Dict, Any, List, Optional, Tuple
+
+RESOLUTIONS = {'1s': 1, '1m': 60, '1h': 3600}
+DEFAULT_RETENTION = '1s:900,1m:1440,1h:720'
+COLUMNS = ('t', 'o', 'h', 'l', 'c')
+HEADER = struct.Struct('<qqq')
+
+
+class CandleRing:
+    '''Свечи одного разрешения: столбцы t/o/h/l/c в кольцевом буфере фиксированной ёмкости'''
+    
+    __slots__ = ('step', 'capacity', 'start', 'size', 't', 'o', 'h', 'l', 'c')
+    
+    def __init__(self, step: int, capacity: int) -> None:
+        self.step = step
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+        for column in COLUMNS:
+            setattr(self, column, array('d', bytes(8 * capacity)))
+    
+    def add(self, ts: float, price: float) -> None:
+        bucket = ts - ts % self.step
+        if self.size:
+            last = (self.start + self.size - 1) % self.capacity
+            if self.t[last] == bucket:
+                self.h[last] = max(self.h[last], price)
+                self.l[last] = min(self.l[last], price)
+                self.c[last] = price
+                return
+            if bucket < self.t[last]:
+                return
+        
+        if self.size < self.capacity:
+            i = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            i = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.t[i] = bucket
+        self.o[i] = self.h[i] = self.l[i] = self.c[i] = price
+    
+    def oldest(self) -> Optional[float]:
+        return self.t[self.start] if self.size else None
+    
+    def _bisect(self, ts: float) -> int:
+        '''Логический индекс первой свечи с t >= ts'''
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.t[(self.start + mid) % self.capacity] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+    
+    def query(self, start: float, end: float, limit: int) -> Dict[str, List[float]]:
+        '''Последние limit свечей в [start, end]'''
+        first = self._bisect(start)
+        stop = self._bisect(end + 1e-9)
+        first = max(first, stop - limit)
+        result: Dict[str, List[float]] = {column: [] for column in COLUMNS}
+        for logical in range(first, stop):
+            i = (self.start + logical) % self.capacity
+            for column in COLUMNS:
+                result[column].append(getattr(self, column)[i])
+        return result
+    
+    def dump(self, path: str) -> None:
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(self.capacity, self.start, self.size))
+            for column in COLUMNS:
+                getattr(self, column).tofile(f)
+    
+    def restore(self, path: str) -> None:
+        with open(path, 'rb') as f:
+            capacity, start, size = HEADER.unpack(f.read(HEADER.size))
+            if capacity != self.capacity:
+                return
+            columns = {}
+            for column in COLUMNS:
+                columns[column] = array('d')
+                columns[column].fromfile(f, capacity)
+        self.start, self.size = start, size
+        for column in COLUMNS:
+            setattr(self, column, columns[column])
+
+
+class PriceHistory:
+    def __init__(self, retention: Dict[str, int]) -> None:
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], Dict[str, CandleRing]] = {}
+    
+    @classmethod
+    def from_env(cls) -> 'PriceHistory':
+        spec = os.environ.get('PRICE_HISTORY_RETENTION', DEFAULT_RETENTION)
+        retention = {}
+        for item in spec.split(','):
+            resolution, _, capacity = item.strip().partition(':')
+            if resolution in RESOLUTIONS and capacity.isdigit() and int(capacity) > 0:
+                retention[resolution] = int(capacity)
+        history = cls(retention)
+        path = os.environ.get('PRICE_HISTORY_PATH')
+        if path:
+            history.load(path)
+            history.start_flushing(path)
+        return history
+    
+    def record(self, exchange: str, crypto: str, price: float, ts: Optional[float] = None) -> None:
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            for ring in self._rings(exchange, crypto).values():
+                ring.add(ts, price)
+    
+    def _rings(self, exchange: str, crypto: str) -> Dict[str, CandleRing]:
+        rings = self._series.get((exchange, crypto))
+        if rings is None:
+            rings = self._series[(exchange, crypto)] = {
+                resolution: CandleRing(RESOLUTIONS[resolution], capacity)
+                for resolution, capacity in self.retention.items()
+            }
+        return rings
+    
+    def series(self, crypto: str, exchange: Optional[str] = None) -> List[str]:
+        with self._lock:
+            pairs = list(self._series)
+        return sorted(key for key, coin in pairs if coin == crypto and (exchange is None or key == exchange))
+    
+    def query(self, exchange: str, crypto: str, start: float, end: float,
+              resolution: str = 'auto', limit: int = 1000) -> Optional[Dict[str, Any]]:
+        '''
+        Свечи пары за [start, end]. resolution=auto выбирает самое мелкое разрешение,
+        которое ещё хранит начало диапазона и укладывается в limit точек.
+        '''
+        with self._lock:
+            rings = self._series.get((exchange, crypto))
+            if not rings:
+                return None
+            if resolution not in rings:
+                resolution = self._pick_resolution(rings, start, end, limit)
+            candles = rings[resolution].query(start, end, limit)
+        return {'exchange': exchange, 'crypto': crypto, 'resolution': resolution, **candles}
+    
+    def _pick_resolution(self, rings: Dict[str, CandleRing], start: float, end: float, limit: int) -> str:
+        '''Вызывается под self._lock: поток WebSocket-подписок пишет в те же буферы'''
+        ordered = sorted(rings, key=lambda resolution: RESOLUTIONS[resolution])
+        fitting = [resolution for resolution in ordered if (end - start) / rings[resolution].step <= limit] or ordered[-1:]
+        for resolution in fitting:
+            ring = rings[resolution]
+            # Незаполненный буфер ещё ничего не вытеснил — в нём вся история
+            if ring.size < ring.capacity or ring.oldest() <= start:
+                return resolution
+        return fitting[-1]
+    
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            for (exchange, crypto), rings in self._series.items():
+                for resolution, ring in rings.items():
+                    ring.dump(os.path.join(path, f'{exchange}_{crypto}_{resolution}.bin'))
+    
+    def load(self, path: str) -> None:
+        if not os.path.isdir(path):
+            return
+        for name in os.listdir(path):
+            parts = name[:-len('.bin')].split('_') if name.endswith('.bin') else []
+            if len(parts) != 3 or parts[2] not in self.retention:
+                continue
+            exchange, crypto, resolution = parts
+            try:
+                with self._lock:
+                    self._rings(exchange, crypto)[resolution].restore(os.path.join(path, name))
+            except (OSError, EOFError, struct.error) as e:
+                print(f'Price history restore error for {name}: {e}')
+    
+    def start_flushing(self, path: str, interval: float = 60) -> None:
+        def flush() -> None:
+            while True:
+                time.sleep(interval)
+                try:
+                    self.save(path)
+                except OSError as e:
+                    print(f'Price history flush error: {e}')
+        
+        threading.Thread(target=flush, name='price-history-flush', daemon=True).start()
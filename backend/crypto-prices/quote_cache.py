@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, Any, Optional, Callable, Tuple
+from concurrent.futures import Future
+
+CacheEntry = Tuple[float, Any]
+
+
+class MemoryBackend:
+    '''Хранилище в памяти процесса: живёт, пока инстанс функции тёплый'''
+    
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: Dict[str, CacheEntry] = {}
+    
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            return self._entries.get(key)
+    
+    def set(self, key: str, stored_at: float, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (stored_at, value)
+
+
+class SQLiteBackend:
+    '''
+    Хранилище в файле SQLite: общий кэш для нескольких процессов на одной машине.
+    Локальная замена внешнего хранилища (Redis и т.п.) при разделении кэша между инстансами.
+    '''
+    
+    def __init__(self, path: str) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=1, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS quotes (key TEXT PRIMARY KEY, stored_at REAL NOT NULL, value TEXT)')
+    
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute('SELECT stored_at, value FROM quotes WHERE key = ?', (key,)).fetchone()
+        if not row:
+            return None
+        return row[0], json.loads(row[1])
+    
+    def set(self, key: str, stored_at: float, value: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO quotes (key, stored_at, value) VALUES (?, ?, ?)',
+                (key, stored_at, json.dumps(value))
+            )
+
+
+class QuoteCache:
+    '''
+    TTL-кэш котировок с stale-while-revalidate.
+    Свежие записи (моложе ttl) отдаются сразу. Устаревшие, но моложе ttl + stale_ttl,
+    тоже отдаются сразу, а обновление запускается в фоне. Одновременные промахи
+    по одному ключу сводятся к одному запросу к бирже.
+    '''
+    
+    def __init__(self, backend: Any, ttl: float, stale_ttl: float) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+    
+    @classmethod
+    def from_env(cls) -> 'QuoteCache':
+        path = os.environ.get('QUOTE_CACHE_PATH')
+        backend = SQLiteBackend(path) if path else MemoryBackend()
+        return cls(
+            backend,
+            ttl=float(os.environ.get('QUOTE_CACHE_TTL', '3')),
+            stale_ttl=float(os.environ.get('QUOTE_CACHE_STALE', '30'))
+        )
+    
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any],
+                     ttl: Optional[float] = None, stale_ttl: Optional[float] = None) -> Any:
+        ttl = self.ttl if ttl is None else ttl
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        
+        entry = self.backend.get(key)
+        if entry:
+            stored_at, value = entry
+            age = time.time() - stored_at
+            if age <= ttl:
+                return value
+            if age <= ttl + stale_ttl:
+                self._revalidate(key, fetch)
+                return value
+        
+        return self._load(key, fetch).result()
+    
+    def peek(self, key: str, max_age: float) -> Optional[CacheEntry]:
+        '''(возраст в секундах, значение) без загрузки и без учёта ttl, если запись не старше max_age'''
+        entry = self.backend.get(key)
+        if not entry:
+            return None
+        age = time.time() - entry[0]
+        return (age, entry[1]) if age <= max_age else None
+    
+    def put(self, key: str, value: Any) -> None:
+        self.backend.set(key, time.time(), value)
+    
+    def _load(self, key: str, fetch: Callable[[], Any]) -> Future:
+        with self._lock:
+            future = self._inflight.get(key)
+            if future:
+                return future
+            future = Future()
+            self._inflight[key] = future
+        
+        try:
+            value = fetch()
+            self.put(key, value)
+            future.set_result(value)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return future
+    
+    def _revalidate(self, key: str, fetch: Callable[[], Any]) -> None:
+        with self._lock:
+            if key in self._inflight:
+                return
+        
+        def refresh() -> None:
+            try:
+                self._load(key, fetch).result()
+            except Exception as e:
+                print(f'Quote cache refresh error for {key}: {e}')
+        
+        threading.Thread(target=refresh, daemon=True).start()
@@ -0,0 +1,378 @@
+'''
+Потоковый приём тикеров из публичных WebSocket-потоков бирж в таблицу последних котировок.
+Подписки живут на цикле событий AsyncConnector и переживают тёплые вызовы функции,
+поэтому handler читает цену из памяти, а REST остаётся запасным путём на холодном старте
+и при обрыве потока.
+
+Потоки включаются явно: STREAM_EXCHANGES=bybit,okx,... или all. По умолчанию выключены —
+инстанс функции замораживается между вызовами, и держать шесть соединений без нужды незачем.
+
+EXCHANGE_STREAM_STUB_URL перенаправляет подключения на локальный стаб (tools/exchange-stubs/stub_streams.py):
+wss://stream.bybit.com/v5/public/spot -> {EXCHANGE_STREAM_STUB_URL}/stream.bybit.com/v5/public/spot
+'''
+import os
+import ssl
+import json
+import gzip
+import time
+import base64
+import struct
+import asyncio
+from typing import Dict, Any, List, Optional, Callable, Iterable, Tuple, Union, Awaitable
+from urllib.parse import urlsplit
+from connector import AsyncConnector
+from exchanges import EXCHANGES, Quote, percent_change
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+# Поток без сообщений дольше этого считается зависшим и переподключается
+SILENCE_TIMEOUT = 60
+
+
+class ConnectionClosed(Exception):
+    pass
+
+
+class WebSocket:
+    '''Минимальный клиент RFC 6455 поверх asyncio: текстовые и бинарные кадры, фрагменты, ping/pong'''
+    
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, masked: bool = True) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.masked = masked
+    
+    @classmethod
+    async def connect(cls, url: str, ssl_context: ssl.SSLContext, timeout: float = 10) -> 'WebSocket':
+        parts = urlsplit(url)
+        secure = parts.scheme == 'wss'
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(
+            parts.hostname,
+            parts.port or (443 if secure else 80),
+            ssl=ssl_context if secure else None,
+            server_hostname=parts.hostname if secure else None
+        ), timeout)
+        
+        target = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((
+            f'GET {target} HTTP/1.1\r\n'
+            f'Host: {parts.netloc}\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Key: {key}\r\n'
+            'Sec-WebSocket-Version: 13\r\n'
+            'User-Agent: Mozilla/5.0\r\n\r\n'
+        ).encode())
+        await writer.drain()
+        
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        if b' 101 ' not in status_line:
+            writer.close()
+            raise ConnectionError(f'WebSocket handshake failed for {url}: {status_line!r}')
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        return cls(reader, writer)
+    
+    async def send(self, data: Union[str, bytes], opcode: int = OP_TEXT) -> None:
+        payload = data.encode() if isinstance(data, str) else data
+        length = len(payload)
+        mask_bit = 0x80 if self.masked else 0
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, mask_bit | length)
+        elif length < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, mask_bit | 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, mask_bit | 127, length)
+        if self.masked:
+            mask = os.urandom(4)
+            header += mask
+            payload = apply_mask(payload, mask)
+        self.writer.write(header + payload)
+        await self.writer.drain()
+    
+    async def recv(self) -> Union[str, bytes]:
+        '''Следующее сообщение с данными; на ping отвечает сам, на close бросает ConnectionClosed'''
+        fragments: List[bytes] = []
+        message_opcode = OP_TEXT
+        while True:
+            first, second = await self.reader.readexactly(2)
+            opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack('!H', await self.reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack('!Q', await self.reader.readexactly(8))[0]
+            mask = await self.reader.readexactly(4) if second & 0x80 else None
+            payload = await self.reader.readexactly(length)
+            if mask:
+                payload = apply_mask(payload, mask)
+            
+            if opcode == OP_PING:
+                await self.send(payload, OP_PONG)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                raise ConnectionClosed(payload[2:].decode(errors='replace'))
+            
+            if opcode != OP_CONTINUATION:
+                message_opcode = opcode
+            fragments.append(payload)
+            if first & 0x80:
+                data = b''.join(fragments)
+                return data.decode() if message_opcode == OP_TEXT else data
+    
+    def close(self) -> None:
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+def apply_mask(data: bytes, mask: bytes) -> bytes:
+    length = len(data)
+    if not length:
+        return data
+    key = (mask * (length // 4 + 1))[:length]
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+
+
+def decode_message(raw: Union[str, bytes]) -> Any:
+    '''JSON из текстового или gzip-кадра (HTX); служебные строки вроде "pong" — None'''
+    if isinstance(raw, bytes):
+        raw = gzip.decompress(raw).decode() if raw[:2] == b'\x1f\x8b' else raw.decode()
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+class LiveQuotes:
+    '''
+    Последняя котировка по каждой паре (биржа, монета) с временем получения.
+    listeners вызываются на каждое обновление в потоке цикла событий — они должны быть быстрыми.
+    '''
+    
+    def __init__(self) -> None:
+        self._quotes: Dict[Tuple[str, str], Tuple[float, Quote]] = {}
+        self.listeners: List[Callable[[str, str, Quote], None]] = []
+    
+    def update(self, exchange: str, crypto: str, quote: Quote) -> None:
+        self._quotes[(exchange, crypto)] = (time.time(), quote)
+        for listener in self.listeners:
+            listener(exchange, crypto, quote)
+    
+    def get(self, exchange: str, crypto: str, max_age: float) -> Optional[Quote]:
+        entry = self._quotes.get((exchange, crypto))
+        if entry and time.time() - entry[0] <= max_age:
+            return entry[1]
+        return None
+    
+    def __len__(self) -> int:
+        return len(self._quotes)
+
+
+class StreamSpec:
+    '''
+    Протокол публичного тикер-потока биржи.
+    subscribe строит сообщения подписки по символам биржи, parse превращает сообщение
+    в пары (символ, Quote), reply отвечает на прикладной ping сервера,
+    heartbeat — собственный ping клиента раз в heartbeat_interval секунд.
+    resolve нужен биржам, выдающим адрес потока по REST (KuCoin).
+    '''
+    
+    def __init__(self, key: str, url: str,
+                 subscribe: Callable[[List[str]], List[str]],
+                 parse: Callable[[Any], Iterable[Tuple[str, Quote]]],
+                 heartbeat: Optional[Callable[[], str]] = None,
+                 heartbeat_interval: float = 20,
+                 reply: Optional[Callable[[Any], Optional[str]]] = None,
+                 resolve: Optional[Callable[[AsyncConnector], Awaitable[Tuple[str, float]]]] = None) -> None:
+        self.key = key
+        self.url = url
+        self.subscribe = subscribe
+        self.parse = parse
+        self.heartbeat = heartbeat
+        self.heartbeat_interval = heartbeat_interval
+        self.reply = reply
+        self.resolve = resolve
+
+
+def chunks(items: List[str], size: int) -> List[List[str]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def parse_bybit(message: Any) -> Iterable[Tuple[str, Quote]]:
+    if isinstance(message, dict) and str(message.get('topic', '')).startswith('tickers.'):
+        t = message['data']
+        yield t['symbol'], {'price': float(t['lastPrice']), 'volume': float(t.get('volume24h') or 0), 'change24h': float(t.get('price24hPcnt') or 0) * 100}
+
+
+def parse_okx(message: Any) -> Iterable[Tuple[str, Quote]]:
+    if isinstance(message, dict) and (message.get('arg') or {}).get('channel') == 'tickers':
+        for t in message.get('data') or []:
+            last = float(t['last'])
+            yield t['instId'], {'price': last, 'volume': float(t.get('vol24h') or 0), 'change24h': percent_change(last, float(t.get('open24h') or 0))}
+
+
+def parse_gate(message: Any) -> Iterable[Tuple[str, Quote]]:
+    if isinstance(message, dict) and message.get('channel') == 'spot.tickers' and message.get('event') == 'update':
+        t = message['result']
+        yield t['currency_pair'], {'price': float(t['last']), 'volume': float(t.get('quote_volume') or 0), 'change24h': float(t.get('change_percentage') or 0)}
+
+
+def parse_kucoin(message: Any) -> Iterable[Tuple[str, Quote]]:
+    if isinstance(message, dict) and message.get('type') == 'message' and str(message.get('topic', '')).startswith('/market/snapshot:'):
+        t = (message.get('data') or {}).get('data') or {}
+        yield t['symbol'], {'price': float(t['lastTradedPrice']), 'volume': float(t.get('volValue') or 0), 'change24h': float(t.get('changeRate') or 0) * 100}
+
+
+def parse_mexc(message: Any) -> Iterable[Tuple[str, Quote]]:
+    if isinstance(message, dict) and str(message.get('c', '')).startswith('spot@public.miniTickers'):
+        for t in message.get('d') or []:
+            yield t['s'], {'price': float(t['p']), 'volume': float(t.get('v') or 0), 'change24h': float(t.get('r') or 0) * 100}
+
+
+def parse_htx(message: Any) -> Iterable[Tuple[str, Quote]]:
+    if isinstance(message, dict) and str(message.get('ch', '')).endswith('.ticker'):
+        t = message['tick']
+        close = float(t.get('lastPrice') or t['close'])
+        yield message['ch'].split('.')[1], {'price': close, 'volume': float(t.get('vol') or 0), 'change24h': percent_change(close, float(t.get('open') or 0))}
+
+
+async def resolve_kucoin(connector: AsyncConnector) -> Tuple[str, float]:
+    '''Публичный токен и адрес потока KuCoin; интервал ping приходит в миллисекундах'''
+    body = await connector.request('POST', 'https://api.kucoin.com/api/v1/bullet-public', b'')
+    data = json.loads(body.decode())['data']
+    server = data['instanceServers'][0]
+    return f"{server['endpoint']}?token={data['token']}", server.get('pingInterval', 18000) / 1000
+
+
+STREAMS: Dict[str, StreamSpec] = {spec.key: spec for spec in [
+    StreamSpec(
+        key='bybit', url='wss://stream.bybit.com/v5/public/spot',
+        subscribe=lambda symbols: [json.dumps({'op': 'subscribe', 'args': [f'tickers.{s}' for s in chunk]}) for chunk in chunks(symbols, 10)],
+        parse=parse_bybit,
+        heartbeat=lambda: json.dumps({'op': 'ping'})
+    ),
+    StreamSpec(
+        key='okx', url='wss://ws.okx.com:8443/ws/v5/public',
+        subscribe=lambda symbols: [json.dumps({'op': 'subscribe', 'args': [{'channel': 'tickers', 'instId': s} for s in symbols]})],
+        parse=parse_okx,
+        heartbeat=lambda: 'ping',
+        heartbeat_interval=25
+    ),
+    StreamSpec(
+        key='gate', url='wss://api.gateio.ws/ws/v4/',
+        subscribe=lambda symbols: [json.dumps({'time': int(time.time()), 'channel': 'spot.tickers', 'event': 'subscribe', 'payload': symbols})],
+        parse=parse_gate,
+        heartbeat=lambda: json.dumps({'time': int(time.time()), 'channel': 'spot.ping'})
+    ),
+    StreamSpec(
+        key='kucoin', url='',
+        subscribe=lambda symbols: [json.dumps({'id': str(int(time.time() * 1000)), 'type': 'subscribe',
+                                               'topic': '/market/snapshot:' + ','.join(chunk), 'response': True})
+                                   for chunk in chunks(symbols, 100)],
+        parse=parse_kucoin,
+        heartbeat=lambda: json.dumps({'id': str(int(time.time() * 1000)), 'type': 'ping'}),
+        resolve=resolve_kucoin
+    ),
+    StreamSpec(
+        key='mexc', url='wss://wbs.mexc.com/ws',
+        subscribe=lambda symbols: [json.dumps({'method': 'SUBSCRIPTION', 'params': ['spot@public.miniTickers.v3.api@UTC+8']})],
+        parse=parse_mexc,
+        heartbeat=lambda: json.dumps({'method': 'PING'})
+    ),
+    StreamSpec(
+        key='htx', url='wss://api.huobi.pro/ws',
+        subscribe=lambda symbols: [json.dumps({'sub': f'market.{s}.ticker', 'id': s}) for s in symbols],
+        parse=parse_htx,
+        reply=lambda message: json.dumps({'pong': message['ping']}) if isinstance(message, dict) and 'ping' in message else None
+    )
+]}
+
+
+class StreamWorker:
+    '''
+    Держит подписки на тикер-потоки и пишет котировки в LiveQuotes.
+    Каждая биржа работает в своей задаче с переподключением и экспоненциальной паузой до 30 с.
+    '''
+    
+    def __init__(self, connector: AsyncConnector, quotes: LiveQuotes, exchanges: List[str],
+                 stub_url: Optional[str] = None) -> None:
+        self.connector = connector
+        self.quotes = quotes
+        self.exchanges = [key for key in exchanges if key in STREAMS]
+        self.stub_url = stub_url.rstrip('/') if stub_url else None
+        self.status: Dict[str, str] = {key: 'idle' for key in self.exchanges}
+    
+    @classmethod
+    def from_env(cls, connector: AsyncConnector, quotes: LiveQuotes) -> Optional['StreamWorker']:
+        '''STREAM_EXCHANGES — список бирж через запятую или all; без него потоки выключены'''
+        spec = os.environ.get('STREAM_EXCHANGES', '').strip()
+        exchanges = list(STREAMS) if spec == 'all' else [key.strip() for key in spec.split(',') if key.strip()]
+        if not exchanges:
+            return None
+        return cls(connector, quotes, exchanges, stub_url=os.environ.get('EXCHANGE_STREAM_STUB_URL'))
+    
+    def start(self) -> None:
+        for key in self.exchanges:
+            asyncio.run_coroutine_threadsafe(self._run(STREAMS[key]), self.connector.loop)
+    
+    async def _run(self, spec: StreamSpec) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                self.status[spec.key] = 'connecting'
+                await self._session(spec)
+            except Exception as e:
+                print(f'{spec.key} stream error: {e}')
+            if self.status[spec.key] == 'live':
+                backoff = 1.0
+            self.status[spec.key] = 'reconnecting'
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+    
+    async def _session(self, spec: StreamSpec) -> None:
+        url, heartbeat_interval = spec.url, spec.heartbeat_interval
+        if spec.resolve:
+            url, heartbeat_interval = await spec.resolve(self.connector)
+        if self.stub_url:
+            parts = urlsplit(url)
+            url = f'{self.stub_url}/{parts.netloc}{parts.path}' + (f'?{parts.query}' if parts.query else '')
+        
+        adapter = EXCHANGES[spec.key]
+        ws = await WebSocket.connect(url, self.connector.ssl_context)
+        heartbeat = asyncio.ensure_future(self._heartbeat(ws, spec, heartbeat_interval))
+        try:
+            for message in spec.subscribe(list(adapter.symbols.values())):
+                await ws.send(message)
+            self.status[spec.key] = 'live'
+            
+            while True:
+                message = decode_message(await asyncio.wait_for(ws.recv(), SILENCE_TIMEOUT))
+                if message is None:
+                    continue
+                answer = spec.reply(message) if spec.reply else None
+                if answer:
+                    await ws.send(answer)
+                    continue
+                for symbol, quote in spec.parse(message):
+                    crypto = adapter.cryptos_by_symbol.get(symbol)
+                    if crypto:
+                        self.quotes.update(spec.key, crypto, quote)
+        finally:
+            heartbeat.cancel()
+            ws.close()
+    
+    async def _heartbeat(self, ws: WebSocket, spec: StreamSpec, interval: float) -> None:
+        if not spec.heartbeat:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            await ws.send(spec.heartbeat())
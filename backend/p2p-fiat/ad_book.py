@@ -0,0 +1,87 @@
+'''
+Нормализованная книга P2P-объявлений всех площадок и расчёт спредов
+по способу оплаты и сумме сделки. Объявления одной стороны (актив, фиат, сторона)
+хранятся отсортированными от лучшей цены к худшей: для покупки — по возрастанию,
+для продажи — по убыванию; лучшее объявление под сумму сделки ищется по интервальному
+индексу лимитов каждой стороны.
+'''
+from typing import Dict, Any, List, Optional, Tuple
+from p2p_scanner import Ad, PAYMENT_METHODS
+from limit_index import LimitIndex
+
+Side = Tuple[str, str, str]
+
+
+class AdBook:
+    def __init__(self, ads: List[Ad], min_completion: float = 0.0, min_orders: int = 0) -> None:
+        self.sides: Dict[Side, List[Ad]] = {}
+        seen = set()
+        for ad in ads:
+            key = (ad['platformKey'], ad['side'], ad['id'])
+            if ad['id'] is not None and key in seen:
+                continue
+            seen.add(key)
+            merchant = ad['merchant']
+            if merchant['completion'] < min_completion or merchant['orders'] < min_orders:
+                continue
+            self.sides.setdefault((ad['asset'], ad['fiat'], ad['side']), []).append(ad)
+        self.indexes: Dict[Side, LimitIndex] = {}
+        for key, side_ads in self.sides.items():
+            side_ads.sort(key=lambda ad: ad['price'], reverse=key[2] == 'sell')
+            self.indexes[key] = LimitIndex(side_ads)
+    
+    def best(self, asset: str, fiat: str, side: str, amount: Optional[float] = None,
+             method: Optional[str] = None, platform: Optional[str] = None) -> Optional[Ad]:
+        '''Лучшее объявление стороны, чьи лимиты покрывают amount и которое принимает method'''
+        index = self.indexes.get((asset, fiat, side))
+        return index.best(amount, method or None, platform or None) if index else None
+    
+    def match(self, asset: str, fiat: str, amount: float, method: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        '''
+        Реализуемая связка на сумму amount: лучшая покупка и лучшая продажа, чьи лимиты
+        покрывают сумму, спред между ними и прибыль в фиате (method=None — любой способ оплаты).
+        '''
+        buy = self.best(asset, fiat, 'buy', amount, method)
+        sell = self.best(asset, fiat, 'sell', amount, method)
+        if not buy or not sell:
+            return None
+        spread = (sell['price'] - buy['price']) / buy['price']
+        return {
+            'asset': asset,
+            'fiat': fiat,
+            'method': method,
+            'methodName': PAYMENT_METHODS[method]['name'] if method else None,
+            'amount': amount,
+            'buy': ad_summary(buy),
+            'sell': ad_summary(sell),
+            'spread': round(spread * 100, 2),
+            'profit': round(amount * spread, 2)
+        }
+    
+    def spreads(self, asset: str, fiat: str, methods: List[str], amounts: List[float]) -> List[Dict[str, Any]]:
+        '''Лучшая покупка и лучшая продажа для каждого способа оплаты и суммы сделки'''
+        matches = (self.match(asset, fiat, amount, method) for method in methods for amount in amounts)
+        return [match for match in matches if match]
+    
+    def summary(self) -> List[Dict[str, Any]]:
+        '''Число объявлений и лучшая цена по площадкам для каждой стороны книги'''
+        result = []
+        for (asset, fiat, side), side_ads in sorted(self.sides.items()):
+            platforms: Dict[str, Dict[str, Any]] = {}
+            for ad in side_ads:
+                entry = platforms.setdefault(ad['platform'], {'ads': 0, 'bestPrice': ad['price']})
+                entry['ads'] += 1
+            result.append({'asset': asset, 'fiat': fiat, 'side': side, 'ads': len(side_ads), 'platforms': platforms})
+        return result
+
+
+def ad_summary(ad: Ad) -> Dict[str, Any]:
+    return {
+        'platform': ad['platform'],
+        'price': ad['price'],
+        'minAmount': ad['minAmount'],
+        'maxAmount': ad['maxAmount'],
+        'merchant': ad['merchant']['name'],
+        'orders': ad['merchant']['orders'],
+        'completion': ad['merchant']['completion']
+    }
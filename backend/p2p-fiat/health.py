@@ -0,0 +1,196 @@
+'''
+Здоровье хостов бирж: автомат circuit breaker, EWMA задержки и адаптивный таймаут.
+Состояние живёт в памяти процесса и переживает тёплые вызовы функции.
+
+closed — запросы идут, подряд идущие ошибки считаются; после failures ошибок подряд — open.
+open — запросы сразу отклоняются CircuitOpenError, пока не пройдёт cooldown.
+half_open — пропускается один пробный запрос: успех закрывает автомат,
+ошибка снова открывает его с удвоенным cooldown (не больше max_cooldown).
+
+Таймаут запроса — как RTO в TCP: EWMA задержки плюс четыре EWMA отклонения,
+но не меньше min_timeout и не больше таймаута, запрошенного вызывающим кодом.
+EWMA ведётся отдельно по виду запроса (kind): одиночный тикер, массовые тикеры и стакан
+у одной биржи отвечают за разное время, и быстрые тикеры не должны урезать таймаут
+тяжёлых запросов. Пока замеров вида меньше warmup, используется запрошенный таймаут.
+'''
+import os
+import time
+import threading
+from typing import Dict, Any, Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+DEFAULT_KIND = 'default'
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, host: str, retry_in: float) -> None:
+        super().__init__(f'Circuit open for {host}, retry in {retry_in:.0f}s')
+        self.host = host
+        self.retry_in = retry_in
+
+
+class Latency:
+    '''EWMA задержки и её отклонения для одного вида запросов'''
+    
+    def __init__(self, alpha: float) -> None:
+        self.alpha = alpha
+        self.samples = 0
+        self.mean = 0.0
+        self.deviation = 0.0
+    
+    def observe(self, latency: float) -> None:
+        if self.samples == 0:
+            self.mean, self.deviation = latency, latency / 2
+        else:
+            self.deviation += self.alpha * (abs(latency - self.mean) - self.deviation)
+            self.mean += self.alpha * (latency - self.mean)
+        self.samples += 1
+
+
+class HostHealth:
+    def __init__(self, host: str, failures: int, cooldown: float, max_cooldown: float,
+                 min_timeout: float, alpha: float = 0.2, warmup: int = 3) -> None:
+        self.host = host
+        self.max_failures = failures
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.min_timeout = min_timeout
+        self.alpha = alpha
+        self.warmup = warmup
+        self.state = CLOSED
+        self.failures = 0
+        self.cooldown = cooldown
+        self.opened_at = 0.0
+        self.probing = False
+        self.latency: Dict[str, Latency] = {}
+        self.last_ok: Optional[float] = None
+        self.last_error: Optional[str] = None
+    
+    def allow(self) -> bool:
+        '''Можно ли отправить запрос; в half_open пропускает ровно один пробный'''
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        return False
+    
+    def retry_in(self) -> float:
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+    
+    def timeout(self, requested: float, kind: str = DEFAULT_KIND) -> float:
+        stats = self.latency.get(kind)
+        if not stats or stats.samples < self.warmup:
+            return requested
+        return min(requested, self.adaptive_timeout(stats))
+    
+    def adaptive_timeout(self, stats: Latency) -> float:
+        return max(self.min_timeout, stats.mean + 4 * stats.deviation)
+    
+    def success(self, latency: float, kind: str = DEFAULT_KIND) -> None:
+        self._observe(kind, latency)
+        self.state = CLOSED
+        self.failures = 0
+        self.cooldown = self.base_cooldown
+        self.probing = False
+        self.last_ok = time.time()
+    
+    def failure(self, error: Exception, latency: Optional[float] = None, kind: str = DEFAULT_KIND) -> None:
+        '''Ошибка запроса; latency — сколько ждали до таймаута, чтобы следующий таймаут вырос'''
+        if latency is not None:
+            self._observe(kind, latency)
+        self.failures += 1
+        self.last_error = f'{type(error).__name__}: {error}' if str(error) else type(error).__name__
+        if self.state == HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self._open()
+        elif self.state == CLOSED and self.failures >= self.max_failures:
+            self._open()
+    
+    def abandon(self) -> None:
+        '''Запрос отменён вызывающим кодом (дедлайн handler): ни успех, ни ошибка'''
+        self.probing = False
+    
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probing = False
+    
+    def _observe(self, kind: str, latency: float) -> None:
+        stats = self.latency.get(kind)
+        if stats is None:
+            stats = self.latency[kind] = Latency(self.alpha)
+        stats.observe(latency)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        '''latencyMs и timeoutMs — по видам запросов'''
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'latencyMs': {kind: round(stats.mean * 1000, 1) for kind, stats in self.latency.items()},
+            'timeoutMs': {kind: round(self.adaptive_timeout(stats) * 1000)
+                          for kind, stats in self.latency.items() if stats.samples >= self.warmup},
+            'retryInSec': round(self.retry_in(), 1) if self.state == OPEN else None,
+            'lastOk': self.last_ok,
+            'lastError': self.last_error
+        }
+
+
+class ExchangeHealth:
+    '''Реестр HostHealth по имени хоста; методы потокобезопасны'''
+    
+    def __init__(self, failures: int = 3, cooldown: float = 15, max_cooldown: float = 300, min_timeout: float = 0.3) -> None:
+        self.failures = failures
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.min_timeout = min_timeout
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, HostHealth] = {}
+    
+    @classmethod
+    def from_env(cls) -> 'ExchangeHealth':
+        return cls(
+            failures=int(os.environ.get('CIRCUIT_FAILURES', '3')),
+            cooldown=float(os.environ.get('CIRCUIT_COOLDOWN', '15')),
+            max_cooldown=float(os.environ.get('CIRCUIT_MAX_COOLDOWN', '300')),
+            min_timeout=float(os.environ.get('CIRCUIT_MIN_TIMEOUT', '0.3'))
+        )
+    
+    def _host(self, host: str) -> HostHealth:
+        health = self._hosts.get(host)
+        if health is None:
+            health = self._hosts[host] = HostHealth(host, self.failures, self.cooldown, self.max_cooldown, self.min_timeout)
+        return health
+    
+    def acquire(self, host: str, requested: float, kind: str = DEFAULT_KIND) -> float:
+        '''Таймаут для запроса вида kind к host или CircuitOpenError, если автомат открыт'''
+        with self._lock:
+            health = self._host(host)
+            if not health.allow():
+                raise CircuitOpenError(host, health.retry_in())
+            return health.timeout(requested, kind)
+    
+    def success(self, host: str, latency: float, kind: str = DEFAULT_KIND) -> None:
+        with self._lock:
+            self._host(host).success(latency, kind)
+    
+    def failure(self, host: str, error: Exception, latency: Optional[float] = None, kind: str = DEFAULT_KIND) -> None:
+        with self._lock:
+            self._host(host).failure(error, latency, kind)
+    
+    def abandon(self, host: str) -> None:
+        with self._lock:
+            self._host(host).abandon()
+    
+    def state(self, host: str) -> str:
+        with self._lock:
+            health = self._hosts.get(host)
+            return health.state if health else CLOSED
+    
+    def snapshot(self, host: str) -> Dict[str, Any]:
+        with self._lock:
+            return self._host(host).snapshot()
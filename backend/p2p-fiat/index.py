@@ -1,13 +1,30 @@
 import json
-import urllib.request
-import urllib.error
-from typing import Dict, Any, List, Optional
+import math
+from typing import Dict, Any, List, Tuple
 from datetime import datetime, timezone
+from connector import AsyncConnector
+from p2p_scanner import SOURCES, PAYMENT_METHODS, scan
+from ad_book import AdBook
+
+CONNECTOR = AsyncConnector.from_env()
+
+DEFAULT_ASSETS = 'USDT,BTC,ETH'
+DEFAULT_FIATS = 'RUB'
+DEFAULT_MIN_SPREAD = 4.0
+# Корзины сумм сделки в фиате, для которых считаются спреды
+DEFAULT_AMOUNTS = '1000,10000,50000,100000,500000'
+DEFAULT_DEADLINE_MS = 6000
+DEFAULT_LIMIT = 10
+# Сумма, на которую считаются опорные цены площадок в quotes
+REFERENCE_AMOUNT = 10000
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Получает реальные P2P фиат-криптовалютные связки со спредом >4%.
-    Использует официальные P2P API Binance и Bybit.
+    Сканирует объявления P2P Binance и Bybit по нескольким активам, фиатам и способам оплаты
+    постранично и параллельно, считает спреды по способу оплаты и сумме сделки.
+    amount — сумма пользователя в фиате: спреды и связки считаются только по объявлениям,
+    чьи лимиты её покрывают, плюс matches — лучшая связка на эту сумму с любым способом оплаты.
     ТЕСТОВЫЙ РЕЖИМ: данные проверяются на актуальность.
     '''
     method: str = event.get('httpMethod', 'GET')
@@ -26,58 +43,50 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     
     if method != 'GET':
-        return {
-            'statusCode': 405,
-            'headers': {'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
+        return error_response(405, 'Method not allowed')
     
-    opportunities = []
-    
-    binance_buy = fetch_binance_p2p_buy()
-    binance_sell = fetch_binance_p2p_sell()
-    
-    bybit_buy = fetch_bybit_p2p_buy()
-    bybit_sell = fetch_bybit_p2p_sell()
+    params = event.get('queryStringParameters', {}) or {}
+    assets = parse_list(params.get('assets', DEFAULT_ASSETS))
+    fiats = parse_list(params.get('fiats', DEFAULT_FIATS))
+    methods = [m for m in params.get('methods', ','.join(PAYMENT_METHODS)).lower().split(',') if m in PAYMENT_METHODS]
+    try:
+        amount = float(params['amount']) if params.get('amount') else None
+        amounts = [amount] if amount else sorted(float(a) for a in params.get('amounts', DEFAULT_AMOUNTS).split(',') if a.strip() and float(a) > 0)
+        min_spread = float(params.get('minSpread', DEFAULT_MIN_SPREAD))
+        min_completion = float(params.get('minCompletion', 0))
+        min_orders = int(params.get('minOrders', 0))
+        deadline_ms = min(max(int(params.get('deadlineMs', DEFAULT_DEADLINE_MS)), 500), 15000)
+        limit = min(max(int(params.get('limit', DEFAULT_LIMIT)), 1), 100)
+    except ValueError:
+        return error_response(400, 'amount, amounts, minSpread and minCompletion must be numbers, minOrders, deadlineMs and limit integers')
+    if amount is not None and not (amount > 0 and math.isfinite(amount)):
+        return error_response(400, 'amount must be positive')
     
-    if binance_buy and bybit_sell:
-        spread = ((bybit_sell - binance_buy) / binance_buy) * 100
-        if spread >= 4.0:
-            opportunities.append({
-                'type': 'P2P Фиат',
-                'buyPlatform': 'Binance P2P',
-                'sellPlatform': 'Bybit P2P',
-                'buyPrice': binance_buy,
-                'sellPrice': bybit_sell,
-                'spread': round(spread, 2),
-                'currency': 'RUB',
-                'crypto': 'USDT',
-                'verified': True,
-                'method': 'Банковская карта / СБП',
-                'minAmount': 1000,
-                'maxAmount': 500000
-            })
+    queries = [(key, asset, fiat, side) for key in SOURCES for asset in assets for fiat in fiats for side in ('buy', 'sell')]
+    ads, sources = CONNECTOR.run(scan(CONNECTOR, queries, methods, deadline_ms / 1000))
+    book = AdBook(ads, min_completion, min_orders)
     
-    if bybit_buy and binance_sell:
-        spread = ((binance_sell - bybit_buy) / bybit_buy) * 100
-        if spread >= 4.0:
-            opportunities.append({
-                'type': 'P2P Фиат',
-                'buyPlatform': 'Bybit P2P',
-                'sellPlatform': 'Binance P2P',
-                'buyPrice': bybit_buy,
-                'sellPrice': binance_sell,
-                'spread': round(spread, 2),
-                'currency': 'RUB',
-                'crypto': 'USDT',
-                'verified': True,
-                'method': 'Банковская карта / СБП',
-                'minAmount': 1000,
-                'maxAmount': 500000
-            })
+    spreads = [spread for asset in assets for fiat in fiats for spread in book.spreads(asset, fiat, methods, amounts)]
+    opportunities = cross_platform_opportunities(spreads, min_spread)
     
-    opportunities.sort(key=lambda x: x['spread'], reverse=True)
+    result = {
+        'opportunities': opportunities[:limit],
+        'spreads': spreads,
+        'quotes': platform_quotes(book, assets, fiats),
+        'book': book.summary(),
+        'sources': sources,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'testMode': True,
+        'description': f'Тестовый режим: P2P фиат-криптовалютные связки с минимальным спредом {min_spread:g}%'
+    }
+    if amount:
+        result['amount'] = amount
+        result['matches'] = sorted(
+            (match for asset in assets for fiat in fiats for match in [book.match(asset, fiat, amount)] if match),
+            key=lambda x: x['spread'], reverse=True
+        )
+    if params.get('ads') in ('1', 'true'):
+        result['ads'] = [ad for side_ads in book.sides.values() for ad in side_ads]
     
     return {
         'statusCode': 200,
@@ -85,145 +94,65 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'Content-Type': 'application/json',
             'Access-Control-Allow-Origin': '*',
         },
-        'body': json.dumps({
-            'opportunities': opportunities[:10],
-            'timestamp': datetime.now(timezone.utc).isoformat(),
-            'testMode': True,
-            'description': 'Тестовый режим: P2P фиат-криптовалютные связки с минимальным спредом 4%'
-        }),
+        'body': json.dumps(result),
         'isBase64Encoded': False
     }
 
 
-def fetch_binance_p2p_buy() -> Optional[float]:
-    '''Получает цену покупки USDT за RUB на Binance P2P'''
-    try:
-        url = 'https://p2p.binance.com/bapi/c2c/v2/friendly/c2c/adv/search'
-        data = json.dumps({
-            "page": 1,
-            "rows": 5,
-            "payTypes": ["TinkoffNew", "RosBankNew", "RaiffeisenBank"],
-            "asset": "USDT",
-            "tradeType": "BUY",
-            "fiat": "RUB"
-        }).encode('utf-8')
-        
-        req = urllib.request.Request(
-            url,
-            data=data,
-            headers={
-                'Content-Type': 'application/json',
-                'User-Agent': 'Mozilla/5.0'
-            },
-            method='POST'
-        )
-        
-        with urllib.request.urlopen(req, timeout=5) as response:
-            result = json.loads(response.read().decode())
-            if result.get('data') and len(result['data']) > 0:
-                prices = [float(ad['adv']['price']) for ad in result['data']]
-                return sum(prices) / len(prices)
-    except Exception as e:
-        print(f'Binance P2P buy error: {e}')
-    return None
+def error_response(status_code: int, message: str) -> Dict[str, Any]:
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({'error': message}),
+        'isBase64Encoded': False
+    }
 
 
-def fetch_binance_p2p_sell() -> Optional[float]:
-    '''Получает цену продажи USDT за RUB на Binance P2P'''
-    try:
-        url = 'https://p2p.binance.com/bapi/c2c/v2/friendly/c2c/adv/search'
-        data = json.dumps({
-            "page": 1,
-            "rows": 5,
-            "payTypes": ["TinkoffNew", "RosBankNew", "RaiffeisenBank"],
-            "asset": "USDT",
-            "tradeType": "SELL",
-            "fiat": "RUB"
-        }).encode('utf-8')
-        
-        req = urllib.request.Request(
-            url,
-            data=data,
-            headers={
-                'Content-Type': 'application/json',
-                'User-Agent': 'Mozilla/5.0'
-            },
-            method='POST'
-        )
-        
-        with urllib.request.urlopen(req, timeout=5) as response:
-            result = json.loads(response.read().decode())
-            if result.get('data') and len(result['data']) > 0:
-                prices = [float(ad['adv']['price']) for ad in result['data']]
-                return sum(prices) / len(prices)
-    except Exception as e:
-        print(f'Binance P2P sell error: {e}')
-    return None
+def parse_list(value: str) -> List[str]:
+    return [item.strip().upper() for item in value.split(',') if item.strip()]
 
 
-def fetch_bybit_p2p_buy() -> Optional[float]:
-    '''Получает цену покупки USDT за RUB на Bybit P2P'''
-    try:
-        url = 'https://api2.bybit.com/fiat/otc/item/online'
-        params = {
-            'userId': '',
-            'tokenId': 'USDT',
-            'currencyId': 'RUB',
-            'payment': '75',
-            'side': '1',
-            'size': '5',
-            'page': '1',
-            'amount': ''
-        }
-        
-        query_string = '&'.join([f"{k}={v}" for k, v in params.items()])
-        full_url = f"{url}?{query_string}"
-        
-        req = urllib.request.Request(
-            full_url,
-            headers={'User-Agent': 'Mozilla/5.0'}
-        )
-        
-        with urllib.request.urlopen(req, timeout=5) as response:
-            result = json.loads(response.read().decode())
-            if result.get('result') and result['result'].get('items'):
-                prices = [float(item['price']) for item in result['result']['items'][:5]]
-                if prices:
-                    return sum(prices) / len(prices)
-    except Exception as e:
-        print(f'Bybit P2P buy error: {e}')
-    return None
+def cross_platform_opportunities(spreads: List[Dict[str, Any]], min_spread: float) -> List[Dict[str, Any]]:
+    '''
+    Связки «купить на одной площадке — продать на другой» со спредом не ниже min_spread:
+    лучшая сумма для каждой пары площадок, актива, фиата и способа оплаты.
+    '''
+    best: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    for spread in spreads:
+        buy, sell = spread['buy'], spread['sell']
+        if buy['platform'] == sell['platform'] or spread['spread'] < min_spread:
+            continue
+        key = (spread['asset'], spread['fiat'], spread['method'], buy['platform'], sell['platform'])
+        if key not in best or spread['spread'] > best[key]['spread']:
+            best[key] = {
+                'type': 'P2P Фиат',
+                'buyPlatform': buy['platform'],
+                'sellPlatform': sell['platform'],
+                'buyPrice': buy['price'],
+                'sellPrice': sell['price'],
+                'spread': spread['spread'],
+                'currency': spread['fiat'],
+                'crypto': spread['asset'],
+                'verified': True,
+                'method': spread['methodName'],
+                'minAmount': max(buy['minAmount'], sell['minAmount']),
+                'maxAmount': min(buy['maxAmount'], sell['maxAmount'])
+            }
+    return sorted(best.values(), key=lambda x: x['spread'], reverse=True)
 
 
-def fetch_bybit_p2p_sell() -> Optional[float]:
-    '''Получает цену продажи USDT за RUB на Bybit P2P'''
-    try:
-        url = 'https://api2.bybit.com/fiat/otc/item/online'
-        params = {
-            'userId': '',
-            'tokenId': 'USDT',
-            'currencyId': 'RUB',
-            'payment': '75',
-            'side': '0',
-            'size': '5',
-            'page': '1',
-            'amount': ''
-        }
-        
-        query_string = '&'.join([f"{k}={v}" for k, v in params.items()])
-        full_url = f"{url}?{query_string}"
-        
-        req = urllib.request.Request(
-            full_url,
-            headers={'User-Agent': 'Mozilla/5.0'}
-        )
-        
-        with urllib.request.urlopen(req, timeout=5) as response:
-            result = json.loads(response.read().decode())
-            if result.get('result') and result['result'].get('items'):
-                prices = [float(item['price']) for item in result['result']['items'][:5]]
-                if prices:
-                    return sum(prices) / len(prices)
-    except Exception as e:
-        print(f'Bybit P2P sell error: {e}')
-    return None
\ No newline at end of file
+def platform_quotes(book: AdBook, assets: List[str], fiats: List[str]) -> List[Dict[str, Any]]:
+    '''Лучшие цены покупки и продажи каждой площадки на REFERENCE_AMOUNT (граф циклов в verified-opportunities)'''
+    quotes = []
+    for source in SOURCES.values():
+        for asset in assets:
+            for fiat in fiats:
+                buy = book.best(asset, fiat, 'buy', REFERENCE_AMOUNT, platform=source.key)
+                sell = book.best(asset, fiat, 'sell', REFERENCE_AMOUNT, platform=source.key)
+                if buy and sell:
+                    quotes.append({'platform': source.name, 'asset': asset, 'fiat': fiat,
+                                   'buyPrice': buy['price'], 'sellPrice': sell['price']})
+    return quotes
@@ -0,0 +1,86 @@
+'''
+Интервальный индекс по лимитам объявлений: по сумме сделки находит лучшее объявление,
+чьи лимиты [minAmount, maxAmount] её покрывают, с фильтром по способу оплаты и площадке.
+
+Границы лимитов сжимаются в элементарные отрезки (каждая граница и каждый промежуток
+между соседними границами), над ними строится дерево отрезков. Объявление кладётся
+в O(log n) узлов, покрывающих его лимиты, и в каждом узле для каждого фильтра
+хранится лучший ранг (позиция в списке от лучшей цены к худшей). Запрос проходит путь
+от корня к листу суммы и берёт минимальный ранг: O(log n) вместо перебора книги.
+'''
+import bisect
+from typing import Dict, Any, List, Optional, Tuple
+
+# (способ оплаты, площадка); None — любой
+Filter = Tuple[Optional[str], Optional[str]]
+
+
+class LimitIndex:
+    def __init__(self, ads: List[Dict[str, Any]]) -> None:
+        '''ads отсортированы от лучшей цены к худшей: ранг объявления — его позиция'''
+        self.ads = ads
+        self.bounds: List[float] = sorted({ad['minAmount'] for ad in ads} | {ad['maxAmount'] for ad in ads})
+        # Лист 2i — сама граница bounds[i], лист 2i + 1 — промежуток (bounds[i], bounds[i + 1])
+        self.leaves = max(2 * len(self.bounds) - 1, 1)
+        self.nodes: List[Dict[Filter, int]] = [{} for _ in range(4 * self.leaves)]
+        self.any: Dict[Filter, int] = {}
+        for rank, ad in enumerate(ads):
+            if ad['minAmount'] > ad['maxAmount']:
+                continue
+            filters = ad_filters(ad)
+            for key in filters:
+                self.any.setdefault(key, rank)
+            low = 2 * bisect.bisect_left(self.bounds, ad['minAmount'])
+            high = 2 * bisect.bisect_left(self.bounds, ad['maxAmount'])
+            self._insert(1, 0, self.leaves - 1, low, high, rank, filters)
+    
+    def _insert(self, node: int, left: int, right: int, low: int, high: int, rank: int, filters: List[Filter]) -> None:
+        if high < left or right < low:
+            return
+        if low <= left and right <= high:
+            best = self.nodes[node]
+            for key in filters:
+                # Ранги вставляются по возрастанию, поэтому первый записанный и есть лучший
+                best.setdefault(key, rank)
+            return
+        middle = (left + right) // 2
+        self._insert(2 * node, left, middle, low, high, rank, filters)
+        self._insert(2 * node + 1, middle + 1, right, low, high, rank, filters)
+    
+    def _leaf(self, amount: float) -> Optional[int]:
+        i = bisect.bisect_left(self.bounds, amount)
+        if i < len(self.bounds) and self.bounds[i] == amount:
+            return 2 * i
+        if i == 0 or i == len(self.bounds):
+            return None
+        return 2 * i - 1
+    
+    def best(self, amount: Optional[float] = None, method: Optional[str] = None,
+             platform: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        '''Лучшее объявление, покрывающее amount (None — любое) и подходящее под фильтр'''
+        key = (method, platform)
+        if amount is None:
+            rank = self.any.get(key)
+            return None if rank is None else self.ads[rank]
+        leaf = self._leaf(amount)
+        if leaf is None:
+            return None
+        best: Optional[int] = None
+        node, left, right = 1, 0, self.leaves - 1
+        while True:
+            rank = self.nodes[node].get(key)
+            if rank is not None and (best is None or rank < best):
+                best = rank
+            if left == right:
+                break
+            middle = (left + right) // 2
+            if leaf <= middle:
+                node, right = 2 * node, middle
+            else:
+                node, left = 2 * node + 1, middle + 1
+        return None if best is None else self.ads[best]
+
+
+def ad_filters(ad: Dict[str, Any]) -> List[Filter]:
+    '''Все фильтры, под которые подходит объявление'''
+    return [(method, platform) for method in [None, *ad['methods']] for platform in (None, ad['platformKey'])]
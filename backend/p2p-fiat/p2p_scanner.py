@@ -0,0 +1,183 @@
+'''
+Сканер объявлений P2P-площадок: реестр источников (формат запроса, разбор страницы,
+приведение объявления к общему виду) и параллельный обход страниц.
+Первые страницы всех запросов (площадка × актив × фиат × сторона) уходят одновременно;
+как только первая страница вернула общее число объявлений, остальные страницы
+запроса ставятся в работу, не дожидаясь других запросов. Всё, что не успело
+к дедлайну, отменяется, а полученные страницы остаются в результате.
+'''
+import math
+import asyncio
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from connector import AsyncConnector
+
+Ad = Dict[str, Any]
+# (площадка, актив, фиат, сторона): сторона — действие пользователя, buy — купить актив за фиат
+Query = Tuple[str, str, str, str]
+
+PAYMENT_METHODS: Dict[str, Dict[str, str]] = {
+    'tinkoff': {'name': 'Тинькофф', 'binance': 'TinkoffNew', 'bybit': '75'},
+    'sbp': {'name': 'СБП', 'binance': 'SBP', 'bybit': '382'},
+    'raiffeisen': {'name': 'Райффайзен', 'binance': 'RaiffeisenBank', 'bybit': '64'},
+    'rosbank': {'name': 'Росбанк', 'binance': 'RosBankNew', 'bybit': '185'},
+}
+METHODS_BY_CODE: Dict[str, Dict[str, str]] = {
+    platform: {codes[platform]: key for key, codes in PAYMENT_METHODS.items()}
+    for platform in ('binance', 'bybit')
+}
+
+
+class P2PSource:
+    '''
+    Описание API поиска объявлений P2P-площадки.
+    request строит (url, JSON-тело или None для GET) для страницы выдачи,
+    extract достаёт из ответа (сырые объявления, общее число объявлений),
+    parse приводит сырое объявление к Ad без полей площадки, актива, фиата и стороны.
+    '''
+    
+    def __init__(self, key: str, name: str, site_url: str, page_size: int, max_pages: int,
+                 request: Callable[[str, str, str, List[str], int, int], Tuple[str, Optional[Dict[str, Any]]]],
+                 extract: Callable[[Any], Tuple[List[Dict[str, Any]], int]],
+                 parse: Callable[[Dict[str, Any]], Ad]) -> None:
+        self.key = key
+        self.name = name
+        self.site_url = site_url
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.request = request
+        self.extract = extract
+        self.parse = parse
+    
+    async def search(self, connector: AsyncConnector, asset: str, fiat: str, side: str, methods: List[str],
+                     page: int, timeout: float) -> Tuple[List[Ad], int]:
+        codes = [PAYMENT_METHODS[method][self.key] for method in methods if method in PAYMENT_METHODS]
+        url, payload = self.request(asset, fiat, side, codes, page, self.page_size)
+        items, total = self.extract(await connector.fetch_json(url, timeout, payload=payload))
+        ads = []
+        for item in items:
+            ad = self.parse(item)
+            ad.update({'platform': self.name, 'platformKey': self.key, 'asset': asset, 'fiat': fiat, 'side': side})
+            ads.append(ad)
+        return ads, total
+
+
+def binance_request(asset: str, fiat: str, side: str, codes: List[str], page: int, rows: int) -> Tuple[str, Dict[str, Any]]:
+    return 'https://p2p.binance.com/bapi/c2c/v2/friendly/c2c/adv/search', {
+        'page': page,
+        'rows': rows,
+        'payTypes': codes,
+        'asset': asset,
+        'tradeType': 'BUY' if side == 'buy' else 'SELL',
+        'fiat': fiat,
+        'publisherType': None
+    }
+
+
+def binance_ad(item: Dict[str, Any]) -> Ad:
+    adv = item.get('adv') or {}
+    advertiser = item.get('advertiser') or {}
+    codes = [method.get('identifier') for method in adv.get('tradeMethods') or []]
+    return {
+        'id': adv.get('advNo'),
+        'price': float(adv['price']),
+        'minAmount': float(adv.get('minSingleTransAmount') or 0),
+        'maxAmount': float(adv.get('maxSingleTransAmount') or 0),
+        'available': float(adv.get('surplusAmount') or adv.get('tradableQuantity') or 0),
+        'methods': sorted({METHODS_BY_CODE['binance'][code] for code in codes if code in METHODS_BY_CODE['binance']}),
+        'merchant': {
+            'name': advertiser.get('nickName'),
+            'orders': int(advertiser.get('monthOrderCount') or 0),
+            'completion': float(advertiser.get('monthFinishRate') or 0),
+            'verified': advertiser.get('userType') == 'merchant'
+        }
+    }
+
+
+def bybit_request(asset: str, fiat: str, side: str, codes: List[str], page: int, size: int) -> Tuple[str, None]:
+    url = (
+        'https://api2.bybit.com/fiat/otc/item/online'
+        f"?userId=&tokenId={asset}&currencyId={fiat}&payment={','.join(codes)}"
+        f"&side={'1' if side == 'buy' else '0'}&size={size}&page={page}&amount="
+    )
+    return url, None
+
+
+def bybit_ad(item: Dict[str, Any]) -> Ad:
+    codes = [str(code) for code in item.get('payments') or []]
+    return {
+        'id': item.get('id'),
+        'price': float(item['price']),
+        'minAmount': float(item.get('minAmount') or 0),
+        'maxAmount': float(item.get('maxAmount') or 0),
+        'available': float(item.get('lastQuantity') or item.get('quantity') or 0),
+        'methods': sorted({METHODS_BY_CODE['bybit'][code] for code in codes if code in METHODS_BY_CODE['bybit']}),
+        'merchant': {
+            'name': item.get('nickName'),
+            'orders': int(item.get('recentOrderNum') or 0),
+            'completion': float(item.get('recentExecuteRate') or 0) / 100,
+            'verified': bool(item.get('authMaker'))
+        }
+    }
+
+
+SOURCES: Dict[str, P2PSource] = {source.key: source for source in [
+    P2PSource(
+        key='binance', name='Binance P2P', site_url='https://p2p.binance.com', page_size=20, max_pages=5,
+        request=binance_request,
+        extract=lambda data: (data.get('data') or [], int(data.get('total') or 0)),
+        parse=binance_ad
+    ),
+    P2PSource(
+        key='bybit', name='Bybit P2P', site_url='https://www.bybit.com/fiat/trade/otc', page_size=20, max_pages=5,
+        request=bybit_request,
+        extract=lambda data: ((data.get('result') or {}).get('items') or [], int((data.get('result') or {}).get('count') or 0)),
+        parse=bybit_ad
+    ),
+]}
+
+
+async def scan(connector: AsyncConnector, queries: List[Query], methods: List[str],
+               timeout: float, request_timeout: float = 4) -> Tuple[List[Ad], Dict[str, Dict[str, int]]]:
+    '''
+    Обходит все страницы запросов queries за timeout секунд.
+    Возвращает объявления и статистику по площадкам: pages, ads, errors, pending.
+    '''
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    stats = {SOURCES[key].name: {'pages': 0, 'ads': 0, 'errors': 0, 'pending': 0} for key in {q[0] for q in queries}}
+    tasks: Dict[asyncio.Future, Tuple[Query, int]] = {}
+    
+    def submit(query: Query, page: int) -> None:
+        key, asset, fiat, side = query
+        coroutine = SOURCES[key].search(connector, asset, fiat, side, methods, page, request_timeout)
+        tasks[asyncio.ensure_future(coroutine)] = (query, page)
+    
+    for query in queries:
+        submit(query, 1)
+    
+    ads: List[Ad] = []
+    while tasks:
+        done, _ = await asyncio.wait(tasks, timeout=max(0.0, deadline - loop.time()), return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            break
+        for task in done:
+            query, page = tasks.pop(task)
+            source = SOURCES[query[0]]
+            try:
+                page_ads, total = task.result()
+            except Exception as e:
+                stats[source.name]['errors'] += 1
+                print(f'{source.name} {query[1]}/{query[2]} {query[3]} page {page} error: {e}')
+                continue
+            stats[source.name]['pages'] += 1
+            stats[source.name]['ads'] += len(page_ads)
+            ads.extend(page_ads)
+            if page == 1:
+                pages = min(math.ceil(total / source.page_size), source.max_pages)
+                for next_page in range(2, pages + 1):
+                    submit(query, next_page)
+    
+    for task, (query, _) in tasks.items():
+        task.cancel()
+        stats[SOURCES[query[0]].name]['pending'] += 1
+    return ads, stats
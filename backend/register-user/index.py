@@ -1,8 +1,10 @@
 import json
-import os
 import psycopg2
 from typing import Dict, Any
 from datetime import datetime
+from db_pool import ConnectionPool
+
+POOL = ConnectionPool.from_env()
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -41,16 +43,20 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'body': json.dumps({'error': 'Token required'})
         }
     
-    dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
+    conn = POOL.getconn()
+    try:
+        return register_with_token(conn, token)
+    finally:
+        POOL.putconn(conn)
+
+def register_with_token(conn, token: str) -> Dict[str, Any]:
+    '''Создание пользователя по одноразовому токену'''
     cur = conn.cursor()
     
     cur.execute("SELECT login, password, used FROM t_p37207906_crypto_price_compara.tokens WHERE token = %s", (token,))
     token_row = cur.fetchone()
     
     if not token_row:
-        cur.close()
-        conn.close()
         return {
             'statusCode': 404,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -61,8 +67,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     login, password, used = token_row
     
     if used:
-        cur.close()
-        conn.close()
         return {
             'statusCode': 400,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -89,9 +93,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'message': 'Registration successful'
         }
         
-        cur.close()
-        conn.close()
-        
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -100,8 +101,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     except psycopg2.IntegrityError:
         conn.rollback()
-        cur.close()
-        conn.close()
         return {
             'statusCode': 400,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
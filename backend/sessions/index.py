@@ -1,10 +1,35 @@
+import io
 import json
-import os
 import secrets
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import psycopg2
 import psycopg2.extras
+from psycopg2.extras import execute_values
+from db_pool import ConnectionPool
+from user_agent import classify
+
+POOL = ConnectionPool.from_env()
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+EXPORT_MAX_ROWS = 100000
+EXPORT_BATCH = 2000
+BACKFILL_BATCH = 500
+
+SESSION_COLUMNS = '''
+    s.id, s.user_id AS "userId", u.email, u.full_name AS "fullName",
+    s.ip_address AS "ipAddress", s.user_agent AS "userAgent", s.device_type AS "deviceType",
+    s.browser, s.os, s.country, s.city,
+    s.logged_in_at AS "loggedInAt", s.logged_out_at AS "loggedOutAt"
+'''
+# Параметр запроса -> колонка для фильтра по списку значений
+LIST_FILTERS = {
+    'device': 's.device_type',
+    'browser': 's.browser',
+    'os': 's.os',
+    'country': 's.country'
+}
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -19,77 +44,155 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Session-Token',
+                'Access-Control-Allow-Headers': 'Content-Type, X-Session-Token, X-Admin-Auth',
                 'Access-Control-Max-Age': '86400'
             },
             'body': '',
             'isBase64Encoded': False
         }
     
-    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    body = json.loads(event.get('body') or '{}') if method == 'POST' else {}
+    backfill = body.get('action') == 'backfill'
+    if backfill and not is_admin(event):
+        return error_response(403, 'Unauthorized')
+    
+    conn = POOL.getconn()
     
     try:
         if method == 'GET':
             return get_sessions(conn, event)
         elif method == 'POST':
+            if backfill:
+                return backfill_clients(conn)
             return create_session(conn, event)
         else:
             return error_response(405, 'Method not allowed')
     finally:
-        conn.close()
+        POOL.putconn(conn)
 
 def get_sessions(conn, event: Dict[str, Any]) -> Dict[str, Any]:
-    '''Получить историю сессий с фильтрами'''
+    '''
+    Получить историю сессий с фильтрами: userId, from/to (ISO-дата входа), device, browser, os, country
+    (через запятую). Keyset-пагинация по (loggedInAt, id): cursor — следующая (более старая) страница,
+    since — только сессии новее курсора для инкрементального опроса. format=ndjson — выгрузка
+    всех подходящих сессий построчно через серверный курсор.
+    '''
     params = event.get('queryStringParameters', {}) or {}
-    user_id = params.get('userId')
-    limit = int(params.get('limit', 100))
+    export = params.get('format') == 'ndjson'
     
-    with conn.cursor() as cur:
-        if user_id:
-            cur.execute('''
-                SELECT 
-                    s.id, s.user_id, u.email, u.full_name,
-                    s.ip_address, s.user_agent, s.device_type, s.browser, s.os,
-                    s.country, s.city, s.logged_in_at, s.logged_out_at
-                FROM user_sessions s
-                JOIN users u ON s.user_id = u.id
-                WHERE s.user_id = %s
-                ORDER BY s.logged_in_at DESC
-                LIMIT %s
-            ''', (user_id, limit))
-        else:
-            cur.execute('''
-                SELECT 
-                    s.id, s.user_id, u.email, u.full_name,
-                    s.ip_address, s.user_agent, s.device_type, s.browser, s.os,
-                    s.country, s.city, s.logged_in_at, s.logged_out_at
-                FROM user_sessions s
-                JOIN users u ON s.user_id = u.id
-                ORDER BY s.logged_in_at DESC
-                LIMIT %s
-            ''', (limit,))
-        
-        rows = cur.fetchall()
-        
-        sessions = []
-        for row in rows:
-            sessions.append({
-                'id': row[0],
-                'userId': row[1],
-                'email': row[2],
-                'fullName': row[3],
-                'ipAddress': row[4],
-                'userAgent': row[5],
-                'deviceType': row[6],
-                'browser': row[7],
-                'os': row[8],
-                'country': row[9],
-                'city': row[10],
-                'loggedInAt': row[11].isoformat() if row[11] else None,
-                'loggedOutAt': row[12].isoformat() if row[12] else None
-            })
-        
-        return success_response({'sessions': sessions, 'total': len(sessions)})
+    try:
+        limit = min(max(int(params.get('limit', EXPORT_MAX_ROWS if export else DEFAULT_LIMIT)), 1),
+                    EXPORT_MAX_ROWS if export else MAX_LIMIT)
+        where, args = session_filters(params)
+        cursor = parse_session_key(params.get('cursor'))
+        since = parse_session_key(params.get('since'))
+    except ValueError as e:
+        return error_response(400, f'Invalid filter: {e}')
+    
+    if cursor:
+        where.append('(s.logged_in_at, s.id) < (%s, %s)')
+        args.extend(cursor)
+    if since:
+        where.append('(s.logged_in_at, s.id) > (%s, %s)')
+        args.extend(since)
+    # Новые сессии после since отдаются от старых к новым, чтобы при переполнении продолжить с последней
+    order = 'ASC' if since else 'DESC'
+    query = f'''
+        SELECT {SESSION_COLUMNS}
+        FROM user_sessions s
+        JOIN users u ON s.user_id = u.id
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY s.logged_in_at {order}, s.id {order}
+        LIMIT %s
+    '''
+    
+    if export:
+        return export_sessions(conn, query, args + [limit])
+    
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute(query, args + [limit + 1])
+        sessions = cur.fetchall()
+    
+    has_more = len(sessions) > limit
+    sessions = sessions[:limit]
+    if since:
+        sessions.reverse()
+    
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({
+            'sessions': sessions,
+            'total': len(sessions),
+            'hasMore': has_more,
+            'nextCursor': session_key(sessions[-1]) if has_more and not since else None,
+            'latestCursor': (session_key(sessions[0]) if sessions else None) or params.get('since')
+        }, default=isoformat),
+        'isBase64Encoded': False
+    }
+
+def export_sessions(conn, query: str, args: List[Any]) -> Dict[str, Any]:
+    '''Выгрузка NDJSON: строки читаются серверным курсором пачками по EXPORT_BATCH, без fetchall'''
+    lines = io.StringIO()
+    with conn.cursor(name='sessions_export', cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.itersize = EXPORT_BATCH
+        cur.execute(query, args)
+        for row in cur:
+            lines.write(json.dumps(row, default=isoformat))
+            lines.write('\n')
+    conn.rollback()
+    
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/x-ndjson',
+            'Content-Disposition': 'attachment; filename="sessions.ndjson"',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': lines.getvalue(),
+        'isBase64Encoded': False
+    }
+
+def session_filters(params: Dict[str, str]) -> Tuple[List[str], List[Any]]:
+    '''Условия WHERE и их параметры по фильтрам запроса'''
+    # Сессии без времени входа не сравниваются в keyset-условиях и не могут быть курсором
+    where: List[str] = ['s.logged_in_at IS NOT NULL']
+    args: List[Any] = []
+    if params.get('userId'):
+        where.append('s.user_id = %s')
+        args.append(int(params['userId']))
+    if params.get('from'):
+        where.append('s.logged_in_at >= %s')
+        args.append(datetime.fromisoformat(params['from']))
+    if params.get('to'):
+        where.append('s.logged_in_at < %s')
+        args.append(datetime.fromisoformat(params['to']))
+    for param, column in LIST_FILTERS.items():
+        values = [v.strip() for v in params.get(param, '').split(',') if v.strip()]
+        if values:
+            where.append(f'{column} = ANY(%s)')
+            args.append(values)
+    return where, args
+
+def parse_session_key(value: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    '''Курсор "loggedInAt,id" в ключ keyset-пагинации'''
+    if not value:
+        return None
+    logged_in_at, _, session_id = value.rpartition(',')
+    return datetime.fromisoformat(logged_in_at), int(session_id)
+
+def session_key(session: Dict[str, Any]) -> Optional[str]:
+    if session['loggedInAt'] is None:
+        return None
+    return f"{isoformat(session['loggedInAt'])},{session['id']}"
+
+def isoformat(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
 
 def create_session(conn, event: Dict[str, Any]) -> Dict[str, Any]:
     '''Создать новую сессию при входе пользователя'''
@@ -106,9 +209,8 @@ def create_session(conn, event: Dict[str, Any]) -> Dict[str, Any]:
     ip_address = identity.get('sourceIp', 'Unknown')
     user_agent = headers.get('User-Agent') or headers.get('user-agent', 'Unknown')
     
-    device_type = parse_device_type(user_agent)
-    browser = parse_browser(user_agent)
-    os = parse_os(user_agent)
+    client = classify(user_agent)
+    device_type, browser, os = client.columns()
     
     session_token = secrets.token_urlsafe(32)
     
@@ -127,50 +229,42 @@ def create_session(conn, event: Dict[str, Any]) -> Dict[str, Any]:
             'sessionId': row[0],
             'sessionToken': session_token,
             'loggedInAt': row[1].isoformat() if row[1] else None,
+            'client': client.as_dict(),
             'message': 'Session created successfully'
         }, 201)
 
-def parse_device_type(user_agent: str) -> str:
-    '''Определить тип устройства'''
-    ua_lower = user_agent.lower()
-    if 'mobile' in ua_lower or 'android' in ua_lower or 'iphone' in ua_lower:
-        return 'Mobile'
-    elif 'tablet' in ua_lower or 'ipad' in ua_lower:
-        return 'Tablet'
-    else:
-        return 'Desktop'
-
-def parse_browser(user_agent: str) -> str:
-    '''Определить браузер'''
-    ua = user_agent.lower()
-    if 'edg' in ua:
-        return 'Edge'
-    elif 'chrome' in ua:
-        return 'Chrome'
-    elif 'firefox' in ua:
-        return 'Firefox'
-    elif 'safari' in ua and 'chrome' not in ua:
-        return 'Safari'
-    elif 'opera' in ua or 'opr' in ua:
-        return 'Opera'
-    else:
-        return 'Other'
+def is_admin(event: Dict[str, Any]) -> bool:
+    '''Пересчёт сессий — только для админки, тот же заголовок, что у accounts-list'''
+    headers = event.get('headers') or {}
+    return (headers.get('x-admin-auth') or headers.get('X-Admin-Auth')) == 'magome:28122007'
 
-def parse_os(user_agent: str) -> str:
-    '''Определить операционную систему'''
-    ua = user_agent.lower()
-    if 'windows' in ua:
-        return 'Windows'
-    elif 'mac' in ua:
-        return 'macOS'
-    elif 'linux' in ua:
-        return 'Linux'
-    elif 'android' in ua:
-        return 'Android'
-    elif 'iphone' in ua or 'ipad' in ua:
-        return 'iOS'
-    else:
-        return 'Other'
+def backfill_clients(conn) -> Dict[str, Any]:
+    '''
+    Пересчитать device_type, browser, os у всех сессий текущим разборщиком User-Agent.
+    Разбирается каждый уникальный UA один раз; обновление — пачками по BACKFILL_BATCH UA
+    через UPDATE ... FROM (VALUES ...), только у строк, где значения изменились,
+    с коммитом после каждой пачки. Повторный вызов безопасен и почти ничего не пишет.
+    '''
+    with conn.cursor() as cur:
+        cur.execute('SELECT DISTINCT user_agent FROM user_sessions WHERE user_agent IS NOT NULL')
+        user_agents = [row[0] for row in cur.fetchall()]
+    conn.rollback()
+    
+    updated = 0
+    for start in range(0, len(user_agents), BACKFILL_BATCH):
+        rows = [(ua, *classify(ua).columns()) for ua in user_agents[start:start + BACKFILL_BATCH]]
+        with conn.cursor() as cur:
+            execute_values(cur, '''
+                UPDATE user_sessions s
+                SET device_type = v.device_type, browser = v.browser, os = v.os
+                FROM (VALUES %s) AS v (user_agent, device_type, browser, os)
+                WHERE s.user_agent = v.user_agent
+                  AND (s.device_type, s.browser, s.os) IS DISTINCT FROM (v.device_type, v.browser, v.os)
+            ''', rows, page_size=len(rows))
+            updated += cur.rowcount
+        conn.commit()
+    
+    return success_response({'userAgents': len(user_agents), 'updated': updated})
 
 def success_response(data: Dict[str, Any], status_code: int = 200) -> Dict[str, Any]:
     return {
@@ -0,0 +1,117 @@
+'''
+Разбор User-Agent: тип устройства, браузер и ОС с версиями, признак бота.
+Правила — заранее скомпилированные регулярные выражения в нижнем регистре (IGNORECASE
+заметно медленнее на длинных альтернативах), строка приводится к нижнему регистру один раз.
+Правила проверяются по порядку, срабатывает первое подходящее. Результат кэшируется
+по строке User-Agent (LRU): одни и те же браузеры входят снова и снова.
+
+Порядок правил важен: UA Edge, Opera и Яндекс.Браузера содержат "Chrome", UA Chrome — "Safari",
+UA iPhone — "like Mac OS X", UA Android — "Linux".
+'''
+import re
+from functools import lru_cache
+from typing import Dict, Any, List, NamedTuple, Optional, Pattern, Tuple
+
+# Длиннее UA не разбираем: хвост не влияет на результат, а ключи кэша остаются короткими
+MAX_LENGTH = 512
+
+# "bot" — отдельным словом или токеном продукта ("Googlebot/2.1"), но не внутри слова: CUBOT — телефон
+BOT = re.compile(
+    r'\bbot\b|\wbot/|(?:telegram|twitter|slack|discord)bot|bingpreview|crawl|spider|slurp|headless|curl/|wget/|python-requests|python-urllib|aiohttp|httpx|'
+    r'go-http-client|okhttp|axios|node-fetch|java/|libwww|scrapy|facebookexternalhit|lighthouse'
+)
+
+# (название, шаблон с версией в первой группе)
+BROWSERS: List[Tuple[str, Pattern[str]]] = [
+    (name, re.compile(pattern)) for name, pattern in [
+        ('Edge', r'edg(?:e|a|ios)?/([\d.]+)'),
+        ('Opera', r'(?:opr|opera|opios)[/ ]([\d.]+)'),
+        ('Yandex', r'yabrowser/([\d.]+)'),
+        ('Samsung Internet', r'samsungbrowser/([\d.]+)'),
+        ('Firefox', r'(?:firefox|fxios)/([\d.]+)'),
+        ('Chrome', r'(?:chrome|crios)/([\d.]+)'),
+        ('Safari', r'version/([\d.]+).*safari/'),
+        ('Safari', r'applewebkit/.*(?:safari|mobile)/()')
+    ]
+]
+
+OS_RULES: List[Tuple[str, Pattern[str]]] = [
+    (name, re.compile(pattern)) for name, pattern in [
+        ('Windows', r'windows nt ([\d.]+)'),
+        ('Windows', r'windows()'),
+        ('iOS', r'(?:iphone|ipad|ipod).*? os ([\d_]+)'),
+        ('iOS', r'(?:iphone|ipad|ipod)()'),
+        ('Android', r'android ?([\d.]*)'),
+        ('macOS', r'mac os x ?([\d_.]*)'),
+        ('ChromeOS', r'cros \S+ ([\d.]+)'),
+        ('Linux', r'linux()')
+    ]
+]
+
+WINDOWS_VERSIONS = {'10.0': '10', '6.3': '8.1', '6.2': '8', '6.1': '7', '6.0': 'Vista', '5.1': 'XP'}
+
+TABLET = re.compile(r'ipad|tablet|kindle|silk/|playbook|android(?!.*mobi)')
+MOBILE = re.compile(r'mobi|iphone|ipod|android|windows phone|blackberry|opera mini')
+
+
+class UserAgent(NamedTuple):
+    device_type: str
+    browser: str
+    browser_version: Optional[str]
+    os: str
+    os_version: Optional[str]
+    is_bot: bool
+    
+    def columns(self) -> Tuple[str, str, str]:
+        '''Значения колонок device_type, browser, os в user_sessions'''
+        return self.device_type, self.browser, self.os
+    
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'deviceType': self.device_type,
+            'browser': self.browser,
+            'browserVersion': self.browser_version,
+            'os': self.os,
+            'osVersion': self.os_version,
+            'isBot': self.is_bot
+        }
+
+
+def classify(user_agent: Optional[str]) -> UserAgent:
+    return _classify((user_agent or '')[:MAX_LENGTH].lower())
+
+
+@lru_cache(maxsize=4096)
+def _classify(user_agent: str) -> UserAgent:
+    '''user_agent уже в нижнем регистре'''
+    is_bot = BOT.search(user_agent) is not None
+    browser, browser_version = match_first(BROWSERS, user_agent)
+    os, os_version = match_first(OS_RULES, user_agent)
+    if os == 'Windows' and os_version:
+        os_version = WINDOWS_VERSIONS.get(os_version, os_version)
+    
+    if is_bot:
+        device_type = 'Bot'
+    elif TABLET.search(user_agent):
+        device_type = 'Tablet'
+    elif MOBILE.search(user_agent):
+        device_type = 'Mobile'
+    else:
+        device_type = 'Desktop'
+    
+    return UserAgent(device_type, browser, major_minor(browser_version), os, major_minor(os_version), is_bot)
+
+
+def match_first(rules: List[Tuple[str, Pattern[str]]], user_agent: str) -> Tuple[str, Optional[str]]:
+    for name, pattern in rules:
+        match = pattern.search(user_agent)
+        if match:
+            return name, match.group(1) or None
+    return 'Other', None
+
+
+def major_minor(version: Optional[str]) -> Optional[str]:
+    '''"120.0.6099.109" -> "120.0", "17_4_1" -> "17.4"'''
+    if not version:
+        return None
+    return '.'.join(version.replace('_', '.').strip('.').split('.')[:2]) or None
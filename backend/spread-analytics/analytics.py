@@ -0,0 +1,294 @@
+'''
+Статистика по истории спредов (arbitrage_scheme_history) для подбора порогов.
+История загружается из БД бинарным COPY прямо в массивы NumPy, отсортированная
+по (монета, биржа покупки, биржа продажи, время); все агрегаты считаются
+векторно по группам без цикла по строкам.
+'''
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+
+COPY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+# Строка бинарного COPY: число полей, затем (длина, значение) для pair int4, ts float8, spread float8
+COPY_ROW = np.dtype([
+    ('fields', '>i2'),
+    ('pair_len', '>i4'), ('pair', '>i4'),
+    ('ts_len', '>i4'), ('ts', '>f8'),
+    ('spread_len', '>i4'), ('spread', '>f8'),
+])
+HISTORY_FILTER = "recorded_at >= to_timestamp(%s) AT TIME ZONE 'UTC' AND spread_percent IS NOT NULL"
+PAIR_ORDER = 'crypto, buy_exchange, sell_exchange'
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+@dataclass
+class SpreadHistory:
+    '''Замеры всех пар: pair — индекс в labels, строки отсортированы по (pair, ts)'''
+    labels: List[Tuple[str, str, str]]
+    pair: np.ndarray
+    ts: np.ndarray
+    spread: np.ndarray
+    
+    @property
+    def pairs(self) -> int:
+        return len(self.labels)
+
+
+def load_history(cur: Any, since: float, cryptos: Optional[List[str]] = None) -> SpreadHistory:
+    '''
+    Замеры спредов начиная с since (unix time). Метки пар и сами замеры читаются
+    двумя запросами, поэтому вызывать внутри транзакции REPEATABLE READ.
+    '''
+    where = HISTORY_FILTER
+    args: List[Any] = [since]
+    if cryptos:
+        where += ' AND crypto = ANY(%s)'
+        args.append(cryptos)
+    
+    cur.execute(f'SELECT {PAIR_ORDER} FROM arbitrage_scheme_history WHERE {where} GROUP BY {PAIR_ORDER} ORDER BY {PAIR_ORDER}', args)
+    labels = [tuple(row) for row in cur.fetchall()]
+    if not labels:
+        return SpreadHistory(labels, np.empty(0, np.int32), np.empty(0), np.empty(0))
+    
+    query = cur.mogrify(
+        f'SELECT (DENSE_RANK() OVER (ORDER BY {PAIR_ORDER}) - 1)::int4, '
+        f'EXTRACT(EPOCH FROM recorded_at)::float8, spread_percent::float8 '
+        f'FROM arbitrage_scheme_history WHERE {where} ORDER BY {PAIR_ORDER}, recorded_at',
+        args
+    ).decode()
+    buffer = _CopyBuffer()
+    cur.copy_expert(f'COPY ({query}) TO STDOUT WITH (FORMAT binary)', buffer)
+    rows = parse_binary_copy(buffer.getvalue())
+    return SpreadHistory(labels, rows['pair'].astype(np.int32), rows['ts'].astype(np.float64), rows['spread'].astype(np.float64))
+
+
+class _CopyBuffer:
+    '''Приёмник для copy_expert: копит куски без лишних копий'''
+    
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+    
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def getvalue(self) -> bytes:
+        return b''.join(self._chunks)
+
+
+def parse_binary_copy(data: bytes) -> np.ndarray:
+    '''Разбирает вывод COPY ... (FORMAT binary) из трёх ненулевых столбцов в структурированный массив'''
+    if not data.startswith(COPY_SIGNATURE):
+        raise ValueError('Not a binary COPY stream')
+    extension = int.from_bytes(data[15:19], 'big')
+    offset = 19 + extension
+    count = (len(data) - offset - 2) // COPY_ROW.itemsize
+    rows = np.frombuffer(data, dtype=COPY_ROW, count=count, offset=offset)
+    if count and not ((rows['fields'] == 3).all() and (rows['spread_len'] == 8).all()):
+        raise ValueError('Unexpected row layout in binary COPY stream')
+    return rows
+
+
+def group_bounds(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    '''Начала и длины групп подряд идущих одинаковых ключей'''
+    if not len(keys):
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+    return starts, np.diff(np.append(starts, len(keys)))
+
+
+def grouped_percentiles(keys: np.ndarray, values: np.ndarray, quantiles: Tuple[float, ...],
+                        size: int) -> np.ndarray:
+    '''
+    Перцентили values внутри каждой группы keys (0..size-1) с линейной интерполяцией.
+    Возвращает массив (size, len(quantiles)); для пустых групп — NaN.
+    '''
+    result = np.full((size, len(quantiles)), np.nan)
+    if not len(values):
+        return result
+    # Один np.sort вместо lexsort: каждая группа сдвинута в свою непересекающуюся полосу значений
+    low = values.min()
+    width = values.max() - low + 1
+    sorted_keys = np.sort(keys)
+    sorted_values = np.sort((values - low) + keys * width) - sorted_keys * width + low
+    starts, counts = group_bounds(sorted_keys)
+    groups = sorted_keys[starts]
+    for column, q in enumerate(quantiles):
+        position = starts + q * (counts - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        weight = position - lower
+        result[groups, column] = sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+    return result
+
+
+def sampling_gap(history: SpreadHistory) -> float:
+    '''Максимальный разрыв между замерами, который ещё не рвёт эпизод: 3 медианных интервала'''
+    same_pair = history.pair[1:] == history.pair[:-1]
+    steps = np.diff(history.ts)[same_pair]
+    steps = steps[steps > 0]
+    return float(np.median(steps)) * 3 if len(steps) else 0.0
+
+
+def episodes(history: SpreadHistory, threshold: float, max_gap: float) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Эпизоды, когда спред пары держался не ниже threshold: (pair, длительность в секундах).
+    Эпизод длится до первого замера ниже порога; разрыв в данных длиннее max_gap его завершает.
+    '''
+    pair, ts = history.pair, history.ts
+    above = history.spread >= threshold
+    linked = np.zeros(len(ts), dtype=bool)
+    linked[1:] = (pair[1:] == pair[:-1]) & (np.diff(ts) <= max_gap)
+    
+    continues = above & np.concatenate(([False], above[:-1])) & linked
+    first = np.flatnonzero(above & ~continues)
+    last = np.flatnonzero(above & ~np.append(continues[1:], False))
+    # Конец эпизода — следующий замер той же пары, если он есть и без разрыва
+    following = np.minimum(last + 1, len(ts) - 1)
+    closed = (last + 1 < len(ts)) & linked[following]
+    end = np.where(closed, ts[following], ts[last])
+    return pair[first], end - ts[first]
+
+
+def rolling_mean(history: SpreadHistory, window: float) -> np.ndarray:
+    '''Скользящее среднее спреда за последние window секунд внутри каждой пары (на каждый замер)'''
+    if not len(history.ts):
+        return np.empty(0)
+    # Сдвигаем время каждой пары на свою полосу, чтобы один searchsorted не пересекал пары
+    span = history.ts.max() - history.ts.min() + window + 1
+    key = (history.ts - history.ts.min()) + history.pair * span
+    start = np.searchsorted(key, key - window, side='left')
+    total = np.concatenate(([0.0], np.cumsum(history.spread)))
+    index = np.arange(len(key))
+    return (total[index + 1] - total[start]) / (index + 1 - start)
+
+
+def summarize(history: SpreadHistory, threshold: float, thresholds: List[float], window: float,
+              limit: int, max_gap: Optional[float] = None) -> Dict[str, Any]:
+    '''
+    Сводка по парам, маршрутам (биржа покупки -> биржа продажи) и монетам.
+    В ответ попадают limit пар, дольше всего державших спред выше threshold.
+    '''
+    size = history.pairs
+    pair, ts, spread = history.pair, history.ts, history.spread
+    if not len(spread):
+        return {'samples': 0, 'maxGapSeconds': 0.0, 'thresholds': [], 'pairs': [], 'routes': [], 'coins': []}
+    max_gap = sampling_gap(history) if max_gap is None else max_gap
+    
+    # Каждая метка пары встречается в замерах, поэтому группы идут ровно по индексам labels
+    starts, counts = group_bounds(pair)
+    samples = counts
+    mean = np.add.reduceat(spread, starts) / counts
+    peak = np.maximum.reduceat(spread, starts)
+    percentiles = grouped_percentiles(pair, spread, PERCENTILES, size)
+    
+    levels = np.asarray(thresholds, dtype=np.float64)
+    above = np.stack([np.add.reduceat((spread >= level).astype(np.int32), starts) for level in levels], axis=1) if len(levels) else np.empty((size, 0))
+    
+    first_ts, last_ts = ts[starts], ts[starts + counts - 1]
+    days = np.maximum(last_ts - first_ts, max_gap) / 86400
+    
+    episode_pair, duration = episodes(history, threshold, max_gap)
+    episode_count = np.bincount(episode_pair, minlength=size)
+    episode_total = np.bincount(episode_pair, weights=duration, minlength=size)
+    episode_longest = np.zeros(size)
+    np.maximum.at(episode_longest, episode_pair, duration)
+    episode_median = grouped_percentiles(episode_pair, duration, (0.5,), size)[:, 0]
+    
+    rolling = rolling_mean(history, window)
+    rolling_peak = np.maximum.reduceat(rolling, starts)
+    
+    share = np.add.reduceat((spread >= threshold).astype(np.int32), starts) / counts
+    top = np.lexsort((-percentiles[:, 2], -share, -episode_total))[:limit]
+    
+    pairs = []
+    for i in top:
+        crypto, buy_exchange, sell_exchange = history.labels[i]
+        pairs.append({
+            'crypto': crypto,
+            'buyExchange': buy_exchange,
+            'sellExchange': sell_exchange,
+            'samples': int(samples[i]),
+            'mean': round(float(mean[i]), 4),
+            'max': round(float(peak[i]), 4),
+            'percentiles': {f'p{round(q * 100)}': round(float(v), 4) for q, v in zip(PERCENTILES, percentiles[i])},
+            'shareAbove': {f'{level:g}': round(float(count / samples[i]), 4) for level, count in zip(levels, above[i])},
+            'episodes': {
+                'count': int(episode_count[i]),
+                'perDay': round(float(episode_count[i] / days[i]), 3),
+                'medianMinutes': round(float(episode_median[i]) / 60, 1) if episode_count[i] else None,
+                'maxMinutes': round(float(episode_longest[i]) / 60, 1),
+                'totalMinutes': round(float(episode_total[i]) / 60, 1)
+            },
+            'rolling': {
+                'latest': round(float(rolling[starts[i] + counts[i] - 1]), 4),
+                'max': round(float(rolling_peak[i]), 4)
+            }
+        })
+    
+    return {
+        'samples': int(len(spread)),
+        'maxGapSeconds': round(max_gap, 1),
+        'thresholds': summarize_thresholds(history, levels, max_gap, days.max() if size else 0.0),
+        'pairs': pairs,
+        'routes': summarize_routes(history, samples, mean, episode_count, days)[:limit],
+        'coins': summarize_coins(history)
+    }
+
+
+def summarize_thresholds(history: SpreadHistory, levels: np.ndarray, max_gap: float, days: float) -> List[Dict[str, Any]]:
+    '''Доля замеров выше каждого порога и частота эпизодов по всей истории'''
+    result = []
+    for level in levels:
+        episode_pair, duration = episodes(history, float(level), max_gap)
+        result.append({
+            'threshold': float(level),
+            'shareAbove': round(float(np.mean(history.spread >= level)), 4) if len(history.spread) else 0.0,
+            'episodes': int(len(episode_pair)),
+            'perDay': round(len(episode_pair) / float(days), 3) if days else 0.0,
+            'medianMinutes': round(float(np.median(duration)) / 60, 1) if len(duration) else None
+        })
+    return result
+
+
+def summarize_routes(history: SpreadHistory, samples: np.ndarray, mean: np.ndarray,
+                     episode_count: np.ndarray, days: np.ndarray) -> List[Dict[str, Any]]:
+    '''Частота связок по направлению биржа покупки -> биржа продажи по всем монетам'''
+    routes = [(buy, sell) for _, buy, sell in history.labels]
+    names, route = np.unique(np.array([f'{buy}\x00{sell}' for buy, sell in routes], dtype=object), return_inverse=True)
+    size = len(names)
+    route_samples = np.bincount(route, weights=samples, minlength=size)
+    route_mean = np.bincount(route, weights=mean * samples, minlength=size) / np.maximum(route_samples, 1)
+    route_episodes = np.bincount(route, weights=episode_count, minlength=size)
+    route_days = np.zeros(size)
+    np.maximum.at(route_days, route, days)
+    
+    result = []
+    for i, name in enumerate(names):
+        buy_exchange, sell_exchange = name.split('\x00')
+        result.append({
+            'buyExchange': buy_exchange,
+            'sellExchange': sell_exchange,
+            'samples': int(route_samples[i]),
+            'mean': round(float(route_mean[i]), 4),
+            'episodes': int(route_episodes[i]),
+            'perDay': round(float(route_episodes[i] / route_days[i]), 3) if route_days[i] else 0.0
+        })
+    result.sort(key=lambda item: (-item['episodes'], -item['samples']))
+    return result
+
+
+def summarize_coins(history: SpreadHistory) -> List[Dict[str, Any]]:
+    '''Перцентили спреда по монете с учётом всех её пар'''
+    names, coin_of_pair = np.unique(np.array([crypto for crypto, _, _ in history.labels], dtype=object), return_inverse=True)
+    coin = coin_of_pair[history.pair] if len(history.pair) else np.empty(0, np.int64)
+    samples = np.bincount(coin, minlength=len(names))
+    percentiles = grouped_percentiles(coin, history.spread, PERCENTILES, len(names))
+    return [
+        {
+            'crypto': name,
+            'samples': int(samples[i]),
+            'percentiles': {f'p{round(q * 100)}': round(float(v), 4) for q, v in zip(PERCENTILES, percentiles[i])}
+        }
+        for i, name in enumerate(names)
+    ]
@@ -0,0 +1,112 @@
+import json
+import math
+import time
+from typing import Dict, Any
+from datetime import datetime, timezone
+import psycopg2
+import psycopg2.extensions
+from analytics import load_history, summarize
+from db_pool import ConnectionPool
+
+POOL = ConnectionPool.from_env()
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 90
+# Пороги, которые сейчас зашиты в verified-opportunities (5%) и p2p-fiat (4%), и ниже
+DEFAULT_THRESHOLD = 5.0
+DEFAULT_THRESHOLDS = '0.5,1,2,4,5'
+DEFAULT_WINDOW_MINUTES = 60
+DEFAULT_LIMIT = 50
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    Аналитика истории спредов для подбора порогов: перцентили спреда по парам бирж и монетам,
+    доля замеров выше порогов, длительность и частота эпизодов выше threshold,
+    скользящее среднее за window минут. crypto=ALL или BTC,ETH, days — глубина истории.
+    '''
+    method: str = event.get('httpMethod', 'GET')
+    
+    if method == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'GET, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': '',
+            'isBase64Encoded': False
+        }
+    
+    if method != 'GET':
+        return error_response(405, 'Method not allowed')
+    
+    params = event.get('queryStringParameters', {}) or {}
+    crypto = params.get('crypto', 'ALL').upper()
+    cryptos = [] if crypto == 'ALL' else [c.strip() for c in crypto.split(',') if c.strip()]
+    try:
+        days = float(params.get('days', DEFAULT_DAYS))
+        threshold = float(params.get('threshold', DEFAULT_THRESHOLD))
+        thresholds = {float(t) for t in params.get('thresholds', DEFAULT_THRESHOLDS).split(',') if t.strip()}
+        window_minutes = min(max(int(params.get('window', DEFAULT_WINDOW_MINUTES)), 1), 60 * 24 * 7)
+        limit = min(max(int(params.get('limit', DEFAULT_LIMIT)), 1), 1000)
+    except ValueError:
+        return error_response(400, 'days, threshold and thresholds must be numbers, window and limit integers')
+    if not all(math.isfinite(value) for value in (days, threshold, *thresholds)):
+        return error_response(400, 'days and thresholds must be finite')
+    days = min(max(days, 1 / 24), MAX_DAYS)
+    thresholds = sorted(thresholds | {threshold})
+    
+    now = time.time()
+    since = now - days * 86400
+    
+    started = time.monotonic()
+    conn = POOL.getconn()
+    try:
+        # Метки пар и замеры читаются двумя запросами из одного снимка
+        conn.set_session(isolation_level=psycopg2.extensions.ISOLATION_LEVEL_REPEATABLE_READ, readonly=True)
+        with conn.cursor() as cur:
+            history = load_history(cur, since, cryptos)
+        conn.rollback()
+    finally:
+        POOL.putconn(conn)
+    loaded = time.monotonic()
+    
+    stats = summarize(history, threshold, thresholds, window_minutes * 60, limit)
+    computed = time.monotonic()
+    
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({
+            'crypto': crypto,
+            'from': datetime.fromtimestamp(since, timezone.utc).isoformat(),
+            'to': datetime.fromtimestamp(now, timezone.utc).isoformat(),
+            'days': days,
+            'threshold': threshold,
+            'windowMinutes': window_minutes,
+            'pairsTotal': history.pairs,
+            **stats,
+            'timing': {
+                'loadMs': round((loaded - started) * 1000, 1),
+                'computeMs': round((computed - loaded) * 1000, 1)
+            }
+        }),
+        'isBase64Encoded': False
+    }
+
+
+def error_response(status_code: int, message: str) -> Dict[str, Any]:
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({'error': message}),
+        'isBase64Encoded': False
+    }
@@ -1,10 +1,12 @@
 import json
-import os
 import psycopg2
 import secrets
 import string
 from typing import Dict, Any
 from datetime import datetime
+from db_pool import ConnectionPool
+
+POOL = ConnectionPool.from_env()
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -35,8 +37,14 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'body': json.dumps({'error': 'Unauthorized'})
         }
     
-    dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
+    conn = POOL.getconn()
+    try:
+        return manage_tokens(conn, event, method)
+    finally:
+        POOL.putconn(conn)
+
+def manage_tokens(conn, event: Dict[str, Any], method: str) -> Dict[str, Any]:
+    '''Список, создание и удаление токенов'''
     cur = conn.cursor()
     
     if method == 'GET':
@@ -51,9 +59,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'used_at': row[4].isoformat() if row[4] else None
             })
         
-        cur.close()
-        conn.close()
-        
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -90,9 +95,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'register_url': f'/register?token={token}'
             }
             
-            cur.close()
-            conn.close()
-            
             return {
                 'statusCode': 200,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -101,8 +103,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             }
         except psycopg2.IntegrityError:
             conn.rollback()
-            cur.close()
-            conn.close()
             return {
                 'statusCode': 400,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -125,9 +125,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         cur.execute("DELETE FROM tokens WHERE token = %s", (token,))
         conn.commit()
         
-        cur.close()
-        conn.close()
-        
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -1,9 +1,15 @@
 import json
 import os
-import psycopg2
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, Any, List
 import requests
+from schemes_store import SchemeRow, save_schemes, prune_schemes
+from db_pool import ConnectionPool
+
+POOL = ConnectionPool.from_env()
+
+# Прибыль в profit_usd — на этот объём сделки в USDT, как в cron-update-schemes
+SCHEME_NOTIONAL_USD = float(os.environ.get('SCHEME_NOTIONAL_USD', '10000'))
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -23,56 +29,49 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'body': ''
         }
     
-    dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
-    cur = conn.cursor()
-    
     cryptos = ['BTC', 'ETH', 'USDT', 'BNB', 'SOL', 'XRP', 'ADA', 'DOGE']
-    new_schemes = 0
-    deleted_schemes = 0
+    scheme_rows: List[SchemeRow] = []
+    
+    matrix: Dict[str, List[Dict[str, Any]]] = {}
+    try:
+        response = requests.get(
+            'https://functions.poehali.dev/ac977fcc-5718-4e2b-b050-2421e770d97e',
+            params={'crypto': ','.join(cryptos)},
+            timeout=10
+        )
+        if response.ok:
+            matrix = response.json().get('matrix', {})
+    except Exception as e:
+        print(f'Error fetching prices: {str(e)}')
     
     for crypto in cryptos:
-        try:
-            response = requests.get(
-                f'https://functions.poehali.dev/ac977fcc-5718-4e2b-b050-2421e770d97e?crypto={crypto}',
-                timeout=10
-            )
+        exchanges = matrix.get(crypto, [])
+        
+        if len(exchanges) >= 2:
+            exchanges_sorted = sorted(exchanges, key=lambda x: x['price'])
+            buy_ex = exchanges_sorted[0]
+            sell_ex = exchanges_sorted[-1]
             
-            if response.ok:
-                data = response.json()
-                exchanges = data.get('exchanges', [])
-                
-                if len(exchanges) >= 2:
-                    exchanges_sorted = sorted(exchanges, key=lambda x: x['price'])
-                    buy_ex = exchanges_sorted[0]
-                    sell_ex = exchanges_sorted[-1]
-                    
-                    spread_percent = ((sell_ex['price'] - buy_ex['price']) / buy_ex['price']) * 100
-                    profit_usd = (sell_ex['price'] - buy_ex['price']) * 1
-                    
-                    if spread_percent >= 0.1:
-                        cur.execute(
-                            "INSERT INTO arbitrage_schemes (crypto, buy_exchange, sell_exchange, buy_price, sell_price, spread_percent, profit_usd) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-                            (crypto, buy_ex['name'], sell_ex['name'], buy_ex['price'], sell_ex['price'], spread_percent, profit_usd)
-                        )
-                        new_schemes += 1
-        except Exception as e:
-            print(f'Error fetching {crypto}: {str(e)}')
-    
-    yesterday = datetime.now() - timedelta(days=1)
-    cur.execute(
-        "DELETE FROM arbitrage_schemes WHERE created_at < %s OR spread_percent < 0.05",
-        (yesterday,)
-    )
-    deleted_schemes = cur.rowcount
+            spread_percent = ((sell_ex['price'] - buy_ex['price']) / buy_ex['price']) * 100
+            profit_usd = SCHEME_NOTIONAL_USD * spread_percent / 100
+            
+            if spread_percent >= 0.1:
+                scheme_rows.append((crypto, buy_ex['name'], sell_ex['name'], buy_ex['price'], sell_ex['price'], spread_percent, profit_usd))
     
-    conn.commit()
-    cur.close()
-    conn.close()
+    # Соединение берётся только на запись, не на время запроса цен
+    conn = POOL.getconn()
+    try:
+        with conn.cursor() as cur:
+            new_schemes, updated_schemes = save_schemes(cur, scheme_rows)
+            deleted_schemes = prune_schemes(cur)
+        conn.commit()
+    finally:
+        POOL.putconn(conn)
     
     result = {
         'success': True,
         'new_schemes': new_schemes,
+        'updated_schemes': updated_schemes,
         'deleted_schemes': deleted_schemes,
         'timestamp': datetime.now().isoformat()
     }
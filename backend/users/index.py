@@ -1,11 +1,12 @@
 import json
-import os
 import hashlib
 import secrets
 from typing import Dict, Any, Optional, List
 from datetime import datetime
-import psycopg2
 import psycopg2.extras
+from db_pool import ConnectionPool
+
+POOL = ConnectionPool.from_env()
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -30,7 +31,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     headers = event.get('headers', {})
     admin_token = headers.get('X-Admin-Token') or headers.get('x-admin-token')
     
-    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    conn = POOL.getconn()
     
     try:
         if method == 'GET':
@@ -44,7 +45,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         else:
             return error_response(405, 'Method not allowed')
     finally:
-        conn.close()
+        POOL.putconn(conn)
 
 def get_users(conn, event: Dict[str, Any]) -> Dict[str, Any]:
     '''Получить список всех пользователей'''
@@ -176,6 +177,13 @@ def update_user(conn, event: Dict[str, Any]) -> Dict[str, Any]:
         if not row:
             return error_response(404, 'User not found')
         
+        if body.get('isActive') is False:
+            # Закрытые сессии подхватит опрос отзывов в auth
+            cur.execute('''
+                UPDATE user_sessions SET logged_out_at = CURRENT_TIMESTAMP
+                WHERE user_id = %s AND logged_out_at IS NULL
+            ''', (user_id,))
+        
         conn.commit()
         
         user = {
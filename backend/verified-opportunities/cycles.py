@@ -0,0 +1,207 @@
+'''
+Поиск многоходовых арбитражных циклов (треугольных и длиннее) на графе курсов.
+Вершина — актив на площадке (биржа, монета), ребро — обмен или перевод с курсом
+за вычетом комиссий и весом -log(курс): прибыльный цикл — цикл отрицательного веса.
+
+Цикл через ребро u -> v ищется Bellman-Ford по слоям: кратчайший путь v ~> u
+не длиннее max_hops - 1 рёбер. Граф обновляется по одному ребру: известные циклы через
+изменённое ребро пересчитываются по индексу, а если курс улучшился — ищется новый цикл
+только через это ребро; остальной граф не пересчитывается.
+'''
+import math
+import time
+import threading
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+Node = Tuple[str, str]
+Cycle = Tuple[int, ...]
+EPSILON = 1e-12
+
+
+class ArbitrageGraph:
+    def __init__(self, max_hops: int = 4, min_profit: float = 0.0) -> None:
+        self.max_hops = max_hops
+        # Цикл прибылен, если его вес ниже -log(1 + min_profit%)
+        self.threshold = -math.log1p(min_profit / 100)
+        self._lock = threading.RLock()
+        self._ids: Dict[Node, int] = {}
+        self._nodes: List[Node] = []
+        self._out: List[Dict[int, float]] = []
+        self._edges: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        self._cycles: Dict[Cycle, float] = {}
+        self._cycles_by_edge: Dict[Tuple[int, int], Set[Cycle]] = {}
+    
+    def _node(self, node: Node) -> int:
+        index = self._ids.get(node)
+        if index is None:
+            index = self._ids[node] = len(self._nodes)
+            self._nodes.append(node)
+            self._out.append({})
+        return index
+    
+    def set_rate(self, src: Node, dst: Node, rate: float, kind: str, detect: bool = True) -> List[Cycle]:
+        '''
+        Курс ребра src -> dst (сколько dst получается за единицу src после комиссий).
+        Возвращает новые прибыльные циклы через это ребро; detect=False — только записать.
+        '''
+        with self._lock:
+            u, v = self._node(src), self._node(dst)
+            weight = -math.log(rate)
+            previous = self._out[u].get(v)
+            self._out[u][v] = weight
+            self._edges[(u, v)] = {'rate': rate, 'kind': kind, 'updatedAt': time.time()}
+            if previous is not None and abs(previous - weight) < EPSILON:
+                return []
+            self._revalidate((u, v))
+            if not detect or (previous is not None and weight > previous):
+                return []
+            return self._search_through(u, v)
+    
+    def remove_edge(self, src: Node, dst: Node) -> None:
+        with self._lock:
+            u, v = self._ids.get(src), self._ids.get(dst)
+            if u is None or v is None or v not in self._out[u]:
+                return
+            del self._out[u][v]
+            del self._edges[(u, v)]
+            for cycle in list(self._cycles_by_edge.pop((u, v), ())):
+                self._forget(cycle)
+    
+    def set_market(self, venue: str, base: str, quote: str, bid: float, ask: float, fee: float,
+                   detect: bool = True) -> List[Cycle]:
+        '''Спотовый рынок base/quote: покупка base по ask и продажа по bid, fee — комиссия в процентах'''
+        keep = 1 - fee / 100
+        found = self.set_rate((venue, quote), (venue, base), keep / ask, 'trade', detect)
+        found += self.set_rate((venue, base), (venue, quote), bid * keep, 'trade', detect)
+        return found
+    
+    def set_transfer(self, asset: str, src_venue: str, dst_venue: str, fee: float, detect: bool = True) -> List[Cycle]:
+        '''Перевод актива между площадками с потерей fee процентов'''
+        return self.set_rate((src_venue, asset), (dst_venue, asset), 1 - fee / 100, 'transfer', detect)
+    
+    def prune(self, max_age: float) -> int:
+        '''Удаляет рёбра, не обновлявшиеся дольше max_age секунд, вместе с их циклами'''
+        cutoff = time.time() - max_age
+        stale = [(self._nodes[u], self._nodes[v]) for (u, v), edge in list(self._edges.items()) if edge['updatedAt'] < cutoff]
+        for src, dst in stale:
+            self.remove_edge(src, dst)
+        return len(stale)
+    
+    def detect_all(self) -> int:
+        '''
+        Полный поиск: тот же поиск по слоям через каждое ребро отрицательного веса
+        (в любом отрицательном цикле есть хотя бы одно такое). Возвращает число новых циклов.
+        '''
+        with self._lock:
+            found = 0
+            for u, targets in enumerate(self._out):
+                for v, weight in list(targets.items()):
+                    if weight < 0:
+                        found += len(self._search_through(u, v))
+            return found
+    
+    def _search_through(self, u: int, v: int) -> List[Cycle]:
+        '''
+        Кратчайший путь v ~> u не длиннее max_hops - 1 рёбер (Bellman-Ford по слоям):
+        вместе с ребром u -> v он даёт самый выгодный цикл через это ребро.
+        '''
+        best: Dict[int, float] = {v: 0.0}
+        # layers[k][node] = (вес пути из k рёбер, предок, слой предка)
+        layers: List[Dict[int, Tuple[float, int, int]]] = [{v: (0.0, -1, -1)}]
+        closing = (math.inf, -1)
+        for hop in range(1, self.max_hops):
+            layer: Dict[int, Tuple[float, int, int]] = {}
+            for x, (dx, _, _) in layers[-1].items():
+                for y, weight in self._out[x].items():
+                    dy = dx + weight
+                    if y == v or dy >= best.get(y, math.inf) - EPSILON:
+                        continue
+                    best[y] = dy
+                    layer[y] = (dy, x, hop - 1)
+            if not layer:
+                break
+            layers.append(layer)
+            if u in layer and layer[u][0] + self._out[u][v] < closing[0]:
+                closing = (layer[u][0] + self._out[u][v], hop)
+        
+        weight, hop = closing
+        if hop < 0 or weight >= self.threshold:
+            return []
+        path = []
+        node = u
+        while hop >= 0:
+            path.append(node)
+            _, node, hop = layers[hop][node]
+        path.reverse()
+        if len(set(path)) != len(path):
+            return []
+        cycle = self._canonical(path)
+        return [cycle] if self._remember(cycle) else []
+    
+    def _canonical(self, path: List[int]) -> Cycle:
+        start = path.index(min(path))
+        return tuple(path[start:] + path[:start])
+    
+    def _cycle_weight(self, cycle: Cycle) -> Optional[float]:
+        total = 0.0
+        for i, u in enumerate(cycle):
+            weight = self._out[u].get(cycle[(i + 1) % len(cycle)])
+            if weight is None:
+                return None
+            total += weight
+        return total
+    
+    def _remember(self, cycle: Cycle) -> bool:
+        cycle = self._canonical(list(cycle))
+        weight = self._cycle_weight(cycle)
+        if weight is None or weight >= self.threshold or len(cycle) > self.max_hops:
+            return False
+        is_new = cycle not in self._cycles
+        self._cycles[cycle] = weight
+        for i, u in enumerate(cycle):
+            self._cycles_by_edge.setdefault((u, cycle[(i + 1) % len(cycle)]), set()).add(cycle)
+        return is_new
+    
+    def _forget(self, cycle: Cycle) -> None:
+        self._cycles.pop(cycle, None)
+        for i, u in enumerate(cycle):
+            cycles = self._cycles_by_edge.get((u, cycle[(i + 1) % len(cycle)]))
+            if cycles:
+                cycles.discard(cycle)
+    
+    def _revalidate(self, edge: Tuple[int, int]) -> None:
+        '''Пересчитывает известные циклы через ребро и забывает ставшие неприбыльными'''
+        for cycle in list(self._cycles_by_edge.get(edge, ())):
+            weight = self._cycle_weight(cycle)
+            if weight is None or weight >= self.threshold:
+                self._forget(cycle)
+            else:
+                self._cycles[cycle] = weight
+    
+    def profitable(self, limit: int = 10) -> List[Dict[str, Any]]:
+        '''Известные прибыльные циклы, самые выгодные первыми'''
+        with self._lock:
+            ranked = sorted(self._cycles.items(), key=lambda item: item[1])[:limit]
+            result = []
+            for cycle, weight in ranked:
+                steps = []
+                for i, u in enumerate(cycle):
+                    v = cycle[(i + 1) % len(cycle)]
+                    edge = self._edges[(u, v)]
+                    (src_venue, src_asset), (dst_venue, dst_asset) = self._nodes[u], self._nodes[v]
+                    steps.append({
+                        'from': {'venue': src_venue, 'asset': src_asset},
+                        'to': {'venue': dst_venue, 'asset': dst_asset},
+                        'kind': edge['kind'],
+                        'rate': edge['rate']
+                    })
+                result.append({
+                    'profit': round(math.expm1(-weight) * 100, 4),
+                    'hops': len(cycle),
+                    'steps': steps
+                })
+            return result
+    
+    @property
+    def size(self) -> Tuple[int, int]:
+        return len(self._nodes), len(self._edges)
@@ -0,0 +1,194 @@
+'''
+Реестр адаптеров бирж: формат символа, URL тикеров, разбор ответа и комиссия.
+Собирается один раз при импорте и используется и для одиночных, и для массовых запросов.
+Чтобы добавить биржу, достаточно одной записи в EXCHANGES.
+'''
+from typing import Dict, Any, List, Optional, Callable, Iterable, Tuple
+from urllib.parse import urlsplit
+from orderbook import OrderBook
+
+SUPPORTED_CRYPTOS = [
+    'BTC', 'ETH', 'USDT', 'SOL', 'XRP', 'BNB', 'ADA', 'DOGE', 'AVAX', 'DOT',
+    'MATIC', 'LINK', 'UNI', 'LTC', 'TRX', 'ATOM', 'XLM', 'ETC', 'FIL', 'SHIB'
+]
+
+Quote = Dict[str, float]
+# get_json(url, timeout, kind=...): kind — вид запроса для адаптивного таймаута коннектора
+JsonFetcher = Callable[..., Any]
+BookLevels = Tuple[List[List[Any]], List[List[Any]]]
+
+
+class ExchangeAdapter:
+    '''
+    Описание публичного API спотовой биржи.
+    extract_ticker достаёт сырой тикер из ответа одиночного запроса,
+    extract_tickers — список тикеров из ответа массового запроса,
+    parse приводит сырой тикер к Quote: price, volume (в единицах биржи) и change24h в процентах,
+    extract_book достаёт из ответа depth_url пару (bids, asks) уровней [цена, объём, ...].
+    volume_unit — делитель объёма для ответа API: по умолчанию миллионы, OKX отдаёт vol24h как есть.
+    '''
+    
+    def __init__(self, key: str, name: str, site_url: str, fee: float,
+                 symbol_format: Callable[[str], str],
+                 ticker_url: str, bulk_url: str,
+                 extract_ticker: Callable[[Any], Optional[Dict[str, Any]]],
+                 extract_tickers: Callable[[Any], Iterable[Dict[str, Any]]],
+                 symbol_field: str,
+                 parse: Callable[[Dict[str, Any]], Quote],
+                 depth_url: str,
+                 extract_book: Callable[[Any], Optional[BookLevels]],
+                 volume_unit: float = 1000000) -> None:
+        self.key = key
+        self.name = name
+        self.site_url = site_url
+        self.fee = fee
+        self.data_source = f'{name} Public API'
+        # Хост REST API: по нему ведётся здоровье биржи в коннекторе
+        self.host = urlsplit(ticker_url).hostname or ''
+        self.ticker_url = ticker_url
+        self.bulk_url = bulk_url
+        self.extract_ticker = extract_ticker
+        self.extract_tickers = extract_tickers
+        self.symbol_field = symbol_field
+        self.parse = parse
+        self.depth_url = depth_url
+        self.extract_book = extract_book
+        self.volume_unit = volume_unit
+        self.symbols = {crypto: symbol_format(crypto) for crypto in SUPPORTED_CRYPTOS if crypto != 'USDT'}
+        self.cryptos_by_symbol = {symbol: crypto for crypto, symbol in self.symbols.items()}
+    
+    def fetch(self, crypto: str, get_json: JsonFetcher, timeout: float = 2) -> Optional[Quote]:
+        symbol = self.symbols.get(crypto)
+        if not symbol:
+            return None
+        ticker = self.extract_ticker(get_json(self.ticker_url.format(symbol=symbol), timeout, kind='ticker'))
+        return self.parse(ticker) if ticker else None
+    
+    def fetch_all(self, cryptos: List[str], get_json: JsonFetcher, timeout: float = 5) -> Dict[str, Quote]:
+        wanted = set(cryptos)
+        quotes: Dict[str, Quote] = {}
+        for ticker in self.extract_tickers(get_json(self.bulk_url, timeout, kind='bulk')) or []:
+            crypto = self.cryptos_by_symbol.get(ticker.get(self.symbol_field))
+            if crypto in wanted:
+                quotes[crypto] = self.parse(ticker)
+        return quotes
+    
+    def fetch_book(self, crypto: str, get_json: JsonFetcher, timeout: float = 3) -> Optional[OrderBook]:
+        symbol = self.symbols.get(crypto)
+        if not symbol:
+            return None
+        levels = self.extract_book(get_json(self.depth_url.format(symbol=symbol), timeout, kind='book'))
+        return OrderBook(*levels) if levels else None
+
+
+def first(items: Optional[List[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    return items[0] if items else None
+
+
+def sides(book: Optional[Dict[str, Any]], bids: str = 'bids', asks: str = 'asks') -> Optional[BookLevels]:
+    return (book.get(bids) or [], book.get(asks) or []) if book else None
+
+
+def percent_change(last: float, open_price: float) -> float:
+    return (last - open_price) / open_price * 100 if open_price else 0.0
+
+
+EXCHANGES: Dict[str, ExchangeAdapter] = {adapter.key: adapter for adapter in [
+    ExchangeAdapter(
+        key='binance', name='Binance', site_url='https://www.binance.com', fee=0.1,
+        symbol_format=lambda crypto: f'{crypto}USDT',
+        ticker_url='https://api.binance.com/api/v3/ticker/24hr?symbol={symbol}',
+        bulk_url='https://api.binance.com/api/v3/ticker/24hr',
+        extract_ticker=lambda data: data,
+        extract_tickers=lambda data: data,
+        symbol_field='symbol',
+        parse=lambda t: {'price': float(t['lastPrice']), 'volume': float(t['volume']), 'change24h': float(t['priceChangePercent'])},
+        depth_url='https://api.binance.com/api/v3/depth?symbol={symbol}&limit=100',
+        extract_book=sides
+    ),
+    ExchangeAdapter(
+        key='bybit', name='Bybit', site_url='https://www.bybit.com', fee=0.1,
+        symbol_format=lambda crypto: f'{crypto}USDT',
+        ticker_url='https://api.bybit.com/v5/market/tickers?category=spot&symbol={symbol}',
+        bulk_url='https://api.bybit.com/v5/market/tickers?category=spot',
+        extract_ticker=lambda data: first((data.get('result') or {}).get('list')),
+        extract_tickers=lambda data: (data.get('result') or {}).get('list'),
+        symbol_field='symbol',
+        parse=lambda t: {'price': float(t['lastPrice']), 'volume': float(t.get('volume24h', '0')), 'change24h': float(t.get('price24hPcnt', '0')) * 100},
+        depth_url='https://api.bybit.com/v5/market/orderbook?category=spot&symbol={symbol}&limit=200',
+        extract_book=lambda data: sides(data.get('result'), 'b', 'a')
+    ),
+    ExchangeAdapter(
+        key='okx', name='OKX', site_url='https://www.okx.com', fee=0.08,
+        symbol_format=lambda crypto: f'{crypto}-USDT',
+        ticker_url='https://www.okx.com/api/v5/market/ticker?instId={symbol}',
+        bulk_url='https://www.okx.com/api/v5/market/tickers?instType=SPOT',
+        extract_ticker=lambda data: first(data.get('data')),
+        extract_tickers=lambda data: data.get('data'),
+        symbol_field='instId',
+        parse=lambda t: {'price': float(t['last']), 'volume': float(t.get('vol24h', '0')), 'change24h': percent_change(float(t['last']), float(t.get('open24h') or 0))},
+        depth_url='https://www.okx.com/api/v5/market/books?instId={symbol}&sz=400',
+        extract_book=lambda data: sides(first(data.get('data'))),
+        volume_unit=1
+    ),
+    ExchangeAdapter(
+        key='kucoin', name='KuCoin', site_url='https://www.kucoin.com', fee=0.1,
+        symbol_format=lambda crypto: f'{crypto}-USDT',
+        ticker_url='https://api.kucoin.com/api/v1/market/stats?symbol={symbol}',
+        bulk_url='https://api.kucoin.com/api/v1/market/allTickers',
+        extract_ticker=lambda data: data.get('data') if data.get('code') == '200000' else None,
+        extract_tickers=lambda data: (data.get('data') or {}).get('ticker') if data.get('code') == '200000' else None,
+        symbol_field='symbol',
+        parse=lambda t: {'price': float(t['last']), 'volume': float(t['volValue']), 'change24h': float(t['changeRate']) * 100},
+        depth_url='https://api.kucoin.com/api/v1/market/orderbook/level2_100?symbol={symbol}',
+        extract_book=lambda data: sides(data.get('data')) if data.get('code') == '200000' else None
+    ),
+    ExchangeAdapter(
+        key='gate', name='Gate.io', site_url='https://www.gate.io', fee=0.2,
+        symbol_format=lambda crypto: f'{crypto}_USDT',
+        ticker_url='https://api.gateio.ws/api/v4/spot/tickers?currency_pair={symbol}',
+        bulk_url='https://api.gateio.ws/api/v4/spot/tickers',
+        extract_ticker=lambda data: first(data),
+        extract_tickers=lambda data: data,
+        symbol_field='currency_pair',
+        parse=lambda t: {'price': float(t['last']), 'volume': float(t['quote_volume']), 'change24h': float(t['change_percentage'])},
+        depth_url='https://api.gateio.ws/api/v4/spot/order_book?currency_pair={symbol}&limit=100',
+        extract_book=sides
+    ),
+    ExchangeAdapter(
+        key='mexc', name='MEXC', site_url='https://www.mexc.com', fee=0.0,
+        symbol_format=lambda crypto: f'{crypto}USDT',
+        ticker_url='https://api.mexc.com/api/v3/ticker/24hr?symbol={symbol}',
+        bulk_url='https://api.mexc.com/api/v3/ticker/24hr',
+        extract_ticker=lambda data: data,
+        extract_tickers=lambda data: data,
+        symbol_field='symbol',
+        parse=lambda t: {'price': float(t['lastPrice']), 'volume': float(t['volume']), 'change24h': float(t['priceChangePercent'])},
+        depth_url='https://api.mexc.com/api/v3/depth?symbol={symbol}&limit=100',
+        extract_book=sides
+    ),
+    ExchangeAdapter(
+        key='bitget', name='Bitget', site_url='https://www.bitget.com', fee=0.1,
+        symbol_format=lambda crypto: f'{crypto}USDT',
+        ticker_url='https://api.bitget.com/api/v2/spot/market/tickers?symbol={symbol}',
+        bulk_url='https://api.bitget.com/api/v2/spot/market/tickers',
+        extract_ticker=lambda data: first(data.get('data')),
+        extract_tickers=lambda data: data.get('data'),
+        symbol_field='symbol',
+        parse=lambda t: {'price': float(t['lastPr']), 'volume': float(t.get('baseVolume', '0')), 'change24h': float(t.get('change24h', '0')) * 100},
+        depth_url='https://api.bitget.com/api/v2/spot/market/orderbook?symbol={symbol}&type=step0&limit=100',
+        extract_book=lambda data: sides(data.get('data'))
+    ),
+    ExchangeAdapter(
+        key='htx', name='HTX', site_url='https://www.htx.com', fee=0.2,
+        symbol_format=lambda crypto: f'{crypto.lower()}usdt',
+        ticker_url='https://api.huobi.pro/market/detail/merged?symbol={symbol}',
+        bulk_url='https://api.huobi.pro/market/tickers',
+        extract_ticker=lambda data: data.get('tick'),
+        extract_tickers=lambda data: data.get('data'),
+        symbol_field='symbol',
+        parse=lambda t: {'price': float(t['close']), 'volume': float(t.get('vol', 0)), 'change24h': percent_change(float(t['close']), float(t['open']))},
+        depth_url='https://api.huobi.pro/market/depth?symbol={symbol}&type=step0',
+        extract_book=lambda data: sides(data.get('tick'))
+    )
+]}
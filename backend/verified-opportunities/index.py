@@ -1,14 +1,52 @@
 import json
-import urllib.request
-import urllib.error
-from typing import Dict, Any, List, Optional
+import time
+from typing import Dict, Any, List, Set, Tuple
 from datetime import datetime, timezone
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from connector import AsyncConnector
+from health import CircuitOpenError
+from exchanges import EXCHANGES, SUPPORTED_CRYPTOS
+from spreads import rank_spreads, PriceBook
+from orderbook import OrderBook, executable_spread
+from cycles import ArbitrageGraph
+
+CONNECTOR = AsyncConnector.from_env()
+# Общий пул переживает вызовы: источники, не успевшие к кворуму, дорабатывают в фоне
+FETCH_POOL = ThreadPoolExecutor(max_workers=16)
+# Граф курсов для многоходовых циклов живёт между вызовами и обновляется по рёбрам
+CYCLE_MAX_HOPS = 4
+GRAPH = ArbitrageGraph(max_hops=CYCLE_MAX_HOPS)
+
+# Источники проверки: Binance — основной, остальные — независимые подтверждения
+VERIFIED_EXCHANGES = ['binance', 'bybit', 'okx', 'kucoin', 'gate', 'htx', 'mexc']
+
+DEFAULT_DEADLINE_MS = 4000
+MIN_SOURCES = 3
+DEFAULT_QUORUM = 5
+DEFAULT_MIN_SPREAD = 5.0
+DEFAULT_LIMIT = 10
+DEFAULT_NOTIONALS = '1000,10000,100000'
+# Потеря на выводе монеты с одной площадки на другую, %
+TRANSFER_FEE = 0.1
+# Рёбра, не подтверждённые свежими ценами дольше этого срока, удаляются из графа
+CYCLE_EDGE_MAX_AGE = 120
+
+CRYPTO_PRICES_URL = 'https://functions.poehali.dev/ac977fcc-5718-4e2b-b050-2421e770d97e'
+P2P_FIAT_URL = 'https://functions.poehali.dev/e246ae66-caf5-49da-a672-7d1c231eacb5'
+# Запас на сеть и разбор ответа при вызове соседней функции; p2p-fiat не принимает deadlineMs меньше 500
+FUNCTION_CALL_MARGIN = 0.5
+FUNCTION_MIN_DEADLINE_MS = 500
+
+EXCHANGE_KEYS = {EXCHANGES[key].name: key for key in VERIFIED_EXCHANGES}
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Ищет и проверяет 100% рабочие арбитражные связки со спредом выше 5%.
     Проверяет актуальность через несколько независимых API.
-    Возвращает только подтвержденные связки с реальным спредом >5%.
+    Возвращает только подтвержденные связки с реальным спредом выше minSpread (по умолчанию 5%),
+    отсортированные по убыванию спреда; crypto=ALL или BTC,ETH — поиск по нескольким монетам.
+    cycles=1 — дополнительно многоходовые циклы через биржи, P2P-площадки и RUB.
     '''
     method: str = event.get('httpMethod', 'GET')
     
@@ -26,18 +64,43 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     
     if method != 'GET':
-        return {
-            'statusCode': 405,
-            'headers': {'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
+        return error_response(405, 'Method not allowed')
     
     params = event.get('queryStringParameters', {}) or {}
     crypto = params.get('crypto', 'BTC').upper()
+    cryptos = parse_cryptos(crypto)
+    try:
+        min_spread = float(params.get('minSpread', DEFAULT_MIN_SPREAD))
+        limit = min(max(int(params.get('limit', DEFAULT_LIMIT)), 1), 100)
+        notionals = [float(n) for n in params.get('notional', DEFAULT_NOTIONALS).split(',') if n.strip() and float(n) > 0]
+        deadline_ms = min(max(int(params.get('deadlineMs', DEFAULT_DEADLINE_MS)), 100), 10000)
+        quorum = min(max(int(params.get('quorum', DEFAULT_QUORUM)), MIN_SOURCES), len(VERIFIED_EXCHANGES))
+    except ValueError:
+        return error_response(400, 'minSpread and notional must be numbers, limit, deadlineMs and quorum integers')
+    deadline = time.monotonic() + deadline_ms / 1000
+    with_cycles = params.get('cycles') in ('1', 'true')
+    
+    p2p_future = FETCH_POOL.submit(fetch_p2p_markets, cryptos, deadline) if with_cycles else None
     
     # Проверяем цены через несколько источников для подтверждения
-    verified_opportunity = find_verified_high_spread_opportunity(crypto)
+    opportunities, sources, prices = find_verified_high_spread_opportunities(cryptos, deadline, quorum, min_spread, limit)
+    if opportunities and notionals:
+        attach_executable_spreads(opportunities, notionals, deadline)
+    
+    result = {
+        'opportunity': opportunities[0] if opportunities else None,
+        'opportunities': opportunities,
+        'crypto': crypto,
+        'minSpread': min_spread,
+        'notionals': notionals,
+        'quorum': quorum,
+        'sources': sources,
+        'health': {EXCHANGES[key].name: CONNECTOR.health.snapshot(EXCHANGES[key].host) for key in VERIFIED_EXCHANGES},
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'nextCheck': 'через 1 час'
+    }
+    if p2p_future:
+        result['cycles'] = find_cycles(prices, p2p_future, deadline, limit)
     
     return {
         'statusCode': 200,
@@ -45,312 +108,231 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'Content-Type': 'application/json',
             'Access-Control-Allow-Origin': '*',
         },
-        'body': json.dumps({
-            'opportunity': verified_opportunity,
-            'crypto': crypto,
-            'timestamp': datetime.now(timezone.utc).isoformat(),
-            'nextCheck': 'через 1 час'
-        }),
+        'body': json.dumps(result),
+        'isBase64Encoded': False
+    }
+
+
+def error_response(status_code: int, message: str) -> Dict[str, Any]:
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({'error': message}),
         'isBase64Encoded': False
     }
 
 
-def find_verified_high_spread_opportunity(crypto: str) -> Optional[Dict[str, Any]]:
-    '''Находит проверенную связку со спредом выше 5%'''
+def time_left(deadline: float) -> float:
+    return max(0.0, deadline - time.monotonic())
+
+
+def parse_cryptos(crypto: str) -> List[str]:
+    '''BTC — одна монета, ALL — все поддерживаемые, BTC,ETH — список'''
+    if crypto == 'ALL':
+        return [c for c in SUPPORTED_CRYPTOS if c != 'USDT']
+    return [c.strip() for c in crypto.split(',') if c.strip()] or ['BTC']
+
+
+def find_verified_high_spread_opportunities(cryptos: List[str], deadline: float, quorum: int,
+                                            min_spread: float, limit: int) -> Tuple[List[Dict[str, Any]], Dict[str, str], PriceBook]:
+    '''Находит проверенные связки со спредом выше min_spread по всем монетам, лучшие первыми'''
     
     # Получаем цены с основных бирж
-    prices = {}
-    
-    # Binance - основной источник
-    binance_price = fetch_binance_verified(crypto)
-    if binance_price:
-        prices['Binance'] = binance_price
-    
-    # Bybit - проверочный источник 1
-    bybit_price = fetch_bybit_verified(crypto)
-    if bybit_price:
-        prices['Bybit'] = bybit_price
-    
-    # OKX - проверочный источник 2
-    okx_price = fetch_okx_verified(crypto)
-    if okx_price:
-        prices['OKX'] = okx_price
+    prices, sources = collect_verified_prices(cryptos, deadline, quorum)
     
-    # KuCoin - проверочный источник 3
-    kucoin_price = fetch_kucoin_verified(crypto)
-    if kucoin_price:
-        prices['KuCoin'] = kucoin_price
+    verified_at = datetime.now(timezone.utc).isoformat()
+    opportunities = rank_spreads(prices, min_spread=min_spread, limit=limit, min_sources=MIN_SOURCES)
+    for opportunity in opportunities:
+        sources_count = opportunity.pop('sourcesCount')
+        opportunity.update({
+            'verified': True,
+            'lastVerified': verified_at,
+            'sources': f"Проверено через {sources_count} независимых API",
+            'confidence': 'Высокая' if sources_count >= 5 else 'Средняя'
+        })
     
-    # Gate.io - проверочный источник 4
-    gate_price = fetch_gate_verified(crypto)
-    if gate_price:
-        prices['Gate.io'] = gate_price
-    
-    # HTX - проверочный источник 5
-    htx_price = fetch_htx_verified(crypto)
-    if htx_price:
-        prices['HTX'] = htx_price
-    
-    # MEXC - проверочный источник 6
-    mexc_price = fetch_mexc_verified(crypto)
-    if mexc_price:
-        prices['MEXC'] = mexc_price
-    
-    if len(prices) < 3:
-        return None
+    return opportunities, sources, prices
+
+
+def collect_verified_prices(cryptos: List[str], deadline: float, quorum: int) -> Tuple[PriceBook, Dict[str, str]]:
+    '''
+    Опрашивает все источники параллельно и возвращается, как только quorum из них
+    подтвердили цены или истёк общий дедлайн. Статус источника: ok, empty, error, pending
+    или circuit-open — биржа недоступна и запрос отклонён без ожидания таймаута.
+    '''
+    future_to_key = {FETCH_POOL.submit(fetch_verified, key, cryptos): key for key in VERIFIED_EXCHANGES}
+    pending = set(future_to_key)
+    prices: PriceBook = {}
+    statuses: Dict[str, str] = {}
+    confirmed = 0
     
-    # Ищем максимальный спред
-    exchanges = list(prices.keys())
-    best_opportunity = None
-    max_spread = 0.0
+    while pending and confirmed < quorum:
+        done, pending = wait(pending, timeout=time_left(deadline), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            key = future_to_key[future]
+            name = EXCHANGES[key].name
+            try:
+                result = future.result()
+                statuses[key] = 'ok' if result else 'empty'
+                confirmed += 1 if result else 0
+                for crypto, price_data in result.items():
+                    prices.setdefault(crypto, {})[name] = price_data
+            except CircuitOpenError:
+                statuses[key] = 'circuit-open'
+            except Exception as e:
+                statuses[key] = 'error'
+                print(f'{name} fetch error: {e}')
     
-    for buy_exchange in exchanges:
-        for sell_exchange in exchanges:
-            if buy_exchange == sell_exchange:
-                continue
-            
-            buy_data = prices[buy_exchange]
-            sell_data = prices[sell_exchange]
-            
-            # Учитываем комиссии
-            buy_price_with_fee = buy_data['price'] * (1 + buy_data['fee'] / 100)
-            sell_price_with_fee = sell_data['price'] * (1 - sell_data['fee'] / 100)
-            
-            spread = ((sell_price_with_fee - buy_price_with_fee) / buy_price_with_fee) * 100
-            
-            # Только связки со спредом > 5%
-            if spread > 5.0 and spread > max_spread:
-                max_spread = spread
-                best_opportunity = {
-                    'buyExchange': buy_exchange,
-                    'sellExchange': sell_exchange,
-                    'buyPrice': buy_data['price'],
-                    'sellPrice': sell_data['price'],
-                    'spread': round(spread, 2),
-                    'buyUrl': buy_data['url'],
-                    'sellUrl': sell_data['url'],
-                    'verified': True,
-                    'lastVerified': datetime.now(timezone.utc).isoformat(),
-                    'sources': f"Проверено через {len(prices)} независимых API",
-                    'confidence': 'Высокая' if len(prices) >= 5 else 'Средняя'
-                }
+    for future in pending:
+        future.cancel()
     
-    return best_opportunity
+    sources = {EXCHANGES[key].name: statuses.get(key, 'pending') for key in VERIFIED_EXCHANGES}
+    return prices, sources
 
 
-def fetch_binance_verified(crypto: str) -> Optional[Dict[str, Any]]:
-    '''Получает проверенные данные с Binance'''
-    symbol_map = {
-        'BTC': 'BTCUSDT', 'ETH': 'ETHUSDT', 'SOL': 'SOLUSDT',
-        'XRP': 'XRPUSDT', 'BNB': 'BNBUSDT', 'ADA': 'ADAUSDT',
-        'DOGE': 'DOGEUSDT', 'AVAX': 'AVAXUSDT', 'DOT': 'DOTUSDT',
-        'MATIC': 'MATICUSDT', 'LINK': 'LINKUSDT'
+def attach_executable_spreads(opportunities: List[Dict[str, Any]], notionals: List[float], deadline: float) -> None:
+    '''
+    Проверяет связки по стаканам: для каждого объёма в USDT добавляет исполнимый спред
+    с учётом глубины. spread = None, если стакан не получен к дедлайну или глубины не хватает.
+    '''
+    wanted = {(EXCHANGE_KEYS[o[side]], o['crypto']) for o in opportunities for side in ('buyExchange', 'sellExchange')}
+    future_to_book = {
+        FETCH_POOL.submit(EXCHANGES[key].fetch_book, crypto, CONNECTOR.get_json): (key, crypto)
+        for key, crypto in wanted
     }
+    done, _ = wait(future_to_book, timeout=time_left(deadline))
     
-    symbol = symbol_map.get(crypto)
-    if not symbol:
-        return None
+    books: Dict[Tuple[str, str], OrderBook] = {}
+    for future in done:
+        key, crypto = future_to_book[future]
+        try:
+            book = future.result()
+            if book:
+                books[(key, crypto)] = book
+        except Exception as e:
+            print(f'{EXCHANGES[key].name} order book error: {e}')
     
-    try:
-        url = f'https://api.binance.com/api/v3/ticker/24hr?symbol={symbol}'
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        
-        with urllib.request.urlopen(req, timeout=3) as response:
-            data = json.loads(response.read().decode())
-            return {
-                'price': float(data['lastPrice']),
-                'fee': 0.1,
-                'url': 'https://www.binance.com',
-                'volume': float(data['volume'])
-            }
-    except Exception as e:
-        print(f'Binance fetch error: {e}')
-        return None
+    for opportunity in opportunities:
+        buy_key = EXCHANGE_KEYS[opportunity['buyExchange']]
+        sell_key = EXCHANGE_KEYS[opportunity['sellExchange']]
+        buy_book = books.get((buy_key, opportunity['crypto']))
+        sell_book = books.get((sell_key, opportunity['crypto']))
+        executable = []
+        for notional in notionals:
+            fill = None
+            if buy_book and sell_book:
+                fill = executable_spread(buy_book, sell_book, notional, EXCHANGES[buy_key].fee, EXCHANGES[sell_key].fee)
+            executable.append(fill or {'notional': notional, 'spread': None})
+        opportunity['executable'] = executable
 
 
-def fetch_bybit_verified(crypto: str) -> Optional[Dict[str, Any]]:
-    '''Получает проверенные данные с Bybit'''
-    symbol_map = {
-        'BTC': 'BTCUSDT', 'ETH': 'ETHUSDT', 'SOL': 'SOLUSDT',
-        'XRP': 'XRPUSDT', 'BNB': 'BNBUSDT', 'ADA': 'ADAUSDT',
-        'DOGE': 'DOGEUSDT', 'AVAX': 'AVAXUSDT', 'DOT': 'DOTUSDT',
-        'MATIC': 'MATICUSDT', 'LINK': 'LINKUSDT'
-    }
-    
-    symbol = symbol_map.get(crypto)
-    if not symbol:
-        return None
+def fetch_verified(key: str, cryptos: List[str]) -> Dict[str, Dict[str, Any]]:
+    '''
+    Получает проверенные данные с биржи из реестра адаптеров.
+    Одна монета — одиночный тикер, несколько — один массовый запрос.
+    '''
+    adapter = EXCHANGES[key]
+    if len(cryptos) == 1:
+        quote = adapter.fetch(cryptos[0], CONNECTOR.get_json, timeout=3)
+        quotes = {cryptos[0]: quote} if quote else {}
+    else:
+        quotes = adapter.fetch_all(cryptos, CONNECTOR.get_json, timeout=3)
     
-    try:
-        url = f'https://api.bybit.com/v5/market/tickers?category=spot&symbol={symbol}'
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        
-        with urllib.request.urlopen(req, timeout=3) as response:
-            data = json.loads(response.read().decode())
-            if data.get('result') and data['result'].get('list'):
-                ticker = data['result']['list'][0]
-                return {
-                    'price': float(ticker['lastPrice']),
-                    'fee': 0.1,
-                    'url': 'https://www.bybit.com',
-                    'volume': float(ticker.get('volume24h', '0'))
-                }
-    except Exception as e:
-        print(f'Bybit fetch error: {e}')
-        return None
+    return {
+        crypto: {
+            'price': quote['price'],
+            'fee': adapter.fee,
+            'url': adapter.site_url,
+            'volume': quote['volume']
+        }
+        for crypto, quote in quotes.items()
+    }
 
 
-def fetch_okx_verified(crypto: str) -> Optional[Dict[str, Any]]:
-    '''Получает проверенные данные с OKX'''
-    symbol_map = {
-        'BTC': 'BTC-USDT', 'ETH': 'ETH-USDT', 'SOL': 'SOL-USDT',
-        'XRP': 'XRP-USDT', 'BNB': 'BNB-USDT', 'ADA': 'ADA-USDT',
-        'DOGE': 'DOGE-USDT', 'AVAX': 'AVAX-USDT', 'DOT': 'DOT-USDT',
-        'MATIC': 'MATIC-USDT', 'LINK': 'LINK-USDT'
-    }
-    
-    symbol = symbol_map.get(crypto)
-    if not symbol:
-        return None
-    
+def fetch_p2p_markets(cryptos: List[str], deadline: float) -> Dict[str, List[Dict[str, Any]]]:
+    '''
+    Рынки P2P-площадок для графа циклов: строки P2P из crypto-prices (монета за USDT)
+    и курсы USDT/RUB из p2p-fiat. Недоступный источник просто не добавляет рёбер.
+    Обе функции собирают P2P-площадки сами, поэтому читаются по HTTP, но каждая со своим
+    автоматом (у них общий хост) и с deadlineMs из оставшегося времени этого вызова.
+    '''
+    markets: Dict[str, List[Dict[str, Any]]] = {'crypto': [], 'fiat': []}
+    coins = [c for c in cryptos if c != 'USDT']
+    fiat_future = FETCH_POOL.submit(call_function, 'p2p-fiat', P2P_FIAT_URL, {}, deadline)
+    if coins:
+        try:
+            data = call_function('crypto-prices', CRYPTO_PRICES_URL, {'crypto': ','.join(coins)}, deadline)
+            # Одна монета — ответ в режиме exchanges, несколько — в режиме matrix
+            matrix = data.get('matrix') or {data.get('crypto', coins[0]): data.get('exchanges', [])}
+            for crypto, rows in matrix.items():
+                markets['crypto'] += [dict(row, crypto=crypto) for row in rows if row.get('paymentMethod')]
+        except Exception as e:
+            print(f'crypto-prices P2P rows error: {e}')
     try:
-        url = f'https://www.okx.com/api/v5/market/ticker?instId={symbol}'
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        
-        with urllib.request.urlopen(req, timeout=3) as response:
-            data = json.loads(response.read().decode())
-            if data.get('data') and len(data['data']) > 0:
-                ticker = data['data'][0]
-                return {
-                    'price': float(ticker['last']),
-                    'fee': 0.08,
-                    'url': 'https://www.okx.com',
-                    'volume': float(ticker.get('vol24h', '0'))
-                }
+        markets['fiat'] = fiat_future.result().get('quotes', [])
     except Exception as e:
-        print(f'OKX fetch error: {e}')
-        return None
+        print(f'p2p-fiat quotes error: {e}')
+    return markets
 
 
-def fetch_kucoin_verified(crypto: str) -> Optional[Dict[str, Any]]:
-    '''Получает проверенные данные с KuCoin'''
-    symbol_map = {
-        'BTC': 'BTC-USDT', 'ETH': 'ETH-USDT', 'SOL': 'SOL-USDT',
-        'XRP': 'XRP-USDT', 'BNB': 'BNB-USDT', 'ADA': 'ADA-USDT',
-        'DOGE': 'DOGE-USDT', 'AVAX': 'AVAX-USDT', 'DOT': 'DOT-USDT',
-        'MATIC': 'MATIC-USDT', 'LINK': 'LINK-USDT'
-    }
-    
-    symbol = symbol_map.get(crypto)
-    if not symbol:
-        return None
-    
-    try:
-        url = f'https://api.kucoin.com/api/v1/market/orderbook/level1?symbol={symbol}'
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        
-        with urllib.request.urlopen(req, timeout=3) as response:
-            data = json.loads(response.read().decode())
-            if data.get('data'):
-                return {
-                    'price': float(data['data']['price']),
-                    'fee': 0.1,
-                    'url': 'https://www.kucoin.com',
-                    'volume': float(data['data'].get('size', '0'))
-                }
-    except Exception as e:
-        print(f'KuCoin fetch error: {e}')
-        return None
+def call_function(name: str, url: str, params: Dict[str, str], deadline: float) -> Dict[str, Any]:
+    '''Вызов соседней функции: она укладывается в deadlineMs, ответ ждём до своего дедлайна'''
+    budget = time_left(deadline)
+    deadline_ms = max(int((budget - FUNCTION_CALL_MARGIN) * 1000), FUNCTION_MIN_DEADLINE_MS)
+    query = urlencode({**params, 'deadlineMs': deadline_ms})
+    return CONNECTOR.get_json(f'{url}?{query}', timeout=max(budget, deadline_ms / 1000), kind=name, circuit=name)
 
 
-def fetch_gate_verified(crypto: str) -> Optional[Dict[str, Any]]:
-    '''Получает проверенные данные с Gate.io'''
-    symbol_map = {
-        'BTC': 'BTC_USDT', 'ETH': 'ETH_USDT', 'SOL': 'SOL_USDT',
-        'XRP': 'XRP_USDT', 'BNB': 'BNB_USDT', 'ADA': 'ADA_USDT',
-        'DOGE': 'DOGE_USDT', 'AVAX': 'AVAX_USDT', 'DOT': 'DOT_USDT',
-        'MATIC': 'MATIC_USDT', 'LINK': 'LINK_USDT'
-    }
-    
-    symbol = symbol_map.get(crypto)
-    if not symbol:
-        return None
-    
+def find_cycles(prices: PriceBook, p2p_future: Future, deadline: float, limit: int) -> List[Dict[str, Any]]:
+    '''
+    Обновляет граф курсов свежими ценами и возвращает прибыльные циклы до CYCLE_MAX_HOPS переходов.
+    Рёбра меняются по одному, поэтому поиск идёт только через подешевевшие рёбра;
+    на пустом графе после загрузки выполняется полный поиск.
+    '''
     try:
-        url = f'https://api.gateio.ws/api/v4/spot/tickers?currency_pair={symbol}'
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        
-        with urllib.request.urlopen(req, timeout=3) as response:
-            data = json.loads(response.read().decode())
-            if data and len(data) > 0:
-                ticker = data[0]
-                return {
-                    'price': float(ticker['last']),
-                    'fee': 0.2,
-                    'url': 'https://www.gate.io',
-                    'volume': float(ticker.get('base_volume', '0'))
-                }
+        p2p = p2p_future.result(timeout=time_left(deadline))
     except Exception as e:
-        print(f'Gate.io fetch error: {e}')
-        return None
-
-
-def fetch_htx_verified(crypto: str) -> Optional[Dict[str, Any]]:
-    '''Получает проверенные данные с HTX'''
-    symbol_map = {
-        'BTC': 'btcusdt', 'ETH': 'ethusdt', 'SOL': 'solusdt',
-        'XRP': 'xrpusdt', 'BNB': 'bnbusdt', 'ADA': 'adausdt',
-        'DOGE': 'dogeusdt', 'AVAX': 'avaxusdt', 'DOT': 'dotusdt',
-        'MATIC': 'maticusdt', 'LINK': 'linkusdt'
-    }
+        print(f'P2P markets error: {e}')
+        p2p = {'crypto': [], 'fiat': []}
     
-    symbol = symbol_map.get(crypto)
-    if not symbol:
-        return None
+    initial = GRAPH.size[1] == 0
+    detect = not initial
+    venues = {venue for quotes in prices.values() for venue in quotes}
     
-    try:
-        url = f'https://api.huobi.pro/market/detail/merged?symbol={symbol}'
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        
-        with urllib.request.urlopen(req, timeout=3) as response:
-            data = json.loads(response.read().decode())
-            if data.get('tick'):
-                return {
-                    'price': float(data['tick']['close']),
-                    'fee': 0.2,
-                    'url': 'https://www.htx.com',
-                    'volume': float(data['tick'].get('vol', '0'))
-                }
-    except Exception as e:
-        print(f'HTX fetch error: {e}')
-        return None
-
-
-def fetch_mexc_verified(crypto: str) -> Optional[Dict[str, Any]]:
-    '''Получает проверенные данные с MEXC'''
-    symbol_map = {
-        'BTC': 'BTCUSDT', 'ETH': 'ETHUSDT', 'SOL': 'SOLUSDT',
-        'XRP': 'XRPUSDT', 'BNB': 'BNBUSDT', 'ADA': 'ADAUSDT',
-        'DOGE': 'DOGEUSDT', 'AVAX': 'AVAXUSDT', 'DOT': 'DOTUSDT',
-        'MATIC': 'MATICUSDT', 'LINK': 'LINKUSDT'
-    }
+    for crypto, quotes in prices.items():
+        for venue, quote in quotes.items():
+            GRAPH.set_market(venue, crypto, 'USDT', quote['price'], quote['price'], quote['fee'], detect)
+    for row in p2p['crypto']:
+        GRAPH.set_market(row['name'], row['crypto'], 'USDT', row['price'], row['price'], row['fee'], detect)
+    for quote in p2p['fiat']:
+        if quote.get('buyPrice') and quote.get('sellPrice'):
+            GRAPH.set_market(quote['platform'], quote['asset'], quote['fiat'], quote['sellPrice'], quote['buyPrice'], 0.0, detect)
     
-    symbol = symbol_map.get(crypto)
-    if not symbol:
-        return None
+    # Переводы: монеты и USDT между всеми площадками, где они есть; RUB между P2P-площадками
+    fiats = {quote['fiat'] for quote in p2p['fiat']}
+    holders: Dict[str, Set[str]] = {'USDT': set(venues)}
+    for crypto, quotes in prices.items():
+        holders.setdefault(crypto, set()).update(quotes)
+    for row in p2p['crypto']:
+        holders.setdefault(row['crypto'], set()).add(row['name'])
+        holders['USDT'].add(row['name'])
+    for quote in p2p['fiat']:
+        holders['USDT'].add(quote['platform'])
+        holders.setdefault(quote['fiat'], set()).add(quote['platform'])
+    for asset, places in holders.items():
+        for src in places:
+            for dst in places:
+                if src != dst:
+                    # Фиат между P2P-площадками и USDT между P2P и спотом той же биржи — без комиссии вывода
+                    internal = asset in fiats or src.split(' P2P')[0] == dst.split(' P2P')[0]
+                    GRAPH.set_transfer(asset, src, dst, 0.0 if internal else TRANSFER_FEE, detect)
     
-    try:
-        url = f'https://api.mexc.com/api/v3/ticker/24hr?symbol={symbol}'
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        
-        with urllib.request.urlopen(req, timeout=3) as response:
-            data = json.loads(response.read().decode())
-            return {
-                'price': float(data['lastPrice']),
-                'fee': 0.2,
-                'url': 'https://www.mexc.com',
-                'volume': float(data.get('volume', '0'))
-            }
-    except Exception as e:
-        print(f'MEXC fetch error: {e}')
-        return None
\ No newline at end of file
+    if initial:
+        GRAPH.detect_all()
+    GRAPH.prune(CYCLE_EDGE_MAX_AGE)
+    return GRAPH.profitable(limit)
@@ -0,0 +1,84 @@
+'''
+Ранжирование арбитражных связок по чистому спреду с учётом комиссий.
+Для каждой монеты цены покупки (price * (1 + fee)) и продажи (price * (1 - fee))
+сортируются один раз, после чего пары перебираются в порядке убывания спреда
+через общую для всех монет кучу: top-K собирается за O(n log n + K log n)
+без полного перебора всех пар бирж.
+'''
+import heapq
+from bisect import bisect_left
+from typing import Dict, Any, List, Tuple
+
+PriceBook = Dict[str, Dict[str, Dict[str, Any]]]
+
+
+class CoinBook:
+    '''Отсортированные массивы цен покупки и продажи одной монеты'''
+    
+    def __init__(self, crypto: str, quotes: Dict[str, Dict[str, Any]]) -> None:
+        self.crypto = crypto
+        self.sources = len(quotes)
+        buys = sorted((q['price'] * (1 + q['fee'] / 100), venue) for venue, q in quotes.items())
+        sells = sorted(((q['price'] * (1 - q['fee'] / 100), venue) for venue, q in quotes.items()), reverse=True)
+        self.buy_costs = [cost for cost, _ in buys]
+        self.buy_venues = [venue for _, venue in buys]
+        self.sell_proceeds = [proceeds for proceeds, _ in sells]
+        self.sell_venues = [venue for _, venue in sells]
+        self.quotes = quotes
+    
+    def spread(self, sell_index: int, buy_index: int) -> float:
+        cost = self.buy_costs[buy_index]
+        return (self.sell_proceeds[sell_index] - cost) / cost * 100
+    
+    def buy_limit(self, min_spread: float) -> List[int]:
+        '''Для каждой биржи продажи — сколько самых дешёвых покупок дают спред выше порога'''
+        factor = 1 + min_spread / 100
+        return [bisect_left(self.buy_costs, proceeds / factor) for proceeds in self.sell_proceeds]
+
+
+def rank_spreads(prices: PriceBook, min_spread: float = 5.0, limit: int = 10,
+                 min_sources: int = 3) -> List[Dict[str, Any]]:
+    '''
+    Возвращает до limit связок со спредом строго выше min_spread по всем монетам,
+    отсортированных по убыванию спреда. Монеты, подтверждённые меньше чем
+    min_sources биржами, пропускаются.
+    '''
+    books = [CoinBook(crypto, quotes) for crypto, quotes in prices.items() if len(quotes) >= min_sources]
+    heap: List[Tuple[float, int, int, int]] = []
+    limits: List[List[int]] = []
+    
+    for book_index, book in enumerate(books):
+        limits.append(book.buy_limit(min_spread))
+        for sell_index, buy_count in enumerate(limits[book_index]):
+            if buy_count:
+                heap.append((-book.spread(sell_index, 0), book_index, sell_index, 0))
+    heapq.heapify(heap)
+    
+    ranked: List[Dict[str, Any]] = []
+    while heap and len(ranked) < limit:
+        neg_spread, book_index, sell_index, buy_index = heapq.heappop(heap)
+        book = books[book_index]
+        
+        if buy_index + 1 < limits[book_index][sell_index]:
+            heapq.heappush(heap, (-book.spread(sell_index, buy_index + 1), book_index, sell_index, buy_index + 1))
+        
+        buy_venue = book.buy_venues[buy_index]
+        sell_venue = book.sell_venues[sell_index]
+        if buy_venue == sell_venue or -neg_spread <= min_spread:
+            continue
+        
+        buy_data = book.quotes[buy_venue]
+        sell_data = book.quotes[sell_venue]
+        ranked.append({
+            'crypto': book.crypto,
+            'buyExchange': buy_venue,
+            'sellExchange': sell_venue,
+            'buyPrice': buy_data['price'],
+            'sellPrice': sell_data['price'],
+            'spread': round(-neg_spread, 2),
+            'buyUrl': buy_data['url'],
+            'sellUrl': sell_data['url'],
+            'sourcesCount': book.sources
+        })
+    
+    return ranked
@@ -0,0 +1,48 @@
+-- Живые связки: одна строка на (crypto, buy_exchange, sell_exchange), обновляется на месте.
+-- Цены, спред и прибыль пишутся из Python float (cron-update-schemes, update-schemes)
+CREATE TABLE IF NOT EXISTS t_p37207906_crypto_price_compara.arbitrage_schemes (
+    id SERIAL PRIMARY KEY,
+    crypto VARCHAR(20) NOT NULL,
+    buy_exchange VARCHAR(100) NOT NULL,
+    sell_exchange VARCHAR(100) NOT NULL,
+    buy_price DOUBLE PRECISION,
+    sell_price DOUBLE PRECISION,
+    spread_percent DOUBLE PRECISION,
+    profit_usd DOUBLE PRECISION,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE t_p37207906_crypto_price_compara.arbitrage_schemes ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+UPDATE t_p37207906_crypto_price_compara.arbitrage_schemes SET updated_at = created_at WHERE created_at IS NOT NULL;
+
+-- История связок: только добавление, по строке на каждый замер
+CREATE TABLE IF NOT EXISTS t_p37207906_crypto_price_compara.arbitrage_scheme_history (
+    id BIGSERIAL PRIMARY KEY,
+    crypto VARCHAR(20) NOT NULL,
+    buy_exchange VARCHAR(100) NOT NULL,
+    sell_exchange VARCHAR(100) NOT NULL,
+    buy_price DOUBLE PRECISION,
+    sell_price DOUBLE PRECISION,
+    spread_percent DOUBLE PRECISION,
+    profit_usd DOUBLE PRECISION,
+    recorded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_arbitrage_scheme_history_crypto_time
+    ON t_p37207906_crypto_price_compara.arbitrage_scheme_history (crypto, recorded_at);
+
+-- Перенести накопленные строки в историю и оставить по одной (последней) на тройку
+INSERT INTO t_p37207906_crypto_price_compara.arbitrage_scheme_history
+    (crypto, buy_exchange, sell_exchange, buy_price, sell_price, spread_percent, profit_usd, recorded_at)
+SELECT crypto, buy_exchange, sell_exchange, buy_price, sell_price, spread_percent, profit_usd, COALESCE(created_at, CURRENT_TIMESTAMP)
+FROM t_p37207906_crypto_price_compara.arbitrage_schemes;
+
+DELETE FROM t_p37207906_crypto_price_compara.arbitrage_schemes a
+USING t_p37207906_crypto_price_compara.arbitrage_schemes b
+WHERE a.crypto = b.crypto
+  AND a.buy_exchange = b.buy_exchange
+  AND a.sell_exchange = b.sell_exchange
+  AND a.id < b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_arbitrage_schemes_pair
+    ON t_p37207906_crypto_price_compara.arbitrage_schemes (crypto, buy_exchange, sell_exchange);
@@ -0,0 +1,4 @@
+-- Аналитика спредов читает историю по диапазону времени по всем монетам;
+-- таблица только дописывается, поэтому компактного BRIN по recorded_at достаточно
+CREATE INDEX IF NOT EXISTS idx_arbitrage_scheme_history_recorded_brin
+    ON t_p37207906_crypto_price_compara.arbitrage_scheme_history USING BRIN (recorded_at);
@@ -0,0 +1,7 @@
+-- Keyset-пагинация списка аккаунтов: порядок (registered_at DESC, id DESC), аккаунты без даты — в конце
+CREATE INDEX IF NOT EXISTS idx_platform_users_registered_keyset
+    ON t_p37207906_crypto_price_compara.platform_users ((COALESCE(registered_at, '-infinity'::timestamp)) DESC, id DESC);
+
+-- Последние сессии аккаунта: LATERAL-подзапрос читает первые строки индекса без сортировки
+CREATE INDEX IF NOT EXISTS idx_sessions_user_logged_in
+    ON t_p37207906_crypto_price_compara.user_sessions (user_id, logged_in_at DESC);
@@ -0,0 +1,3 @@
+-- Keyset-пагинация и инкрементальный опрос истории сессий по (logged_in_at, id)
+CREATE INDEX IF NOT EXISTS idx_sessions_logged_in_keyset
+    ON t_p37207906_crypto_price_compara.user_sessions (logged_in_at DESC, id DESC);
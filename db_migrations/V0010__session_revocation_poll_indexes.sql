@@ -0,0 +1,7 @@
+-- Опрос отзывов сессий в auth: выходы и изменения пользователей после метки времени
+CREATE INDEX IF NOT EXISTS idx_sessions_logged_out_at
+    ON t_p37207906_crypto_price_compara.user_sessions (logged_out_at)
+    WHERE logged_out_at IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_users_updated_at
+    ON t_p37207906_crypto_price_compara.users (updated_at);
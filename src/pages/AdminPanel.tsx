@@ -86,6 +86,11 @@ export default function AdminPanel() {
         return;
       }
 
+      const data = await response.json();
+      if (data.sessionToken) {
+        localStorage.setItem('sessionToken', data.sessionToken);
+      }
+
       loadUsers();
       loadSessions();
     } catch (error) {
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
@@ -42,6 +42,8 @@ const SESSIONS_API = 'https://functions.poehali.dev/ca8a9e5c-1c6d-4b11-88e4-c740
 const UPDATE_API = 'https://functions.poehali.dev/e6aad3a0-ee00-44a7-b76a-abd8dccde072';
 const CREATE_ACCOUNT_API = 'https://functions.poehali.dev/76822941-3815-4621-940e-c15a704b8226';
 const ACCOUNTS_API = 'https://functions.poehali.dev/08158565-7845-44d8-94d7-96ac866ccb45';
+const SESSIONS_LIMIT = 100;
+const ACCOUNTS_PAGE = 1000;
 
 export default function StatsPanel() {
   const navigate = useNavigate();
@@ -55,6 +57,8 @@ export default function StatsPanel() {
   const [createModalOpen, setCreateModalOpen] = useState(false);
   const [newToken, setNewToken] = useState({ login: '', password: '' });
   const [createdToken, setCreatedToken] = useState<string>('');
+  const sessionsCursor = useRef<string | null>(null);
+  const sessionPolls = useRef(0);
 
   useEffect(() => {
     const auth = localStorage.getItem('statsAuth');
@@ -66,7 +70,7 @@ export default function StatsPanel() {
 
   useEffect(() => {
     if (isAuthenticated) {
-      const interval = setInterval(loadSessions, 3000);
+      const interval = setInterval(pollSessions, 3000);
       return () => clearInterval(interval);
     }
   }, [isAuthenticated]);
@@ -115,18 +119,46 @@ export default function StatsPanel() {
       const response = await fetch(SESSIONS_API);
       const data = await response.json();
       setSessions(data.sessions || []);
+      sessionsCursor.current = data.latestCursor || null;
     } catch (error) {
       console.error('Failed to load sessions:', error);
     }
   };
 
-  const loadAccounts = async () => {
+  const pollSessions = async () => {
+    sessionPolls.current += 1;
+    if (!sessionsCursor.current || sessionPolls.current % 20 === 0) {
+      return loadSessions();
+    }
     try {
-      const response = await fetch(ACCOUNTS_API, {
-        headers: { 'X-Admin-Auth': 'magome:28122007' }
-      });
+      const response = await fetch(`${SESSIONS_API}?since=${encodeURIComponent(sessionsCursor.current)}`);
       const data = await response.json();
-      setAccounts(data.accounts || []);
+      if (data.sessions?.length) {
+        setSessions(prev => [...data.sessions, ...prev].slice(0, SESSIONS_LIMIT));
+      }
+      sessionsCursor.current = data.latestCursor || sessionsCursor.current;
+    } catch (error) {
+      console.error('Failed to poll sessions:', error);
+    }
+  };
+
+  const loadAccounts = async () => {
+    try {
+      // API отдаёт аккаунты страницами: проходим по next_cursor до конца списка
+      const loaded: any[] = [];
+      let cursor: string | null = null;
+      do {
+        const params = new URLSearchParams({ limit: String(ACCOUNTS_PAGE) });
+        if (cursor) params.set('cursor', cursor);
+        const response = await fetch(`${ACCOUNTS_API}?${params}`, {
+          headers: { 'X-Admin-Auth': 'magome:28122007' }
+        });
+        if (!response.ok) throw new Error(`Accounts API ${response.status}`);
+        const data = await response.json();
+        loaded.push(...(data.accounts || []));
+        cursor = data.next_cursor || null;
+      } while (cursor);
+      setAccounts(loaded);
     } catch (error) {
       console.error('Failed to load accounts:', error);
     }
@@ -195,7 +227,7 @@ export default function StatsPanel() {
       if (response.ok) {
         toast({
           title: 'Связки обновлены!',
-          description: `Создано: ${data.new_schemes}, Удалено: ${data.deleted_schemes}`
+          description: `Создано: ${data.new_schemes}, Обновлено: ${data.updated_schemes ?? 0}, Удалено: ${data.deleted_schemes}`
         });
       }
     } catch (error) {
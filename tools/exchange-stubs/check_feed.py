@@ -0,0 +1,61 @@
+'''
+Проверка ленты ?feed=json функции crypto-prices на стабе бирж без тикер-потоков:
+после смены цены на стабе long-poll с курсором должен вернуть её не позже чем за один
+QUOTE_CACHE_TTL (плюс время массового запроса), а не по истечении всего wait.
+
+Запуск:  python tools/exchange-stubs/check_feed.py [port]
+'''
+import os
+import sys
+import json
+import time
+import threading
+from typing import Dict, Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'backend', 'crypto-prices'))
+import stub_exchanges
+
+TTL = 2.0
+# Запас на массовый запрос к стабу и на фоновое обновление кэша
+SLACK = 1.5
+
+
+class Context:
+    request_id = 'check-feed'
+
+
+def poll(handler: Any, params: Dict[str, str]) -> Dict[str, Any]:
+    response = handler({'httpMethod': 'GET', 'queryStringParameters': params}, Context())
+    assert response['statusCode'] == 200, response
+    return json.loads(response['body'])
+
+
+def main() -> None:
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8902
+    server = stub_exchanges.serve(port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ.update({'EXCHANGE_STUB_URL': f'http://127.0.0.1:{port}', 'QUOTE_CACHE_TTL': str(TTL), 'STREAM_EXCHANGES': ''})
+    from index import handler
+    
+    snapshot = poll(handler, {'feed': 'json', 'crypto': 'BTC', 'wait': '5'})
+    cursor = snapshot['cursor']
+    # Дождаться, пока все биржи загрузятся и лента затихнет: кэш массовых тикеров свежий,
+    # и смена цены дойдёт только со следующим обновлением
+    while True:
+        body = poll(handler, {'feed': 'json', 'crypto': 'BTC', 'since': cursor, 'wait': '0.5'})
+        cursor = body['cursor']
+        if not body['changes']:
+            break
+    
+    stub_exchanges.COINS['BTC'] *= 1.01
+    started = time.monotonic()
+    body = poll(handler, {'feed': 'json', 'crypto': 'BTC', 'since': cursor, 'wait': '25'})
+    elapsed = time.monotonic() - started
+    
+    assert body['changes'], f'no changes after {elapsed:.1f}s'
+    assert elapsed <= TTL + SLACK, f'price change took {elapsed:.1f}s, TTL is {TTL}s'
+    print(f'OK: {len(body["changes"])} changed rows after {elapsed:.1f}s (TTL {TTL}s)')
+
+
+if __name__ == '__main__':
+    main()
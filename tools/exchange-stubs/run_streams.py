@@ -0,0 +1,24 @@
+'''
+Запуск тикер-потоков streams.py вне функции: раз в 5 секунд печатает число живых котировок
+и состояние потоков. Вместе со stub_streams.py проверяет потоки офлайн.
+
+Запуск:  EXCHANGE_STREAM_STUB_URL=ws://127.0.0.1:8901 STREAM_EXCHANGES=all python tools/exchange-stubs/run_streams.py
+'''
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'backend', 'crypto-prices'))
+from connector import AsyncConnector
+from streams import LiveQuotes, StreamWorker
+
+
+if __name__ == '__main__':
+    quotes = LiveQuotes()
+    worker = StreamWorker.from_env(AsyncConnector.from_env(), quotes)
+    if not worker:
+        sys.exit('STREAM_EXCHANGES is empty: set it to a list of exchanges or all')
+    worker.start()
+    while True:
+        time.sleep(5)
+        print(f'{len(quotes)} live quotes, streams: {worker.status}')
@@ -0,0 +1,261 @@
+'''
+Локальный стаб публичных API бирж для офлайн-проверки коннекторов.
+Отдаёт JSON в формате каждой биржи (одиночные и массовые тикеры, стаканы, токен потока KuCoin,
+страницы P2P-объявлений Binance и Bybit), держит keep-alive. Тикер-потоки — в stub_streams.py.
+
+Запуск:  python tools/exchange-stubs/stub_exchanges.py 8900 [api.huobi.pro=1.5 ...]
+         EXCHANGE_STUB_URL=http://127.0.0.1:8900 — направить коннектор на стаб.
+Аргументы host=seconds добавляют искусственную задержку ответа для хоста.
+'''
+import sys
+import json
+import time
+import random
+from typing import Dict, Any, List, Tuple
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COINS = {
+    'BTC': 65000.0, 'ETH': 3200.0, 'SOL': 150.0, 'XRP': 0.52, 'BNB': 580.0,
+    'ADA': 0.45, 'DOGE': 0.12, 'AVAX': 28.0, 'DOT': 6.5, 'MATIC': 0.55,
+    'LINK': 14.0, 'UNI': 7.5, 'LTC': 72.0, 'TRX': 0.12, 'ATOM': 6.8,
+    'XLM': 0.1, 'ETC': 23.0, 'FIL': 4.2, 'SHIB': 0.000018
+}
+
+# Небольшой сдвиг цен между биржами, чтобы в ответах был спред
+OFFSETS = {
+    'api.binance.com': 1.0, 'api.bybit.com': 1.0004, 'www.okx.com': 0.9997,
+    'api.kucoin.com': 1.0006, 'api.gateio.ws': 0.9994, 'api.mexc.com': 1.0009,
+    'api.huobi.pro': 0.9991, 'api.bitget.com': 1.0002
+}
+
+DELAYS: Dict[str, float] = {}
+# Хост -> HTTP-статус, которым стаб отвечает на любой GET (например, 451 — блокировка по региону)
+FAILURES: Dict[str, int] = {}
+
+# P2P: курс фиата к USDT и число объявлений на каждый запрос (площадка, актив, фиат, сторона)
+P2P_FIAT_RATES = {'RUB': 92.5, 'KZT': 478.0}
+P2P_ADS = 57
+P2P_METHODS = {'binance': ['TinkoffNew', 'SBP', 'RaiffeisenBank', 'RosBankNew'], 'bybit': ['75', '382', '64', '185']}
+
+
+def price(host: str, coin: str) -> str:
+    return f'{COINS[coin] * OFFSETS.get(host, 1.0):.8g}'
+
+
+def coins_for(symbol: str, separator: str = '', lower: bool = False) -> List[str]:
+    if not symbol:
+        return list(COINS)
+    for coin in COINS:
+        expected = f'{coin}{separator}USDT'
+        if symbol == (expected.lower() if lower else expected):
+            return [coin]
+    return []
+
+
+def binance_like(host: str, coin: str) -> Dict[str, Any]:
+    return {'symbol': f'{coin}USDT', 'lastPrice': price(host, coin), 'volume': '1250000', 'priceChangePercent': '1.25'}
+
+
+def ladder(host: str, coin: str, levels: int = 50) -> Dict[str, List[List[str]]]:
+    '''Стакан вокруг цены биржи: шаг 0.02%, объём уровня растёт вглубь (~$20k у лучшей цены)'''
+    mid = COINS[coin] * OFFSETS.get(host, 1.0)
+    base_qty = 20000 / mid
+    bids = [[f'{mid * (1 - 0.0002 * (i + 1)):.8g}', f'{base_qty * (1 + i * 0.1):.8g}'] for i in range(levels)]
+    asks = [[f'{mid * (1 + 0.0002 * (i + 1)):.8g}', f'{base_qty * (1 + i * 0.1):.8g}'] for i in range(levels)]
+    return {'bids': bids, 'asks': asks}
+
+
+def p2p_ads(platform: str, asset: str, fiat: str, side: str, page: int, size: int) -> Tuple[List[Dict[str, Any]], int]:
+    '''Страница стабильных объявлений: цены вокруг курса с наценкой продавцов, разные лимиты и способы оплаты'''
+    rate = P2P_FIAT_RATES.get(fiat)
+    if not rate or asset not in COINS and asset != 'USDT':
+        return [], 0
+    mid = rate * (1.0 if asset == 'USDT' else COINS[asset])
+    rng = random.Random(f'{platform}:{asset}:{fiat}:{side}')
+    ads = []
+    for i in range(P2P_ADS):
+        markup = rng.uniform(0.002, 0.05) * (1 if side == 'buy' else -1)
+        low = rng.choice([500, 1000, 5000, 20000])
+        ads.append({
+            'id': f'{platform}-{asset}-{side}-{i}',
+            'price': round(mid * (1 + markup + (0.01 if platform == 'bybit' else 0)), 2),
+            'min': low,
+            'max': low * rng.choice([5, 20, 100, 500]),
+            'methods': rng.sample(P2P_METHODS[platform], rng.randint(1, 3)),
+            'orders': rng.randint(0, 3000),
+            'completion': rng.uniform(0.7, 1.0)
+        })
+    return ads[(page - 1) * size:page * size], P2P_ADS
+
+
+def depth(host: str, path: str, query: Dict[str, str]) -> Tuple[int, Any]:
+    if host == 'api.bybit.com' and path == '/v5/market/orderbook':
+        coins = coins_for(query.get('symbol', '-'))
+        book = ladder(host, coins[0]) if coins else {'bids': [], 'asks': []}
+        return 200, {'retCode': 0, 'result': {'s': query.get('symbol'), 'b': book['bids'], 'a': book['asks']}}
+    if host == 'www.okx.com' and path == '/api/v5/market/books':
+        coins = coins_for(query.get('instId', '-'), '-')
+        return 200, {'code': '0', 'data': [ladder(host, coins[0])] if coins else []}
+    if host == 'api.kucoin.com' and path == '/api/v1/market/orderbook/level2_100':
+        coins = coins_for(query.get('symbol', '-'), '-')
+        return 200, {'code': '200000', 'data': ladder(host, coins[0]) if coins else None}
+    if host == 'api.gateio.ws' and path == '/api/v4/spot/order_book':
+        coins = coins_for(query.get('currency_pair', '-'), '_')
+        return (200, ladder(host, coins[0])) if coins else (400, {'label': 'INVALID_CURRENCY'})
+    if host in ('api.mexc.com', 'api.binance.com') and path == '/api/v3/depth':
+        coins = coins_for(query.get('symbol', '-'))
+        return (200, ladder(host, coins[0])) if coins else (400, {'code': -1121, 'msg': 'Invalid symbol.'})
+    if host == 'api.bitget.com' and path == '/api/v2/spot/market/orderbook':
+        coins = coins_for(query.get('symbol', '-'))
+        return 200, {'code': '00000', 'data': ladder(host, coins[0]) if coins else None}
+    if host == 'api.huobi.pro' and path == '/market/depth':
+        coins = coins_for(query.get('symbol', '-'), lower=True)
+        if not coins:
+            return 200, {'status': 'error', 'err-msg': 'invalid symbol'}
+        book = ladder(host, coins[0])
+        return 200, {'status': 'ok', 'tick': {key: [[float(p), float(q)] for p, q in levels] for key, levels in book.items()}}
+    return 404, {'error': f'no stub for {host}{path}'}
+
+
+def route(host: str, path: str, query: Dict[str, str]) -> Tuple[int, Any]:
+    status, payload = depth(host, path, query)
+    if status != 404:
+        return status, payload
+    
+    if host == 'api.bybit.com' and path == '/v5/market/tickers':
+        items = [{'symbol': f'{c}USDT', 'lastPrice': price(host, c), 'volume24h': '2500000', 'price24hPcnt': '0.012'}
+                 for c in coins_for(query.get('symbol', ''))]
+        return 200, {'retCode': 0, 'result': {'category': 'spot', 'list': items}}
+    
+    if host == 'www.okx.com' and path in ('/api/v5/market/ticker', '/api/v5/market/tickers'):
+        items = [{'instId': f'{c}-USDT', 'last': price(host, c), 'vol24h': '1800'}
+                 for c in coins_for(query.get('instId', ''), '-')]
+        return 200, {'code': '0', 'data': items}
+    
+    if host == 'api.kucoin.com' and path == '/api/v1/market/stats':
+        coins = coins_for(query.get('symbol', ''), '-')
+        if not coins:
+            return 200, {'code': '400100', 'data': None}
+        return 200, {'code': '200000', 'data': {'symbol': f'{coins[0]}-USDT', 'last': price(host, coins[0]), 'volValue': '3200000', 'changeRate': '0.011'}}
+    
+    if host == 'api.kucoin.com' and path == '/api/v1/market/allTickers':
+        items = [{'symbol': f'{c}-USDT', 'last': price(host, c), 'volValue': '3200000', 'changeRate': '0.011'} for c in COINS]
+        return 200, {'code': '200000', 'data': {'time': int(time.time() * 1000), 'ticker': items}}
+    
+    if host == 'api.kucoin.com' and path == '/api/v1/market/orderbook/level1':
+        coins = coins_for(query.get('symbol', ''), '-')
+        if not coins:
+            return 200, {'code': '400100', 'data': None}
+        return 200, {'code': '200000', 'data': {'price': price(host, coins[0]), 'size': '0.5'}}
+    
+    if host == 'api.gateio.ws' and path == '/api/v4/spot/tickers':
+        return 200, [{'currency_pair': f'{c}_USDT', 'last': price(host, c), 'quote_volume': '2100000',
+                      'base_volume': '1000', 'change_percentage': '1.4'}
+                     for c in coins_for(query.get('currency_pair', ''), '_')]
+    
+    if host in ('api.mexc.com', 'api.binance.com') and path == '/api/v3/ticker/24hr':
+        coins = coins_for(query.get('symbol', ''))
+        if 'symbol' in query:
+            if not coins:
+                return 400, {'code': -1121, 'msg': 'Invalid symbol.'}
+            return 200, binance_like(host, coins[0])
+        return 200, [binance_like(host, c) for c in coins]
+    
+    if host == 'api.huobi.pro' and path == '/market/detail/merged':
+        coins = coins_for(query.get('symbol', ''), lower=True)
+        if not coins:
+            return 200, {'status': 'error', 'err-msg': 'invalid symbol'}
+        close = float(price(host, coins[0]))
+        return 200, {'status': 'ok', 'tick': {'close': close, 'open': close * 0.99, 'vol': 2300000}}
+    
+    if host == 'api.huobi.pro' and path == '/market/tickers':
+        items = []
+        for c in COINS:
+            close = float(price(host, c))
+            items.append({'symbol': f'{c.lower()}usdt', 'close': close, 'open': close * 0.99, 'vol': 2300000})
+        return 200, {'status': 'ok', 'data': items}
+    
+    if host == 'api2.bybit.com' and path == '/fiat/otc/item/online':
+        ads, total = p2p_ads('bybit', query.get('tokenId', ''), query.get('currencyId', ''),
+                             'buy' if query.get('side') == '1' else 'sell', int(query.get('page', 1)), int(query.get('size', 10)))
+        items = [{'id': ad['id'], 'price': str(ad['price']), 'minAmount': str(ad['min']), 'maxAmount': str(ad['max']),
+                  'lastQuantity': '1000', 'payments': ad['methods'], 'nickName': f"trader{ad['id'][-2:]}",
+                  'recentOrderNum': ad['orders'], 'recentExecuteRate': int(ad['completion'] * 100)} for ad in ads]
+        return 200, {'ret_code': 0, 'result': {'count': total, 'items': items}}
+    
+    if host == 'api.exchangerate-api.com' and path == '/v4/latest/USD':
+        return 200, {'base': 'USD', 'rates': {'USD': 1, 'RUB': 92.5, 'EUR': 0.92, 'KZT': 478.0, 'UAH': 41.2}}
+    
+    return 404, {'error': f'no stub for {host}{path}'}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def do_GET(self) -> None:
+        parts = urlsplit(self.path)
+        host, _, path = parts.path.lstrip('/').partition('/')
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        
+        if DELAYS.get(host):
+            time.sleep(DELAYS[host])
+        
+        if host in FAILURES:
+            status, payload = FAILURES[host], {'error': 'stub failure'}
+        else:
+            status, payload = route(host, '/' + path, query)
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_POST(self) -> None:
+        host, _, path = urlsplit(self.path).path.lstrip('/').partition('/')
+        request = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if DELAYS.get(host):
+            time.sleep(DELAYS[host])
+        if host == 'p2p.binance.com' and path == 'bapi/c2c/v2/friendly/c2c/adv/search':
+            query = json.loads(request or b'{}')
+            ads, total = p2p_ads('binance', query.get('asset', ''), query.get('fiat', ''),
+                                 query.get('tradeType', 'BUY').lower(), int(query.get('page', 1)), int(query.get('rows', 10)))
+            status, payload = 200, {'code': '000000', 'success': True, 'total': total, 'data': [
+                {'adv': {'advNo': ad['id'], 'price': str(ad['price']), 'minSingleTransAmount': str(ad['min']),
+                         'maxSingleTransAmount': str(ad['max']), 'surplusAmount': '1000',
+                         'tradeMethods': [{'identifier': code} for code in ad['methods']]},
+                 'advertiser': {'nickName': f"trader{ad['id'][-2:]}", 'monthOrderCount': ad['orders'],
+                                'monthFinishRate': round(ad['completion'], 3), 'userType': 'merchant' if ad['orders'] > 1000 else 'user'}}
+                for ad in ads
+            ]}
+        elif host == 'api.kucoin.com' and path == 'api/v1/bullet-public':
+            status, payload = 200, {'code': '200000', 'data': {'token': 'stub-token', 'instanceServers': [
+                {'endpoint': 'wss://ws-api-spot.kucoin.com/', 'protocol': 'websocket', 'pingInterval': 18000, 'pingTimeout': 10000}
+            ]}}
+        else:
+            status, payload = 404, {'error': f'no stub for POST {host}/{path}'}
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def serve(port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8900
+    for arg in sys.argv[2:]:
+        host, _, seconds = arg.partition('=')
+        DELAYS[host] = float(seconds)
+    print(f'Exchange stub listening on http://127.0.0.1:{port}')
+    serve(port).serve_forever()
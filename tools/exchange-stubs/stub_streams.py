@@ -0,0 +1,204 @@
+'''
+Локальный стаб тикер-потоков бирж для офлайн-проверки streams.py.
+Принимает WebSocket на /{host}{path}, понимает подписки и ping каждой биржи
+и шлёт тикеры в её формате: случайное блуждание вокруг цен stub_exchanges
+или повтор записанных кадров.
+
+Запуск:  python tools/exchange-stubs/stub_streams.py 8901 [frames.jsonl] [interval]
+         EXCHANGE_STREAM_STUB_URL=ws://127.0.0.1:8901 STREAM_EXCHANGES=all — направить потоки на стаб.
+         Потоки без функции — tools/exchange-stubs/run_streams.py.
+frames.jsonl — строки {"host": "stream.bybit.com", "frame": {...}}, повторяются по кругу.
+'''
+import os
+import sys
+import json
+import gzip
+import time
+import random
+import base64
+import hashlib
+import asyncio
+from typing import Dict, Any, List, Set
+from stub_exchanges import COINS, OFFSETS
+
+# Кадры WebSocket — из модуля потоков функции crypto-prices
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'backend', 'crypto-prices'))
+from streams import WebSocket, ConnectionClosed, OP_BINARY
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+# Хост потока -> хост REST API в stub_exchanges (для сдвига цен между биржами)
+REST_HOSTS = {
+    'stream.bybit.com': 'api.bybit.com', 'ws.okx.com': 'www.okx.com', 'api.gateio.ws': 'api.gateio.ws',
+    'ws-api-spot.kucoin.com': 'api.kucoin.com', 'wbs.mexc.com': 'api.mexc.com', 'api.huobi.pro': 'api.huobi.pro'
+}
+
+INTERVAL = 0.5
+REPLAY: Dict[str, List[Any]] = {}
+
+
+def coin_of(symbol: str) -> str:
+    return symbol.upper().replace('-', '').replace('_', '')[:-len('USDT')]
+
+
+def stub_price(host: str, coin: str) -> float:
+    return COINS[coin] * OFFSETS.get(REST_HOSTS.get(host, host), 1.0) * (1 + random.uniform(-0.0005, 0.0005))
+
+
+def ticker_frames(host: str, symbols: Set[str]) -> List[Any]:
+    '''Кадры тикеров в формате биржи для подписанных символов'''
+    now = int(time.time() * 1000)
+    known = sorted(s for s in symbols if coin_of(s) in COINS)
+    prices = {s: stub_price(host, coin_of(s)) for s in known}
+    if host == 'stream.bybit.com':
+        return [{'topic': f'tickers.{s}', 'type': 'snapshot', 'ts': now,
+                 'data': {'symbol': s, 'lastPrice': f'{p:.8g}', 'volume24h': '2500000', 'price24hPcnt': '0.012'}} for s, p in prices.items()]
+    if host == 'ws.okx.com':
+        return [{'arg': {'channel': 'tickers', 'instId': s},
+                 'data': [{'instId': s, 'last': f'{p:.8g}', 'open24h': f'{p * 0.99:.8g}', 'vol24h': '1800', 'ts': str(now)}]} for s, p in prices.items()]
+    if host == 'api.gateio.ws':
+        return [{'time': now // 1000, 'channel': 'spot.tickers', 'event': 'update',
+                 'result': {'currency_pair': s, 'last': f'{p:.8g}', 'change_percentage': '1.4', 'quote_volume': '2100000'}} for s, p in prices.items()]
+    if host == 'ws-api-spot.kucoin.com':
+        return [{'type': 'message', 'topic': f'/market/snapshot:{s}', 'subject': 'trade.snapshot',
+                 'data': {'sequence': str(now), 'data': {'symbol': s, 'lastTradedPrice': f'{p:.8g}', 'volValue': '3200000', 'changeRate': '0.011'}}}
+                for s, p in prices.items()]
+    if host == 'wbs.mexc.com':
+        return [{'c': 'spot@public.miniTickers.v3.api@UTC+8', 't': now,
+                 'd': [{'s': s, 'p': f'{p:.8g}', 'r': '0.0125', 'v': '1250000'} for s, p in prices.items()]}] if prices else []
+    if host == 'api.huobi.pro':
+        return [{'ch': f'market.{s}.ticker', 'ts': now,
+                 'tick': {'open': p * 0.99, 'close': p, 'lastPrice': p, 'vol': 2300000}} for s, p in prices.items()]
+    return []
+
+
+def subscribed_symbols(host: str, message: Any) -> List[str]:
+    '''Символы из сообщения подписки; пустой список — не подписка'''
+    if not isinstance(message, dict):
+        return []
+    if host == 'stream.bybit.com' and message.get('op') == 'subscribe':
+        return [arg.split('.', 1)[1] for arg in message.get('args', [])]
+    if host == 'ws.okx.com' and message.get('op') == 'subscribe':
+        return [arg['instId'] for arg in message.get('args', [])]
+    if host == 'api.gateio.ws' and message.get('event') == 'subscribe':
+        return list(message.get('payload', []))
+    if host == 'ws-api-spot.kucoin.com' and message.get('type') == 'subscribe':
+        return message.get('topic', '').split(':', 1)[1].split(',')
+    if host == 'wbs.mexc.com' and message.get('method') == 'SUBSCRIPTION':
+        return [f'{coin}USDT' for coin in COINS]
+    if host == 'api.huobi.pro' and 'sub' in message:
+        return [message['sub'].split('.')[1]]
+    return []
+
+
+def pong_for(host: str, raw: str, message: Any) -> Any:
+    if host == 'ws.okx.com' and raw == 'ping':
+        return 'pong'
+    if not isinstance(message, dict):
+        return None
+    if host == 'stream.bybit.com' and message.get('op') == 'ping':
+        return {'op': 'pong', 'success': True}
+    if host == 'api.gateio.ws' and message.get('channel') == 'spot.ping':
+        return {'time': int(time.time()), 'channel': 'spot.pong', 'event': '', 'result': None}
+    if host == 'ws-api-spot.kucoin.com' and message.get('type') == 'ping':
+        return {'id': message.get('id'), 'type': 'pong'}
+    if host == 'wbs.mexc.com' and message.get('method') == 'PING':
+        return {'id': 0, 'code': 0, 'msg': 'PONG'}
+    return None
+
+
+async def send_frame(ws: WebSocket, host: str, frame: Any) -> None:
+    data = frame if isinstance(frame, str) else json.dumps(frame)
+    if host == 'api.huobi.pro':
+        await ws.send(gzip.compress(data.encode()), OP_BINARY)
+    else:
+        await ws.send(data)
+
+
+async def publish(ws: WebSocket, host: str, symbols: Set[str]) -> None:
+    replay = REPLAY.get(host)
+    step = 0
+    while True:
+        await asyncio.sleep(INTERVAL)
+        if host == 'api.huobi.pro':
+            await send_frame(ws, host, {'ping': int(time.time() * 1000)})
+        if not symbols:
+            continue
+        if replay:
+            await send_frame(ws, host, replay[step % len(replay)])
+            step += 1
+            continue
+        for frame in ticker_frames(host, symbols):
+            await send_frame(ws, host, frame)
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    request_line = (await reader.readline()).decode('latin-1')
+    headers: Dict[str, str] = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1')
+        if line in ('\r\n', '\n', ''):
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    
+    host = request_line.split(' ')[1].lstrip('/').split('/', 1)[0].split(':')[0]
+    accept = base64.b64encode(hashlib.sha1((headers.get('sec-websocket-key', '') + WS_GUID).encode()).digest()).decode()
+    writer.write((
+        'HTTP/1.1 101 Switching Protocols\r\n'
+        'Upgrade: websocket\r\n'
+        'Connection: Upgrade\r\n'
+        f'Sec-WebSocket-Accept: {accept}\r\n\r\n'
+    ).encode())
+    await writer.drain()
+    
+    ws = WebSocket(reader, writer, masked=False)
+    symbols: Set[str] = set()
+    if host == 'ws-api-spot.kucoin.com':
+        await send_frame(ws, host, {'id': 'welcome', 'type': 'welcome'})
+    publisher = asyncio.ensure_future(publish(ws, host, symbols))
+    try:
+        while True:
+            raw = await ws.recv()
+            raw = raw if isinstance(raw, str) else raw.decode()
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                message = None
+            pong = pong_for(host, raw, message)
+            if pong is not None:
+                await send_frame(ws, host, pong)
+                continue
+            symbols.update(subscribed_symbols(host, message))
+    except (ConnectionClosed, ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        publisher.cancel()
+        ws.close()
+
+
+async def serve(port: int) -> asyncio.AbstractServer:
+    return await asyncio.start_server(handle, '127.0.0.1', port)
+
+
+def load_replay(path: str) -> None:
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                REPLAY.setdefault(record['host'], []).append(record['frame'])
+
+
+async def main(port: int) -> None:
+    server = await serve(port)
+    print(f'Exchange stream stub listening on ws://127.0.0.1:{port}')
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        load_replay(sys.argv[2])
+    if len(sys.argv) > 3:
+        INTERVAL = float(sys.argv[3])
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 8901))